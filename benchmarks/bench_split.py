@@ -0,0 +1,317 @@
+"""Benchmark the splitting APIs on synthetic activities.
+
+Run with:
+
+    python -m benchmarks.bench_split --output results.json
+    python -m benchmarks.bench_split --compare results.json
+
+For each scenario and API this reports rows per second (best of --repeat runs),
+the peak memory traced by tracemalloc during a run, and two counts of memory
+blocks allocated by a run, over those allocated before it:
+
+- peak blocks, the most allocated at once while it ran. This is sampled each
+  time a function is called or returns, so can miss a few short lived blocks.
+- kept blocks, those still allocated once it has finished while its output is
+  held (materialised lists keep every row; streaming APIs keep almost nothing).
+
+Work done in other processes is not counted in either memory figure.
+"""
+
+import argparse
+import datetime
+import gc
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from iati_activity_details_split_by_fields.batch import split_activities
+from iati_activity_details_split_by_fields.iati_activity_arrow import (
+    pyarrow,
+    write_parquet,
+)
+from iati_activity_details_split_by_fields.iati_activity_json import (
+    write_transactions_split_as_json_lines,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_split_columns import (
+    numpy,
+)
+from iati_activity_details_split_by_fields.shared_memory_split import (
+    split_activities_to_shared_memory,
+)
+
+from .synthetic import get_synthetic_activities
+
+# name: (number of activities, arguments for get_synthetic_activity)
+SCENARIOS: Dict[str, Tuple[int, dict]] = {
+    "no_split": (2000, {"transactions": 10}),
+    "countries": (500, {"transactions": 10, "recipient_countries": 10}),
+    "countries_sectors": (
+        50,
+        {
+            "transactions": 10,
+            "recipient_countries": 10,
+            "sectors": 10,
+            "sector_vocabularies": 2,
+        },
+    ),
+    "everything": (
+        5,
+        {
+            "transactions": 20,
+            "recipient_countries": 8,
+            "recipient_regions": 3,
+            "sectors": 12,
+            "sector_vocabularies": 3,
+        },
+    ),
+    "wide": (
+        1,
+        {"transactions": 200, "recipient_countries": 40, "sectors": 30},
+    ),
+    # Publishers that declare the country and sector on most transactions
+    "transaction_level": (
+        200,
+        {
+            "transactions": 20,
+            "recipient_countries": 10,
+            "sectors": 10,
+            "transaction_level": 0.9,
+        },
+    ),
+}
+
+
+def _count_peak_blocks(function: Callable, activities) -> Tuple[Any, int]:
+    """Returns function(activities) and the most memory blocks it had allocated
+    at once, sampled whenever a function is called or returns."""
+    blocks_before = sys.getallocatedblocks()
+    peak_blocks = blocks_before
+
+    def sample(frame, event, arg):
+        nonlocal peak_blocks
+        blocks = sys.getallocatedblocks()
+        if blocks > peak_blocks:
+            peak_blocks = blocks
+
+    sys.setprofile(sample)
+    try:
+        result = function(activities)
+    finally:
+        sys.setprofile(None)
+    return result, peak_blocks - blocks_before
+
+
+class _NullWriter:
+    def write(self, data):
+        pass
+
+
+def _run_list(activities):
+    output = [a.get_transactions_split() for a in activities]
+    return sum(len(i) for i in output), output
+
+
+def _run_json(activities):
+    output = [a.get_transactions_split_as_json() for a in activities]
+    return sum(len(i) for i in output), output
+
+
+def _run_iter(activities):
+    return sum(1 for a in activities for _ in a.iter_transactions_split()), None
+
+
+def _run_iter_json(activities):
+    return sum(1 for a in activities for _ in a.iter_transactions_split_as_json()), None
+
+
+def _run_json_dumps(activities):
+    # What you would do without iati_activity_json
+    writer = _NullWriter()
+    rows = 0
+    for a in activities:
+        for row in a.iter_transactions_split_as_json():
+            writer.write(json.dumps(row).encode("utf-8") + b"\n")
+            rows += 1
+    return rows, None
+
+
+def _run_json_lines(activities):
+    return write_transactions_split_as_json_lines(activities, _NullWriter()), None
+
+
+def _run_columns(activities):
+    output = [a.get_transactions_split_as_columns() for a in activities]
+    return sum(len(i) for i in output), output
+
+
+def _run_parquet(activities):
+    return write_parquet(activities, io.BytesIO()), None
+
+
+def _run_pool_list(activities):
+    # Split transaction objects are pickled back from the workers
+    output = [i for _, i in split_activities(activities, max_workers=2)]
+    return sum(len(i) for i in output), output
+
+
+def _run_pool_shared_memory(activities):
+    rows = 0
+    for result in split_activities_to_shared_memory(activities, max_workers=2):
+        with result:
+            rows += len(result)
+    return rows, None
+
+
+APIS: Dict[str, Callable] = {
+    "list": _run_list,
+    "json": _run_json,
+    "iter": _run_iter,
+    "iter_json": _run_iter_json,
+    "json_dumps": _run_json_dumps,
+    "json_lines": _run_json_lines,
+    "pool_list": _run_pool_list,
+    "pool_shared_memory": _run_pool_shared_memory,
+}
+if numpy is not None:
+    APIS["columns"] = _run_columns
+if pyarrow is not None:
+    APIS["parquet"] = _run_parquet
+
+
+def run_benchmark(
+    scenario: str, api: str, seed: int = 1, repeat: int = 3, scale: float = 1
+) -> dict:
+    count, kwargs = SCENARIOS[scenario]
+    count = max(1, int(count * scale))
+    function = APIS[api]
+
+    # Fresh activities for every run, so nothing is cached between runs
+    seconds = []
+    for _ in range(repeat):
+        activities = list(get_synthetic_activities(seed, count, **kwargs))
+        gc.collect()
+        start = time.perf_counter()
+        rows, output = function(activities)
+        seconds.append(time.perf_counter() - start)
+        del output
+
+    activities = list(get_synthetic_activities(seed, count, **kwargs))
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    rows, output = function(activities)
+    peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.collect()
+    kept_blocks = sys.getallocatedblocks() - blocks_before
+    del output
+
+    activities = list(get_synthetic_activities(seed, count, **kwargs))
+    gc.collect()
+    (_, output), peak_blocks = _count_peak_blocks(function, activities)
+    del output
+
+    best = min(seconds)
+    return {
+        "scenario": scenario,
+        "api": api,
+        "activities": count,
+        "rows": rows,
+        "seconds": best,
+        "rows_per_second": rows / best if best else None,
+        "peak_memory_bytes": peak_memory_bytes,
+        "peak_blocks": peak_blocks,
+        "kept_blocks": kept_blocks,
+    }
+
+
+def get_metadata(seed: int, repeat: int, scale: float) -> dict:
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "repeat": repeat,
+        "scale": scale,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--api", action="append", choices=sorted(APIS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1,
+        help="Multiply the number of activities in each scenario by this",
+    )
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument(
+        "--compare", help="Show the change in rows/second against this results file"
+    )
+    args = parser.parse_args(argv)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            for result in json.load(fp)["results"]:
+                previous[(result["scenario"], result["api"])] = result
+
+    results = []
+    print(
+        "{:<20} {:<18} {:>9} {:>14} {:>14} {:>12} {:>12} {:>8}".format(
+            "scenario",
+            "api",
+            "rows",
+            "rows/second",
+            "peak memory",
+            "peak blocks",
+            "kept blocks",
+            "change",
+        )
+    )
+    for scenario in args.scenario or SCENARIOS:
+        for api in args.api or APIS:
+            result = run_benchmark(scenario, api, args.seed, args.repeat, args.scale)
+            results.append(result)
+            change = ""
+            before = previous.get((scenario, api))
+            if before and before["rows_per_second"] and result["rows_per_second"]:
+                change = "{:+.0%}".format(
+                    result["rows_per_second"] / before["rows_per_second"] - 1
+                )
+            print(
+                "{:<20} {:<18} {:>9} {:>14.0f} {:>14} {:>12} {:>12} {:>8}".format(
+                    scenario,
+                    api,
+                    result["rows"],
+                    result["rows_per_second"] or 0,
+                    result["peak_memory_bytes"],
+                    result["peak_blocks"],
+                    result["kept_blocks"],
+                    change,
+                )
+            )
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(
+                {
+                    "metadata": get_metadata(args.seed, args.repeat, args.scale),
+                    "results": results,
+                },
+                fp,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
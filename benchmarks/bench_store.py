@@ -0,0 +1,177 @@
+"""Benchmark reading activities from IATI XML against an activity store.
+
+Run with:
+
+    python -m benchmarks.bench_store
+
+Synthetic activities are written both as IATI XML and as an activity store, then
+each is read back in full. Opening the store and building one activity from
+it are timed too, as these are what a repeat run or a single lookup costs.
+
+Then the latency of splitting one activity by iati_identifier with a
+TransactionsSplitLookup is reported as p50 and p99, for lookups of random
+activities (nearly all cache misses) and for a skewed mix where most lookups
+are of a few popular activities.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from typing import List, Optional
+
+from iati_activity_details_split_by_fields.activity_store import (
+    IATIActivityStore,
+    write_activity_store,
+)
+from iati_activity_details_split_by_fields.iati_activity_xml import (
+    iter_activities_from_xml,
+)
+from iati_activity_details_split_by_fields.split_lookup import TransactionsSplitLookup
+
+from .synthetic import get_synthetic_activities
+
+
+def write_xml(activities, path: str):
+    root = ET.Element("iati-activities", version="2.03")
+    for activity in activities:
+        element = ET.SubElement(root, "iati-activity")
+        ET.SubElement(element, "iati-identifier").text = activity.iati_identifier
+        for sector in activity.sectors:
+            ET.SubElement(
+                element,
+                "sector",
+                vocabulary=sector.vocabulary,
+                code=sector.code,
+                percentage=str(sector.percentage),
+            )
+        for name, items in (
+            ("recipient-country", activity.recipient_countries),
+            ("recipient-region", activity.recipient_regions),
+        ):
+            for item in items:
+                ET.SubElement(
+                    element, name, code=item.code, percentage=str(item.percentage)
+                )
+        for transaction in activity.transactions:
+            transaction_element = ET.SubElement(element, "transaction")
+            ET.SubElement(transaction_element, "value").text = str(transaction.value)
+            if transaction.recipient_country_code:
+                ET.SubElement(
+                    transaction_element,
+                    "recipient-country",
+                    code=transaction.recipient_country_code,
+                )
+            for sector in transaction.sectors:
+                ET.SubElement(
+                    transaction_element,
+                    "sector",
+                    vocabulary=sector.vocabulary,
+                    code=sector.code,
+                )
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def _time(function) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def get_latencies(lookup: TransactionsSplitLookup, iati_identifiers) -> dict:
+    """Returns p50 and p99 latency in seconds, and the cache hit rate"""
+    seconds = []
+    hits = lookup.hits
+    for iati_identifier in iati_identifiers:
+        start = time.perf_counter()
+        lookup.get_transactions_split_as_json(iati_identifier)
+        seconds.append(time.perf_counter() - start)
+    percentiles = statistics.quantiles(seconds, n=100)
+    return {
+        "p50": percentiles[49],
+        "p99": percentiles[98],
+        "hit_rate": (lookup.hits - hits) / len(seconds),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--activities", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        xml_path = os.path.join(directory, "activities.xml")
+        store_path = os.path.join(directory, "activities.iatistore")
+        activities = get_synthetic_activities(
+            args.seed,
+            args.activities,
+            transactions=10,
+            recipient_countries=3,
+            sectors=4,
+            transaction_level=0.5,
+        )
+        write_xml(activities, xml_path)
+        write_activity_store(iter_activities_from_xml(xml_path), store_path)
+
+        xml_seconds = _time(lambda: sum(1 for _ in iter_activities_from_xml(xml_path)))
+        open_seconds = _time(lambda: IATIActivityStore(store_path).close())
+        with IATIActivityStore(store_path) as store:
+            store_seconds = _time(lambda: sum(1 for _ in store))
+            rng = random.Random(args.seed)
+            indexes = [rng.randrange(len(store)) for _ in range(args.lookups)]
+            lookup_seconds = _time(lambda: [store[i] for i in indexes])
+
+            iati_identifiers = [store.get_iati_identifier(i) for i in indexes]
+            random_latencies = get_latencies(
+                TransactionsSplitLookup(store), iati_identifiers
+            )
+            # 90% of lookups are of 1% of the activities
+            popular = iati_identifiers[: max(1, len(store) // 100)]
+            skewed_latencies = get_latencies(
+                TransactionsSplitLookup(store),
+                [
+                    rng.choice(popular) if rng.random() < 0.9 else i
+                    for i in iati_identifiers
+                ],
+            )
+
+        print("{} activities".format(args.activities))
+        print(
+            "{:<28} {:>12} {:>12}".format("", "bytes", "seconds")
+            + "\n{:<28} {:>12} {:>12.3f}".format(
+                "read XML", os.path.getsize(xml_path), xml_seconds
+            )
+            + "\n{:<28} {:>12} {:>12.3f}".format(
+                "read store", os.path.getsize(store_path), store_seconds
+            )
+            + "\n{:<28} {:>12} {:>12.6f}".format("open store", "", open_seconds)
+            + "\n{:<28} {:>12} {:>12.6f}".format(
+                "one activity from store", "", lookup_seconds / args.lookups
+            )
+        )
+        print(
+            "\nSplit by iati_identifier ({} lookups)".format(args.lookups)
+            + "\n{:<28} {:>12} {:>12} {:>12}".format(
+                "", "p50 seconds", "p99 seconds", "hit rate"
+            )
+        )
+        for name, latencies in (
+            ("random", random_latencies),
+            ("skewed", skewed_latencies),
+        ):
+            print(
+                "{:<28} {:>12.6f} {:>12.6f} {:>12.0%}".format(
+                    name, latencies["p50"], latencies["p99"], latencies["hit_rate"]
+                )
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
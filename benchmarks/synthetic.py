@@ -0,0 +1,92 @@
+"""Seeded generators of synthetic activities for benchmarking."""
+
+import random
+from typing import Iterator
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+# A few thousand codes, like the real code lists
+COUNTRY_CODES = ["C{:03d}".format(i) for i in range(250)]
+REGION_CODES = ["R{:03d}".format(i) for i in range(50)]
+SECTOR_CODES = ["{:05d}".format(i) for i in range(11000, 13000)]
+
+
+def get_synthetic_activity(
+    rng: random.Random,
+    transactions: int = 10,
+    recipient_countries: int = 0,
+    recipient_regions: int = 0,
+    sectors: int = 0,
+    sector_vocabularies: int = 1,
+    transaction_level: float = 0,
+    iati_identifier: str = "XM-SYNTHETIC",
+) -> IATIActivity:
+    """Returns an activity with the given number of transactions and activity level
+    countries, regions and sectors. Sectors are spread over sector_vocabularies
+    vocabularies. Percentages are random and do not sum to 100.
+
+    About transaction_level of the transactions (a fraction) also declare their
+    own recipient country and sector, as some publishers do for every transaction.
+    """
+    return IATIActivity(
+        iati_identifier=iati_identifier,
+        transactions=[
+            _get_synthetic_transaction(rng, transaction_level)
+            for _ in range(transactions)
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code=code, percentage=rng.randint(1, 100))
+            for code in rng.sample(COUNTRY_CODES, recipient_countries)
+        ],
+        recipient_regions=[
+            IATIActivityRecipientRegion(
+                code=code, percentage=round(rng.uniform(0.1, 100), 1)
+            )
+            for code in rng.sample(REGION_CODES, recipient_regions)
+        ],
+        sectors=[
+            IATIActivitySector(
+                vocabulary=str(1 + i % sector_vocabularies),
+                code=code,
+                percentage=rng.randint(1, 100),
+            )
+            for i, code in enumerate(rng.sample(SECTOR_CODES, sectors))
+        ],
+    )
+
+
+def _get_synthetic_transaction(
+    rng: random.Random, transaction_level: float
+) -> IATIActivityTransaction:
+    transaction = IATIActivityTransaction(value=round(rng.uniform(1, 1_000_000), 2))
+    # Only use rng if needed, so other activities stay the same for each seed
+    if transaction_level and rng.random() < transaction_level:
+        transaction.recipient_country_code = rng.choice(COUNTRY_CODES)
+        transaction.sectors = [
+            IATIActivityTransactionSector(vocabulary="1", code=rng.choice(SECTOR_CODES))
+        ]
+    return transaction
+
+
+def get_synthetic_activities(seed: int, count: int, **kwargs) -> Iterator[IATIActivity]:
+    """Yield count activities. The same seed always gives the same activities."""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield get_synthetic_activity(
+            rng, iati_identifier="XM-SYNTHETIC-{}".format(i), **kwargs
+        )
@@ -0,0 +1,572 @@
+"""A compact binary file of activities, for splitting the same activities many
+times without reading the source data again.
+
+All the transactions, sectors, recipient countries and recipient regions of all
+the activities are held in flat typed arrays, one after the other, with arrays
+of offsets saying where each activity's (and each transaction's) entries start.
+Codes and identifiers are ids in one table of strings, with NO_CODE for None.
+Numbers are float64 with a kind (None, int or float), so they come back as the
+same type they were written as.
+
+IATIActivityStore memory maps a file and only builds the IATIActivity objects
+that are asked for, so opening a store takes the same time whatever its size.
+Damaged files raise InvalidActivityStoreError, when opened or when a damaged
+activity is built.
+Activities can be found by iati_identifier with a binary search of a sorted
+index in the file.
+Files are in the byte order of the machine that wrote them.
+"""
+
+import array
+import mmap
+import os
+import struct
+import sys
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Union
+
+from .code_table import NO_CODE, CodeTable
+from .iati_activity import IATIActivity
+from .iati_activity_recipient_country import IATIActivityRecipientCountry
+from .iati_activity_recipient_region import IATIActivityRecipientRegion
+from .iati_activity_sector import IATIActivitySector
+from .iati_activity_transaction import IATIActivityTransaction
+from .iati_activity_transaction_sector import IATIActivityTransactionSector
+
+# The usual file name extension of a store
+STORE_EXTENSION = ".iatistore"
+
+MAGIC = b"IATISTOR"
+FORMAT_VERSION = 1
+
+# Kinds of numbers
+NONE = 0
+INT = 1
+FLOAT = 2
+
+# Ints must be exact as float64
+_MAX_INT = 2**53
+
+# (name, array typecode) of each array, in the order they are in the file.
+# Offset arrays have one more entry than the things they index, so the entries
+# of thing i are from offsets[i] up to offsets[i + 1].
+SECTIONS = (
+    # The strings, as UTF-8, one after the other
+    ("string_offsets", "q"),
+    ("string_data", "B"),
+    ("activity_iati_identifier", "i"),
+    # Indexes of the activities with an iati_identifier, sorted by it
+    ("iati_identifier_index", "q"),
+    ("activity_transactions", "q"),
+    ("activity_sectors", "q"),
+    ("activity_recipient_countries", "q"),
+    ("activity_recipient_regions", "q"),
+    ("transaction_value", "d"),
+    ("transaction_value_kind", "b"),
+    ("transaction_recipient_country_code", "i"),
+    ("transaction_recipient_region_code", "i"),
+    ("transaction_sectors", "q"),
+    ("transaction_sector_vocabulary", "i"),
+    ("transaction_sector_code", "i"),
+    ("sector_vocabulary", "i"),
+    ("sector_code", "i"),
+    ("sector_percentage", "d"),
+    ("sector_percentage_kind", "b"),
+    ("recipient_country_code", "i"),
+    ("recipient_country_percentage", "d"),
+    ("recipient_country_percentage_kind", "b"),
+    ("recipient_region_code", "i"),
+    ("recipient_region_percentage", "d"),
+    ("recipient_region_percentage_kind", "b"),
+)
+
+# (offsets, the array they index into, the array with one entry for each thing
+# they index or None)
+_OFFSETS = (
+    ("string_offsets", "string_data", None),
+    ("activity_transactions", "transaction_value", "activity_iati_identifier"),
+    ("activity_sectors", "sector_code", "activity_iati_identifier"),
+    (
+        "activity_recipient_countries",
+        "recipient_country_code",
+        "activity_iati_identifier",
+    ),
+    ("activity_recipient_regions", "recipient_region_code", "activity_iati_identifier"),
+    ("transaction_sectors", "transaction_sector_code", "transaction_value"),
+)
+
+# Arrays with one entry each for the same things, so of the same length
+_PARALLEL = (
+    (
+        "transaction_value",
+        "transaction_value_kind",
+        "transaction_recipient_country_code",
+        "transaction_recipient_region_code",
+    ),
+    ("transaction_sector_vocabulary", "transaction_sector_code"),
+    ("sector_vocabulary", "sector_code", "sector_percentage", "sector_percentage_kind"),
+    (
+        "recipient_country_code",
+        "recipient_country_percentage",
+        "recipient_country_percentage_kind",
+    ),
+    (
+        "recipient_region_code",
+        "recipient_region_percentage",
+        "recipient_region_percentage_kind",
+    ),
+)
+
+# Magic, format version, byte order ("l" or "b") and number of arrays, then the
+# start and the length in bytes of each array
+_HEADER = struct.Struct("<8sIcxxxI")
+_SECTION = struct.Struct("<qq")
+# Arrays start at multiples of this
+_ALIGNMENT = 8
+
+
+class InvalidActivityStoreError(ValueError):
+    """A file is not an activity store that can be read here"""
+
+
+def write_activity_store(
+    activities: Iterable[IATIActivity], where: Union[str, IO[bytes]]
+) -> int:
+    """Write activities to a store, at a path or to a binary file.
+
+    Codes and identifiers must be strings or None, and transaction values and
+    percentages ints (up to 2 ** 53), floats or None.
+    Returns the number of activities written.
+    """
+    writer = _StoreWriter()
+    for activity in activities:
+        writer.add_activity(activity)
+    if isinstance(where, str):
+        with open(where, "wb") as fp:
+            writer.write(fp)
+    else:
+        writer.write(where)
+    return writer.activities_count
+
+
+class IATIActivityStore:
+    """Activities in a store file, read by index.
+
+    store[i] builds a new IATIActivity from the file each time. Iterating
+    yields them all in order. get_activity and find look activities up by
+    iati_identifier. Call close() (or use this as a context manager) once
+    finished.
+
+    The layout of the file is checked when it is opened, and the entries of
+    each activity when it is built, so a damaged file raises
+    InvalidActivityStoreError.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fp:
+            if os.fstat(fp.fileno()).st_size < _HEADER.size:
+                raise InvalidActivityStoreError("Not an activity store: too short")
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        # The arrays, by name
+        self._arrays: Dict[str, memoryview] = {}
+        # The length of the array each offsets array indexes into, by its name
+        self._lengths: Dict[str, int] = {}
+        try:
+            self._load()
+        except BaseException:
+            self.close()
+            raise
+        self._strings_count = len(self._arrays["string_offsets"]) - 1
+        # Decoded strings, by id, so each is only decoded once
+        self._strings: Dict[int, str] = {}
+
+    def _load(self):
+        magic, version, byteorder, sections_count = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise InvalidActivityStoreError("Not an activity store")
+        if version != FORMAT_VERSION or sections_count != len(SECTIONS):
+            raise InvalidActivityStoreError(
+                "Unsupported activity store format version {}".format(version)
+            )
+        if byteorder != sys.byteorder[0].encode("ascii"):
+            raise InvalidActivityStoreError(
+                "Activity store written on a machine with a different byte order"
+            )
+        buffer = memoryview(self._mmap)
+        self._views.append(buffer)
+        for i, (name, typecode) in enumerate(SECTIONS):
+            start, size = _SECTION.unpack_from(
+                self._mmap, _HEADER.size + i * _SECTION.size
+            )
+            if start < 0 or size < 0:
+                raise InvalidActivityStoreError(
+                    "Activity store has a bad {} section".format(name)
+                )
+            if start + size > len(self._mmap):
+                raise InvalidActivityStoreError("Activity store is truncated")
+            itemsize = struct.calcsize(typecode)
+            if start % itemsize or size % itemsize:
+                raise InvalidActivityStoreError(
+                    "Activity store {} section is not aligned".format(name)
+                )
+            view = buffer[start : start + size].cast(typecode)
+            self._views.append(view)
+            self._arrays[name] = view
+
+        # Only the ends of the offsets are checked here, so opening takes the
+        # same time whatever the size. The offsets of each activity are checked
+        # when it is built.
+        for offsets_name, name, counted_name in _OFFSETS:
+            offsets = self._arrays[offsets_name]
+            if (
+                not offsets
+                or offsets[0] != 0
+                or offsets[-1] != len(self._arrays[name])
+                or (
+                    counted_name is not None
+                    and len(offsets) != len(self._arrays[counted_name]) + 1
+                )
+            ):
+                raise InvalidActivityStoreError(
+                    "Activity store has bad offsets in {}".format(offsets_name)
+                )
+            self._lengths[offsets_name] = len(self._arrays[name])
+        for names in _PARALLEL:
+            if len({len(self._arrays[i]) for i in names}) != 1:
+                raise InvalidActivityStoreError(
+                    "Activity store has arrays of different lengths: {}".format(
+                        ", ".join(names)
+                    )
+                )
+
+    def __len__(self):
+        return len(self._arrays["activity_iati_identifier"])
+
+    def __getitem__(self, index: int) -> IATIActivity:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("activity index out of range")
+        return self._get_activity(index)
+
+    def __iter__(self) -> Iterator[IATIActivity]:
+        for index in range(len(self)):
+            yield self._get_activity(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # Views must be released before the map can be closed
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def get_iati_identifier(self, index: int) -> Optional[str]:
+        """Returns the iati_identifier of an activity, without building it"""
+        return self._get_string(self._arrays["activity_iati_identifier"][index])
+
+    def find(self, iati_identifier: str) -> Optional[int]:
+        """Returns the index of the activity with an iati_identifier, or None.
+
+        If several activities have it, this is the first of them.
+        Only the identifiers compared in a binary search are read.
+        """
+        iati_identifier_index = self._arrays["iati_identifier_index"]
+        low = 0
+        high = len(iati_identifier_index)
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_index_iati_identifier(middle) < iati_identifier:
+                low = middle + 1
+            else:
+                high = middle
+        if (
+            low < len(iati_identifier_index)
+            and self._get_index_iati_identifier(low) == iati_identifier
+        ):
+            return iati_identifier_index[low]
+        return None
+
+    def _get_index_iati_identifier(self, position: int) -> str:
+        """Returns the iati_identifier of entry position in the index"""
+        index = self._arrays["iati_identifier_index"][position]
+        if not 0 <= index < len(self):
+            raise InvalidActivityStoreError(
+                "Activity {} in the index is not in the store".format(index)
+            )
+        iati_identifier = self.get_iati_identifier(index)
+        # Activities in the index always have an iati_identifier
+        if iati_identifier is None:
+            raise InvalidActivityStoreError(
+                "Activity {} in the index has no iati_identifier".format(index)
+            )
+        return iati_identifier
+
+    def get_activity(self, iati_identifier: str) -> IATIActivity:
+        """Returns the activity with an iati_identifier, building only that one.
+
+        Raises KeyError if there is none.
+        """
+        index = self.find(iati_identifier)
+        if index is None:
+            raise KeyError(iati_identifier)
+        return self._get_activity(index)
+
+    def _get_range(self, offsets_name: str, index: int) -> range:
+        """Returns the range of the entries of the thing at index, from the
+        offsets array offsets_name"""
+        offsets = self._arrays[offsets_name]
+        start = offsets[index]
+        end = offsets[index + 1]
+        if not 0 <= start <= end <= self._lengths[offsets_name]:
+            raise InvalidActivityStoreError(
+                "Activity store has bad offsets in {}".format(offsets_name)
+            )
+        return range(start, end)
+
+    def _get_string(self, string_id: int) -> Optional[str]:
+        if string_id == NO_CODE:
+            return None
+        string = self._strings.get(string_id)
+        if string is None:
+            if not 0 <= string_id < self._strings_count:
+                raise InvalidActivityStoreError(
+                    "Activity store has a bad string id {}".format(string_id)
+                )
+            string_range = self._get_range("string_offsets", string_id)
+            data = self._arrays["string_data"][string_range.start : string_range.stop]
+            try:
+                string = self._strings[string_id] = str(data, "utf-8")
+            except UnicodeDecodeError as error:
+                raise InvalidActivityStoreError(
+                    "Activity store has a bad string: {}".format(error)
+                )
+            finally:
+                data.release()
+        return string
+
+    def _get_activity(self, index: int) -> IATIActivity:
+        arrays = self._arrays
+        get_string = self._get_string
+
+        transactions = []
+        for i in self._get_range("activity_transactions", index):
+            transactions.append(
+                IATIActivityTransaction(
+                    value=_get_number(
+                        arrays["transaction_value"][i],
+                        arrays["transaction_value_kind"][i],
+                    ),
+                    sectors=[
+                        IATIActivityTransactionSector(
+                            vocabulary=get_string(
+                                arrays["transaction_sector_vocabulary"][j]
+                            ),
+                            code=get_string(arrays["transaction_sector_code"][j]),
+                        )
+                        for j in self._get_range("transaction_sectors", i)
+                    ],
+                    recipient_country_code=get_string(
+                        arrays["transaction_recipient_country_code"][i]
+                    ),
+                    recipient_region_code=get_string(
+                        arrays["transaction_recipient_region_code"][i]
+                    ),
+                )
+            )
+
+        return IATIActivity(
+            iati_identifier=get_string(arrays["activity_iati_identifier"][index]),
+            transactions=transactions,
+            sectors=[
+                IATIActivitySector(
+                    vocabulary=get_string(arrays["sector_vocabulary"][i]),
+                    code=get_string(arrays["sector_code"][i]),
+                    percentage=_get_number(
+                        arrays["sector_percentage"][i],
+                        arrays["sector_percentage_kind"][i],
+                    ),
+                )
+                for i in self._get_range("activity_sectors", index)
+            ],
+            recipient_countries=[
+                IATIActivityRecipientCountry(
+                    code=get_string(arrays["recipient_country_code"][i]),
+                    percentage=_get_number(
+                        arrays["recipient_country_percentage"][i],
+                        arrays["recipient_country_percentage_kind"][i],
+                    ),
+                )
+                for i in self._get_range("activity_recipient_countries", index)
+            ],
+            recipient_regions=[
+                IATIActivityRecipientRegion(
+                    code=get_string(arrays["recipient_region_code"][i]),
+                    percentage=_get_number(
+                        arrays["recipient_region_percentage"][i],
+                        arrays["recipient_region_percentage_kind"][i],
+                    ),
+                )
+                for i in self._get_range("activity_recipient_regions", index)
+            ],
+        )
+
+
+class _StoreWriter:
+    """Collects activities into arrays, then writes them out"""
+
+    def __init__(self):
+        self.activities_count = 0
+        self._strings = CodeTable()
+        self._arrays = {name: array.array(typecode) for name, typecode in SECTIONS}
+        for name in (
+            "activity_transactions",
+            "activity_sectors",
+            "activity_recipient_countries",
+            "activity_recipient_regions",
+            "transaction_sectors",
+        ):
+            self._arrays[name].append(0)
+
+    def _get_string_id(self, string) -> int:
+        if string is not None and not isinstance(string, str):
+            raise TypeError(
+                "Codes and identifiers must be str or None, not {!r}".format(string)
+            )
+        return self._strings.get_id(string)
+
+    def _add_number(self, name: str, number):
+        if number is None:
+            kind = NONE
+            number = 0.0
+        elif isinstance(number, int) and not isinstance(number, bool):
+            if abs(number) > _MAX_INT:
+                raise ValueError("{} is too big to store exactly".format(number))
+            kind = INT
+        elif isinstance(number, float):
+            kind = FLOAT
+        else:
+            raise TypeError(
+                "Values and percentages must be int, float or None, not {!r}".format(
+                    number
+                )
+            )
+        self._arrays[name].append(number)
+        self._arrays[name + "_kind"].append(kind)
+
+    def add_activity(self, activity: IATIActivity):
+        arrays = self._arrays
+        get_string_id = self._get_string_id
+
+        arrays["activity_iati_identifier"].append(
+            get_string_id(activity.iati_identifier)
+        )
+        for transaction in activity.transactions:
+            self._add_number("transaction_value", transaction.value)
+            arrays["transaction_recipient_country_code"].append(
+                get_string_id(transaction.recipient_country_code)
+            )
+            arrays["transaction_recipient_region_code"].append(
+                get_string_id(transaction.recipient_region_code)
+            )
+            for transaction_sector in transaction.sectors:
+                arrays["transaction_sector_vocabulary"].append(
+                    get_string_id(transaction_sector.vocabulary)
+                )
+                arrays["transaction_sector_code"].append(
+                    get_string_id(transaction_sector.code)
+                )
+            arrays["transaction_sectors"].append(len(arrays["transaction_sector_code"]))
+        for sector in activity.sectors:
+            arrays["sector_vocabulary"].append(get_string_id(sector.vocabulary))
+            arrays["sector_code"].append(get_string_id(sector.code))
+            self._add_number("sector_percentage", sector.percentage)
+        for recipient_country in activity.recipient_countries:
+            arrays["recipient_country_code"].append(
+                get_string_id(recipient_country.code)
+            )
+            self._add_number(
+                "recipient_country_percentage", recipient_country.percentage
+            )
+        for recipient_region in activity.recipient_regions:
+            arrays["recipient_region_code"].append(get_string_id(recipient_region.code))
+            self._add_number("recipient_region_percentage", recipient_region.percentage)
+
+        arrays["activity_transactions"].append(len(arrays["transaction_value"]))
+        arrays["activity_sectors"].append(len(arrays["sector_code"]))
+        arrays["activity_recipient_countries"].append(
+            len(arrays["recipient_country_code"])
+        )
+        arrays["activity_recipient_regions"].append(
+            len(arrays["recipient_region_code"])
+        )
+        self.activities_count += 1
+
+    def write(self, fp: IO[bytes]):
+        string_offsets = self._arrays["string_offsets"]
+        string_data = self._arrays["string_data"]
+        string_offsets.append(0)
+        for string in self._strings.codes:
+            string_data.frombytes(string.encode("utf-8"))
+            string_offsets.append(len(string_data))
+
+        strings = self._strings.codes
+        activity_iati_identifier = self._arrays["activity_iati_identifier"]
+        self._arrays["iati_identifier_index"].extend(
+            sorted(
+                (
+                    i
+                    for i, string_id in enumerate(activity_iati_identifier)
+                    if string_id != NO_CODE
+                ),
+                # Sorting is stable, so activities with the same iati_identifier
+                # stay in order
+                key=lambda i: strings[activity_iati_identifier[i]],
+            )
+        )
+
+        sections = []
+        start = _HEADER.size + len(SECTIONS) * _SECTION.size
+        for name, _ in SECTIONS:
+            start += -start % _ALIGNMENT
+            size = len(self._arrays[name]) * self._arrays[name].itemsize
+            sections.append((start, size))
+            start += size
+
+        fp.write(
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                sys.byteorder[0].encode("ascii"),
+                len(SECTIONS),
+            )
+        )
+        for section in sections:
+            fp.write(_SECTION.pack(*section))
+        position = _HEADER.size + len(SECTIONS) * _SECTION.size
+        for (name, _), (start, size) in zip(SECTIONS, sections):
+            fp.write(b"\0" * (start - position))
+            self._arrays[name].tofile(fp)
+            position = start + size
+
+
+def _get_number(number: float, kind: int):
+    if kind == FLOAT:
+        return number
+    if kind == INT:
+        # Always written from an int, so never NaN, infinite or fractional
+        if not number.is_integer():
+            raise InvalidActivityStoreError(
+                "Activity store has a bad int {}".format(number)
+            )
+        return int(number)
+    if kind == NONE:
+        return None
+    raise InvalidActivityStoreError(
+        "Activity store has a bad kind of number {}".format(kind)
+    )
@@ -0,0 +1,84 @@
+import asyncio
+import collections
+import concurrent.futures
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple
+
+from .fan_out import estimate_fan_out
+from .iati_activity import IATIActivity
+
+
+async def split_activities_async(
+    activities: AsyncIterable[IATIActivity],
+    executor: Optional[concurrent.futures.Executor] = None,
+    offload_rows: int = 1000,
+    max_pending: int = 16,
+    as_json: bool = False,
+    minor_unit_decimals: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, object]]:
+    """Split activities from an async iterable without blocking the event loop.
+
+    Yields (index, split_transaction) for each split transaction, where index is
+    the position of the activity in the input. Rows come out in input order.
+
+    Activities that would split into at least offload_rows rows are split in
+    executor (by default, the loop's default executor; pass a
+    ProcessPoolExecutor to use more than one CPU). Smaller activities are split
+    on the loop, which is quicker than sending them elsewhere.
+
+    At most max_pending activities are read ahead of the one being yielded, so
+    activities are only taken from the input as fast as rows are consumed.
+    """
+    if max_pending < 1:
+        raise ValueError("max_pending must be at least 1")
+    loop = asyncio.get_running_loop()
+    # (index, future) for offloaded activities, (index, activity) for others
+    pending: collections.deque = collections.deque()
+    index = 0
+
+    async for activity in activities:
+        if estimate_fan_out(activity).rows_count >= offload_rows:
+            pending.append(
+                (
+                    index,
+                    loop.run_in_executor(
+                        executor, _split, activity, as_json, minor_unit_decimals
+                    ),
+                )
+            )
+        else:
+            pending.append((index, activity))
+        index += 1
+        # Yield what is ready, and wait for the first activity if too many are
+        # waiting
+        while pending and (len(pending) >= max_pending or _is_ready(pending[0][1])):
+            activity_index, future_or_activity = pending.popleft()
+            for row in await _get_results(
+                future_or_activity, as_json, minor_unit_decimals
+            ):
+                yield activity_index, row
+
+    while pending:
+        activity_index, future_or_activity = pending.popleft()
+        for row in await _get_results(future_or_activity, as_json, minor_unit_decimals):
+            yield activity_index, row
+
+
+async def _get_results(future_or_activity, as_json, minor_unit_decimals) -> list:
+    if isinstance(future_or_activity, asyncio.Future):
+        return await future_or_activity
+    results = _split(future_or_activity, as_json, minor_unit_decimals)
+    # Let other tasks run between activities split on the loop
+    await asyncio.sleep(0)
+    return results
+
+
+def _is_ready(future_or_activity) -> bool:
+    if isinstance(future_or_activity, asyncio.Future):
+        return future_or_activity.done()
+    return True
+
+
+def _split(activity: IATIActivity, as_json: bool, minor_unit_decimals):
+    if as_json:
+        return activity.get_transactions_split_as_json(minor_unit_decimals)
+    return activity.get_transactions_split(minor_unit_decimals)
@@ -0,0 +1,312 @@
+import collections
+import concurrent.futures
+import functools
+import itertools
+import os
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+
+from .code_table import CodeTable
+from .iati_activity import IATIActivity
+from .iati_activity_transaction_split_columns import (
+    IATIActivityTransactionSplitColumns,
+    _check_numpy,
+)
+
+
+def split_activities(
+    activities: Iterable[IATIActivity],
+    max_workers: Optional[int] = None,
+    chunksize: int = 100,
+    ordered: bool = True,
+    as_json: bool = False,
+    executor: Optional[concurrent.futures.Executor] = None,
+    max_pending_chunks: Optional[int] = None,
+) -> Iterator[Tuple[int, list]]:
+    """Split many activities, spreading the work over a pool of processes.
+
+    Yields (index, transactions_split) for each activity, where index is the
+    position of the activity in the input.
+    If ordered is True, results come out in the same order as the input;
+    otherwise they come out as soon as they are ready.
+
+    Activities are sent to the workers in chunks of chunksize.
+    Only max_pending_chunks chunks are in flight at once (by default, two per
+    worker) so activities are read from the input as they are needed.
+
+    Pass max_workers=0 to split in this process without a pool, or pass an
+    executor to use one you have already set up.
+    """
+    split_chunk = functools.partial(_split_chunk, as_json=as_json)
+    for start, results in _map_chunks(
+        split_chunk,
+        activities,
+        max_workers,
+        chunksize,
+        ordered,
+        executor,
+        max_pending_chunks,
+    ):
+        for offset, transactions_split in enumerate(results):
+            yield start + offset, transactions_split
+
+
+class ActivitySplitChange:
+    """How the split of one activity has changed since the previous run"""
+
+    ADDED = "added"
+    CHANGED = "changed"
+    REMOVED = "removed"
+
+    __slots__ = ("status", "iati_identifier", "fingerprint", "transactions_split")
+
+    def __init__(
+        self,
+        status: str,
+        iati_identifier: str,
+        fingerprint: Optional[str] = None,
+        transactions_split: Optional[list] = None,
+    ):
+        self.status = status
+        self.iati_identifier = iati_identifier
+        # None if removed
+        self.fingerprint = fingerprint
+        # The complete new split, which replaces the old one. Empty if removed.
+        self.transactions_split = (
+            transactions_split if transactions_split is not None else []
+        )
+
+
+def split_activities_incremental(
+    activities: Iterable[IATIActivity],
+    previous_fingerprints: Mapping[str, str],
+    current_fingerprints: Optional[MutableMapping[str, str]] = None,
+    max_workers: Optional[int] = None,
+    chunksize: int = 100,
+    ordered: bool = True,
+    as_json: bool = False,
+    executor: Optional[concurrent.futures.Executor] = None,
+    max_pending_chunks: Optional[int] = None,
+) -> Iterator[ActivitySplitChange]:
+    """Split only the activities that have changed since a previous run.
+
+    previous_fingerprints maps iati_identifier to IATIActivity.get_fingerprint()
+    from the previous run. Activities with the same fingerprint are skipped.
+    Yields an ActivitySplitChange for each added or changed activity, with its new
+    split, then one for each activity in previous_fingerprints that was not seen.
+
+    Every activity must have an iati_identifier. If current_fingerprints is given,
+    the fingerprints of all activities seen are put in it, ready for the next run.
+    Takes the same pool options as split_activities.
+    """
+    if current_fingerprints is None:
+        current_fingerprints = {}
+    # (status, iati_identifier, fingerprint) of activities sent to be split, by index
+    pending: dict = {}
+    indexes = itertools.count()
+
+    def get_changed_activities():
+        for activity in activities:
+            if activity.iati_identifier is None:
+                raise ValueError("Activities must have an iati_identifier")
+            fingerprint = activity.get_fingerprint()
+            current_fingerprints[activity.iati_identifier] = fingerprint
+            previous_fingerprint = previous_fingerprints.get(activity.iati_identifier)
+            if previous_fingerprint == fingerprint:
+                continue
+            pending[next(indexes)] = (
+                (
+                    ActivitySplitChange.ADDED
+                    if previous_fingerprint is None
+                    else ActivitySplitChange.CHANGED
+                ),
+                activity.iati_identifier,
+                fingerprint,
+            )
+            yield activity
+
+    for index, transactions_split in split_activities(
+        get_changed_activities(),
+        max_workers=max_workers,
+        chunksize=chunksize,
+        ordered=ordered,
+        as_json=as_json,
+        executor=executor,
+        max_pending_chunks=max_pending_chunks,
+    ):
+        status, iati_identifier, fingerprint = pending.pop(index)
+        yield ActivitySplitChange(
+            status, iati_identifier, fingerprint, transactions_split
+        )
+
+    for iati_identifier in previous_fingerprints:
+        if iati_identifier not in current_fingerprints:
+            yield ActivitySplitChange(ActivitySplitChange.REMOVED, iati_identifier)
+
+
+def split_activities_as_columns(
+    activities: Iterable[IATIActivity],
+    max_workers: Optional[int] = None,
+    chunksize: int = 100,
+    executor: Optional[concurrent.futures.Executor] = None,
+    max_pending_chunks: Optional[int] = None,
+) -> IATIActivityTransactionSplitColumns:
+    """Split many activities into one IATIActivityTransactionSplitColumns.
+
+    activity_index is the position of the activity in the input.
+    Takes the same pool options as split_activities. Needs NumPy.
+    """
+    _check_numpy()
+    return IATIActivityTransactionSplitColumns.concatenate(
+        [
+            results
+            for _, results in _map_chunks(
+                _split_chunk_as_columns,
+                activities,
+                max_workers,
+                chunksize,
+                True,
+                executor,
+                max_pending_chunks,
+            )
+        ]
+    )
+
+
+def _map_chunks(
+    split_chunk: Callable,
+    activities: Iterable[IATIActivity],
+    max_workers: Optional[int],
+    chunksize: int,
+    ordered: bool,
+    executor: Optional[concurrent.futures.Executor],
+    max_pending_chunks: Optional[int],
+    discard: Optional[Callable] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """Calls split_chunk(start, chunk) on each chunk and yields (start, result).
+
+    If this is closed early, discard is called with the result of each chunk
+    that was still being split, once it is ready.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+
+    chunks = _get_chunks(activities, chunksize)
+
+    if max_workers == 0 and executor is None:
+        for start, chunk in chunks:
+            yield start, split_chunk(start, chunk)
+        return
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_pending_chunks is None:
+        max_pending_chunks = max_workers * 2
+
+    if executor is None:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers
+        ) as own_executor:
+            yield from _map_chunks_with_executor(
+                own_executor,
+                split_chunk,
+                chunks,
+                ordered,
+                max_pending_chunks,
+                discard,
+            )
+    else:
+        yield from _map_chunks_with_executor(
+            executor, split_chunk, chunks, ordered, max_pending_chunks, discard
+        )
+
+
+def _get_chunks(
+    activities: Iterable[IATIActivity], chunksize: int
+) -> Iterator[Tuple[int, List[IATIActivity]]]:
+    iterator = iter(activities)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _split_chunk(
+    start: int, activities: List[IATIActivity], as_json: bool
+) -> List[list]:
+    if as_json:
+        return [a.get_transactions_split_as_json() for a in activities]
+    return [a.get_transactions_split() for a in activities]
+
+
+def _split_chunk_as_columns(
+    start: int, activities: List[IATIActivity]
+) -> IATIActivityTransactionSplitColumns:
+    code_table = CodeTable()
+    return IATIActivityTransactionSplitColumns.concatenate(
+        [
+            a.get_transactions_split_as_columns(
+                activity_index=start + offset, code_table=code_table
+            )
+            for offset, a in enumerate(activities)
+        ],
+        code_table,
+    )
+
+
+def _map_chunks_with_executor(
+    executor: concurrent.futures.Executor,
+    split_chunk: Callable,
+    chunks: Iterator[Tuple[int, List[IATIActivity]]],
+    ordered: bool,
+    max_pending_chunks: int,
+    discard: Optional[Callable] = None,
+) -> Iterator[Tuple[int, Any]]:
+    pending_in_order: collections.deque = collections.deque()
+    pending: dict = {}
+    try:
+        if ordered:
+            for start, chunk in chunks:
+                pending_in_order.append(
+                    (start, executor.submit(split_chunk, start, chunk))
+                )
+                if len(pending_in_order) >= max_pending_chunks:
+                    start, future = pending_in_order.popleft()
+                    yield start, future.result()
+            while pending_in_order:
+                start, future = pending_in_order.popleft()
+                yield start, future.result()
+
+        else:
+            for start, chunk in chunks:
+                pending[executor.submit(split_chunk, start, chunk)] = start
+                if len(pending) >= max_pending_chunks:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        yield pending.pop(future), future.result()
+            for future in concurrent.futures.as_completed(list(pending)):
+                yield pending.pop(future), future.result()
+
+    finally:
+        if discard is not None:
+            for future in [i for _, i in pending_in_order] + list(pending):
+                future.add_done_callback(functools.partial(_discard_result, discard))
+
+
+def _discard_result(discard: Callable, future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is None:
+        discard(future.result())
@@ -0,0 +1,216 @@
+import json
+import sqlite3
+import time
+from typing import Optional, Tuple
+
+from . import iati_activity as iati_activity_module
+from .iati_activity import IATIActivity
+from .iati_activity_transaction_sector import IATIActivityTransactionSector
+from .iati_activity_transaction_split import IATIActivityTransactionSplit
+
+# How many hits to remember before writing when they were used to the file
+LAST_USED_BATCH_SIZE = 100
+
+# How many of the least recently used entries to read at a time when evicting
+EVICT_BATCH_SIZE = 100
+
+
+class TransactionsSplitCache:
+    """A cache of split transactions in a local SQLite file.
+
+    Entries are keyed by IATIActivity.get_fingerprint(), so any job on the same
+    host can reuse a split if the activity has not changed, whatever its
+    iati_identifier. Entries split with a different SPLIT_RULES_VERSION are
+    removed when the cache is opened.
+
+    When there are more than max_entries entries, or (if set) their size is more
+    than max_bytes, the least recently used ones are removed.
+    hits and misses count lookups made through this object.
+
+    The number of entries and their size are kept up to date by triggers, so
+    checking the limits does not need to read the whole table. When entries
+    were last used is written in batches of LAST_USED_BATCH_SIZE hits, and when
+    anything is evicted or the cache is closed.
+    """
+
+    def __init__(
+        self, path: str, max_entries: int = 100000, max_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._version = iati_activity_module.SPLIT_RULES_VERSION
+        # When entries were last used, by key, not yet written to the file
+        self._last_used: dict = {}
+        self._connection = sqlite3.connect(path, timeout=30)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS transactions_split ("
+                "key TEXT PRIMARY KEY, "
+                "version INTEGER NOT NULL, "
+                "value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "last_used INTEGER NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS transactions_split_last_used "
+                "ON transactions_split (last_used)"
+            )
+            # One row holding the number of entries and their total size
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS transactions_split_totals ("
+                "entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+            if (
+                self._connection.execute(
+                    "SELECT COUNT(*) FROM transactions_split_totals"
+                ).fetchone()[0]
+                == 0
+            ):
+                # A new file, or one made before the totals were kept
+                self._connection.execute(
+                    "INSERT INTO transactions_split_totals "
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transactions_split"
+                )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS transactions_split_insert "
+                "AFTER INSERT ON transactions_split BEGIN "
+                "UPDATE transactions_split_totals "
+                "SET entries = entries + 1, bytes = bytes + new.size; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS transactions_split_delete "
+                "AFTER DELETE ON transactions_split BEGIN "
+                "UPDATE transactions_split_totals "
+                "SET entries = entries - 1, bytes = bytes - old.size; END"
+            )
+            self._connection.execute(
+                "CREATE TRIGGER IF NOT EXISTS transactions_split_update "
+                "AFTER UPDATE OF size ON transactions_split BEGIN "
+                "UPDATE transactions_split_totals "
+                "SET bytes = bytes - old.size + new.size; END"
+            )
+            self._connection.execute(
+                "DELETE FROM transactions_split WHERE version != ?", (self._version,)
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._get_totals()[0]
+
+    def close(self):
+        with self._connection:
+            self._write_last_used()
+        self._connection.close()
+
+    def clear(self):
+        self._last_used.clear()
+        with self._connection:
+            self._connection.execute("DELETE FROM transactions_split")
+
+    def get_transactions_split(
+        self, iati_activity: IATIActivity, minor_unit_decimals: Optional[int] = None
+    ):
+        """Returns the same as iati_activity.get_transactions_split"""
+        return [
+            IATIActivityTransactionSplit(
+                value=i["value"],
+                sectors=[
+                    IATIActivityTransactionSector(
+                        vocabulary=j["vocabulary"], code=j["code"]
+                    )
+                    for j in i["sectors"]
+                ],
+                recipient_country_code=i["recipient_country_code"],
+                recipient_region_code=i["recipient_region_code"],
+            )
+            for i in self.get_transactions_split_as_json(
+                iati_activity, minor_unit_decimals
+            )
+        ]
+
+    def get_transactions_split_as_json(
+        self, iati_activity: IATIActivity, minor_unit_decimals: Optional[int] = None
+    ):
+        """Returns the same as iati_activity.get_transactions_split_as_json"""
+        key = "{}:{}:{}".format(
+            self._version, minor_unit_decimals, iati_activity.get_fingerprint()
+        )
+        row = self._connection.execute(
+            "SELECT value FROM transactions_split WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self.hits += 1
+            self._last_used[key] = time.time_ns()
+            if len(self._last_used) >= LAST_USED_BATCH_SIZE:
+                with self._connection:
+                    self._write_last_used()
+            return json.loads(row[0])
+
+        self.misses += 1
+        results = iati_activity.get_transactions_split_as_json(minor_unit_decimals)
+        value = json.dumps(results, separators=(",", ":")).encode("utf-8")
+        with self._connection:
+            # Not INSERT OR REPLACE, which would not run the delete trigger
+            self._connection.execute(
+                "INSERT INTO transactions_split "
+                "(key, version, value, size, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                "size = excluded.size, last_used = excluded.last_used",
+                (key, self._version, value, len(value), time.time_ns()),
+            )
+            self._evict()
+        return results
+
+    def _get_totals(self) -> Tuple[int, int]:
+        """Returns the number of entries and their total size"""
+        return self._connection.execute(
+            "SELECT entries, bytes FROM transactions_split_totals"
+        ).fetchone()
+
+    def _write_last_used(self):
+        if self._last_used:
+            self._connection.executemany(
+                "UPDATE transactions_split SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self._last_used.items()],
+            )
+            self._last_used.clear()
+
+    def _evict(self):
+        entries, size = self._get_totals()
+        if entries <= self.max_entries and (
+            self.max_bytes is None or size <= self.max_bytes
+        ):
+            return
+        # Hits must be written first, or recently used entries would be evicted
+        self._write_last_used()
+        # Read the least recently used entries through the last_used index, until
+        # enough have been found to get back under the limits
+        keys = []
+        while entries > self.max_entries or (
+            self.max_bytes is not None and size > self.max_bytes
+        ):
+            batch = self._connection.execute(
+                "SELECT key, size FROM transactions_split "
+                "ORDER BY last_used LIMIT ? OFFSET ?",
+                (EVICT_BATCH_SIZE, len(keys)),
+            ).fetchall()
+            if not batch:
+                break
+            for key, key_size in batch:
+                keys.append((key,))
+                entries -= 1
+                size -= key_size
+                if entries <= self.max_entries and (
+                    self.max_bytes is None or size <= self.max_bytes
+                ):
+                    break
+        self._connection.executemany(
+            "DELETE FROM transactions_split WHERE key = ?", keys
+        )
@@ -0,0 +1,177 @@
+import argparse
+import csv
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import IO, Iterator, List, Optional
+
+from .activity_store import (
+    STORE_EXTENSION,
+    IATIActivityStore,
+    InvalidActivityStoreError,
+)
+from .batch import split_activities
+from .iati_activity import IATIActivity
+from .iati_activity_json import split_activities_as_json_lines
+from .iati_activity_xml import iter_activities_from_xml
+
+CSV_COLUMNS = [
+    "iati_identifier",
+    "value",
+    "recipient_country_code",
+    "recipient_region_code",
+    "sector_vocabulary",
+    "sector_code",
+]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="iati-activity-details-split-by-fields",
+        description="Split the transactions in IATI activity files "
+        "by country, region and sector.",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="IATI activity XML files or activity stores (" + STORE_EXTENSION + "), "
+        "or directories to search for them",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["jsonl", "csv"],
+        default="jsonl",
+        help="Output format (default: jsonl)",
+    )
+    parser.add_argument(
+        "--output", default="-", help="File to write to (default: standard output)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of worker processes (default: 0, split in this process)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=100,
+        help="Number of activities to send to a worker at once (default: 100)",
+    )
+    args = parser.parse_args(argv)
+
+    cli = _CLI(_get_files(args.inputs))
+    start = time.perf_counter()
+
+    if args.format == "csv":
+        if args.output == "-":
+            cli.write_csv(sys.stdout, args.workers, args.chunksize)
+        else:
+            with open(args.output, "w", newline="", encoding="utf-8") as output:
+                cli.write_csv(output, args.workers, args.chunksize)
+    else:
+        if args.output == "-":
+            cli.write_json_lines(sys.stdout.buffer, args.workers, args.chunksize)
+        else:
+            with open(args.output, "wb") as binary_output:
+                cli.write_json_lines(binary_output, args.workers, args.chunksize)
+
+    seconds = time.perf_counter() - start
+    print(
+        "Split {} activities from {} files into {} rows in {:.2f} seconds "
+        "({:.0f} activities/second, {:.0f} rows/second)".format(
+            cli.activities_count,
+            len(cli.files) - len(cli.failed_files),
+            cli.rows_count,
+            seconds,
+            cli.activities_count / seconds if seconds else 0,
+            cli.rows_count / seconds if seconds else 0,
+        ),
+        file=sys.stderr,
+    )
+    return 1 if cli.failed_files else 0
+
+
+class _CLI:
+
+    def __init__(self, files: List[str]):
+        self.files: List[str] = files
+        self.failed_files: List[str] = []
+        self.activities_count: int = 0
+        self.rows_count: int = 0
+        # iati-identifier of activities sent to be split, by index
+        self._iati_identifiers: dict = {}
+
+    def write_csv(self, output: IO[str], workers: int, chunksize: int):
+        writer = csv.writer(output)
+        writer.writerow(CSV_COLUMNS)
+        for index, results in split_activities(
+            self._get_activities(),
+            max_workers=workers,
+            chunksize=chunksize,
+            as_json=True,
+        ):
+            iati_identifier = self._iati_identifiers.pop(index)
+            self.activities_count += 1
+            self.rows_count += len(results)
+            for result in results:
+                # One CSV row per sector, with the same value
+                for sector in result["sectors"] or [{}]:
+                    writer.writerow(
+                        [
+                            iati_identifier,
+                            result["value"],
+                            result["recipient_country_code"],
+                            result["recipient_region_code"],
+                            sector.get("vocabulary"),
+                            sector.get("code"),
+                        ]
+                    )
+
+    def write_json_lines(self, output: IO[bytes], workers: int, chunksize: int):
+        for index, rows_count, json_lines in split_activities_as_json_lines(
+            self._get_activities(),
+            include_iati_identifier=True,
+            max_workers=workers,
+            chunksize=chunksize,
+        ):
+            self._iati_identifiers.pop(index)
+            self.activities_count += 1
+            self.rows_count += rows_count
+            output.write(json_lines)
+
+    def _get_activities(self) -> Iterator[IATIActivity]:
+        index = 0
+        for file in self.files:
+            try:
+                for iati_activity in _iter_activities_from_file(file):
+                    self._iati_identifiers[index] = iati_activity.iati_identifier
+                    index += 1
+                    yield iati_activity
+            except (ET.ParseError, InvalidActivityStoreError, OSError) as error:
+                print("Could not read {}: {}".format(file, error), file=sys.stderr)
+                self.failed_files.append(file)
+
+
+def _iter_activities_from_file(file: str) -> Iterator[IATIActivity]:
+    if file.lower().endswith(STORE_EXTENSION):
+        with IATIActivityStore(file) as store:
+            yield from store
+    else:
+        yield from iter_activities_from_xml(file)
+
+
+def _get_files(inputs: List[str]) -> List[str]:
+    files: List[str] = []
+    for input in inputs:
+        if os.path.isdir(input):
+            for directory, _, filenames in sorted(os.walk(input)):
+                files.extend(
+                    os.path.join(directory, i)
+                    for i in sorted(filenames)
+                    if i.lower().endswith((".xml", STORE_EXTENSION))
+                )
+        else:
+            files.append(input)
+    return files
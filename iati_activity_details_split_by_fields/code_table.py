@@ -0,0 +1,66 @@
+from typing import Hashable, Iterable, List, Optional
+
+# The id of a missing code (None)
+NO_CODE = -1
+
+
+class CodeTable:
+    """Gives each code a small integer id: its position in codes.
+
+    Ids are given out in the order codes are first seen and never change, so
+    rows can hold ids (for example in int32 arrays) and only be turned back
+    into codes when they are written out. None always has the id NO_CODE.
+    """
+
+    __slots__ = ("codes", "_ids")
+
+    def __init__(self, codes: Optional[Iterable[Hashable]] = None):
+        self.codes: List[Hashable] = []
+        self._ids: dict = {None: NO_CODE}
+        for code in codes or []:
+            self.get_id(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code is not None and code in self._ids
+
+    def __getstate__(self):
+        return self.codes
+
+    def __setstate__(self, codes):
+        self.codes = []
+        self._ids = {None: NO_CODE}
+        for code in codes:
+            self.get_id(code)
+
+    def get_id(self, code) -> int:
+        """Returns the id of code, giving it the next id if it is new"""
+        code_id = self._ids.get(code)
+        if code_id is None:
+            code_id = self._ids[code] = len(self.codes)
+            self.codes.append(code)
+        return code_id
+
+    def get_ids(self, codes: Iterable) -> List[int]:
+        get_id = self.get_id
+        return [get_id(code) for code in codes]
+
+    def get_code(self, code_id: int):
+        """Returns the code with an id, or None for NO_CODE"""
+        if code_id == NO_CODE:
+            return None
+        return self.codes[code_id]
+
+    def get_codes(self, code_ids: Iterable[int]) -> list:
+        # The last item is for NO_CODE (-1)
+        codes = self.codes + [None]
+        return [codes[code_id] for code_id in code_ids]
+
+    def get_remapping(self, other: "CodeTable") -> List[int]:
+        """Returns the ids in this table of the codes in other, by their id in other.
+
+        Codes that are not in this table yet are added.
+        """
+        return self.get_ids(other.codes)
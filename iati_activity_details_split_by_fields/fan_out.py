@@ -0,0 +1,205 @@
+"""Working out how many rows an activity splits into, before splitting it.
+
+An activity with many countries, regions and sectors and many transactions can
+split into millions of rows. estimate_fan_out counts them exactly from the
+structure of the activity, and FanOutGuard decides what to do with activities
+that would split into too many.
+"""
+
+import sys
+from typing import Optional, Sequence
+
+from .iati_activity import IATIActivity
+from .iati_activity_transaction_split import IATIActivityTransactionSplit
+
+# Approximate memory used by each split transaction in get_transactions_split,
+# not counting the list of sectors: the object, its value and the reference to
+# it in the list returned.
+_ROW_BYTES = sys.getsizeof(IATIActivityTransactionSplit()) + sys.getsizeof(1.0) + 8
+_EMPTY_LIST_BYTES = sys.getsizeof([])
+_LIST_ITEM_BYTES = 8
+
+
+class FanOutExceededError(ValueError):
+    """An activity would split into more rows or bytes than allowed"""
+
+    def __init__(self, estimate: "FanOutEstimate", max_rows, max_bytes):
+        self.estimate = estimate
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        super().__init__(
+            "Activity {} would split into {} rows (about {} bytes); the most "
+            "allowed is {} rows and {} bytes".format(
+                estimate.iati_identifier,
+                estimate.rows_count,
+                estimate.approximate_bytes,
+                max_rows,
+                max_bytes,
+            )
+        )
+
+
+class FanOutEstimate:
+    """How big the split of an activity will be"""
+
+    __slots__ = (
+        "iati_identifier",
+        "transactions_count",
+        "rows_count",
+        "max_rows_per_transaction",
+        "approximate_bytes",
+    )
+
+    def __init__(
+        self,
+        iati_identifier: Optional[str] = None,
+        transactions_count: int = 0,
+        rows_count: int = 0,
+        max_rows_per_transaction: int = 0,
+        approximate_bytes: int = 0,
+    ):
+        self.iati_identifier = iati_identifier
+        self.transactions_count = transactions_count
+        # Exactly the number of split transactions get_transactions_split returns
+        self.rows_count = rows_count
+        self.max_rows_per_transaction = max_rows_per_transaction
+        # Roughly the memory get_transactions_split would use
+        self.approximate_bytes = approximate_bytes
+
+
+def estimate_fan_out(iati_activity: IATIActivity) -> FanOutEstimate:
+    """Returns the size of the split of an activity, without splitting it.
+
+    This takes time in proportion to the number of transactions, not rows.
+    """
+    rows_count = 0
+    max_rows_per_transaction = 0
+    approximate_bytes = 0
+    for (
+        transaction_rows_count,
+        sectors_count,
+    ) in iati_activity._iter_transactions_split_shape():
+        rows_count += transaction_rows_count
+        max_rows_per_transaction = max(max_rows_per_transaction, transaction_rows_count)
+        approximate_bytes += transaction_rows_count * (
+            _ROW_BYTES + _EMPTY_LIST_BYTES + sectors_count * _LIST_ITEM_BYTES
+        )
+    return FanOutEstimate(
+        iati_identifier=iati_activity.iati_identifier,
+        transactions_count=len(iati_activity.transactions),
+        rows_count=rows_count,
+        max_rows_per_transaction=max_rows_per_transaction,
+        approximate_bytes=approximate_bytes,
+    )
+
+
+class GuardedTransactionsSplit:
+    """The result of FanOutGuard.split.
+
+    mode is one of:
+
+    * FanOutGuard.LIST - transactions_split is a list, as get_transactions_split
+    * FanOutGuard.STREAM_ONLY - transactions_split is an iterator, as
+      iter_transactions_split, so it can only be used once
+    * FanOutGuard.AGGREGATE_ONLY - totals is a dict, as get_transactions_split_totals,
+      and transactions_split is None
+    """
+
+    __slots__ = ("mode", "estimate", "transactions_split", "totals")
+
+    def __init__(self, mode: str, estimate: FanOutEstimate, transactions_split, totals):
+        self.mode = mode
+        self.estimate = estimate
+        self.transactions_split = transactions_split
+        self.totals = totals
+
+
+class FanOutGuard:
+    """Splits activities, doing something else with ones that would be too big.
+
+    An activity is too big if it would split into more than max_rows rows, or
+    (if set) use more than about max_bytes bytes. What happens then depends on
+    policy:
+
+    * REFUSE - raise FanOutExceededError
+    * STREAM_ONLY - return an iterator of split transactions instead of a list
+    * AGGREGATE_ONLY - return only totals by dimensions (see totals)
+    """
+
+    LIST = "list"
+    REFUSE = "refuse"
+    STREAM_ONLY = "stream_only"
+    AGGREGATE_ONLY = "aggregate_only"
+
+    def __init__(
+        self,
+        max_rows: int,
+        policy: str = REFUSE,
+        max_bytes: Optional[int] = None,
+        dimensions: Sequence[str] = ("recipient_country_code",),
+    ):
+        if policy not in (self.REFUSE, self.STREAM_ONLY, self.AGGREGATE_ONLY):
+            raise ValueError(
+                "Unknown policy {}; should be one of {}, {}, {}".format(
+                    policy, self.REFUSE, self.STREAM_ONLY, self.AGGREGATE_ONLY
+                )
+            )
+        self.max_rows = max_rows
+        self.policy = policy
+        self.max_bytes = max_bytes
+        self.dimensions = dimensions
+
+    def is_exceeded(self, estimate: FanOutEstimate) -> bool:
+        return estimate.rows_count > self.max_rows or (
+            self.max_bytes is not None and estimate.approximate_bytes > self.max_bytes
+        )
+
+    def check(self, iati_activity: IATIActivity) -> FanOutEstimate:
+        """Returns the estimate for an activity.
+
+        Raises FanOutExceededError if it is too big and the policy is REFUSE.
+        """
+        estimate = estimate_fan_out(iati_activity)
+        if self.policy == self.REFUSE and self.is_exceeded(estimate):
+            raise FanOutExceededError(estimate, self.max_rows, self.max_bytes)
+        return estimate
+
+    def split(
+        self,
+        iati_activity: IATIActivity,
+        as_json: bool = False,
+        minor_unit_decimals: Optional[int] = None,
+    ) -> GuardedTransactionsSplit:
+        estimate = self.check(iati_activity)
+        if not self.is_exceeded(estimate):
+            if as_json:
+                transactions_split: object = (
+                    iati_activity.get_transactions_split_as_json(minor_unit_decimals)
+                )
+            else:
+                transactions_split = iati_activity.get_transactions_split(
+                    minor_unit_decimals
+                )
+            return GuardedTransactionsSplit(
+                self.LIST, estimate, transactions_split, None
+            )
+        if self.policy == self.STREAM_ONLY:
+            if as_json:
+                transactions_split = iati_activity.iter_transactions_split_as_json(
+                    minor_unit_decimals
+                )
+            else:
+                transactions_split = iati_activity.iter_transactions_split(
+                    minor_unit_decimals
+                )
+            return GuardedTransactionsSplit(
+                self.STREAM_ONLY, estimate, transactions_split, None
+            )
+        return GuardedTransactionsSplit(
+            self.AGGREGATE_ONLY,
+            estimate,
+            None,
+            iati_activity.get_transactions_split_totals(
+                self.dimensions, minor_unit_decimals
+            ),
+        )
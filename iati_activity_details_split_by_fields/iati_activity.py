@@ -1,146 +1,719 @@
-import copy
-from typing import List
+import hashlib
+import json
+import time
+from typing import List, Optional
 
+from . import instrumentation, minor_units
+from .code_table import NO_CODE, CodeTable
 from .iati_activity_recipient_country import IATIActivityRecipientCountry
 from .iati_activity_recipient_region import IATIActivityRecipientRegion
 from .iati_activity_sector import IATIActivitySector
 from .iati_activity_transaction import IATIActivityTransaction
 from .iati_activity_transaction_sector import IATIActivityTransactionSector
 from .iati_activity_transaction_split import IATIActivityTransactionSplit
+from .iati_activity_transaction_split_columns import (
+    IATIActivityTransactionSplitColumns,
+    _check_numpy,
+    numpy,
+)
+from .normalise import NormalisedPercentage, normalise_percentages
+from .split_templates import _split_value, _TemplateCache
+from .totals import TransactionsSplitTotals
+
+# Change this whenever a change to the splitting rules changes the results,
+# so results stored by earlier versions are not used (see cache).
+SPLIT_RULES_VERSION = 2
 
 
 class IATIActivity:
 
     def __init__(
         self,
-        transactions: List[IATIActivityTransaction] = [],
-        sectors: List[IATIActivitySector] = [],
-        recipient_countries: List[IATIActivityRecipientCountry] = [],
-        recipient_regions: List[IATIActivityRecipientRegion] = [],
+        transactions: Optional[List[IATIActivityTransaction]] = None,
+        sectors: Optional[List[IATIActivitySector]] = None,
+        recipient_countries: Optional[List[IATIActivityRecipientCountry]] = None,
+        recipient_regions: Optional[List[IATIActivityRecipientRegion]] = None,
+        iati_identifier: Optional[str] = None,
     ):
-        self.transactions: List[IATIActivityTransaction] = transactions
-        self.sectors: List[IATIActivitySector] = sectors
+        self.transactions: List[IATIActivityTransaction] = (
+            transactions if transactions is not None else []
+        )
+        self.sectors: List[IATIActivitySector] = sectors if sectors is not None else []
         self.recipient_countries: List[IATIActivityRecipientCountry] = (
-            recipient_countries
+            recipient_countries if recipient_countries is not None else []
         )
-        self.recipient_regions: List[IATIActivityRecipientRegion] = recipient_regions
+        self.recipient_regions: List[IATIActivityRecipientRegion] = (
+            recipient_regions if recipient_regions is not None else []
+        )
+        self.iati_identifier: Optional[str] = iati_identifier
+        # Normalised percentages, keyed by the data they were worked out from.
+        # See _get_cached_normalised_percentages
+        self._normalised_percentages_cache: dict = {}
+
+    def get_fingerprint(self) -> str:
+        """Returns a hash of everything the split depends on.
+
+        This is the transactions, sectors, recipient countries and recipient regions,
+        but not the iati_identifier. It is the same in every process and Python
+        version, so it can be stored and compared between runs. Numbers of
+        different types, such as 1000 and 1000.0, give different fingerprints, as
+        they do not always split the same (a value that is not split is
+        returned as it is).
+        """
+        content = [
+            [
+                [
+                    i.value,
+                    i.recipient_country_code,
+                    i.recipient_region_code,
+                    [[j.vocabulary, j.code] for j in i.sectors],
+                ]
+                for i in self.transactions
+            ],
+            [[i.vocabulary, i.code, i.percentage] for i in self.sectors],
+            [[i.code, i.percentage] for i in self.recipient_countries],
+            [[i.code, i.percentage] for i in self.recipient_regions],
+        ]
+        return hashlib.sha256(
+            json.dumps(content, separators=(",", ":"), default=str).encode("utf-8")
+        ).hexdigest()
+
+    def get_transactions_split(self, minor_unit_decimals: Optional[int] = None):
+        return list(self.iter_transactions_split(minor_unit_decimals))
+
+    def get_transactions_split_as_json(self, minor_unit_decimals: Optional[int] = None):
+        metrics = instrumentation._current.get()
+        if metrics is None:
+            return [
+                x.get_as_json()
+                for x in self.iter_transactions_split(minor_unit_decimals)
+            ]
+        # Split first, so converting to JSON can be timed on its own
+        transactions_split = self.get_transactions_split(minor_unit_decimals)
+        start = time.perf_counter()
+        results = [x.get_as_json() for x in transactions_split]
+        metrics.record_stage("to_json", time.perf_counter() - start)
+        return results
+
+    def get_transactions_split_totals(
+        self,
+        dimensions=("recipient_country_code",),
+        minor_unit_decimals: Optional[int] = None,
+    ):
+        """Returns totals of split transaction values, without building the split.
+
+        dimensions is a sequence of recipient_country_code, recipient_region_code,
+        sector_vocabulary and sector_code. Returns a dict of tuples of those values
+        to totals, which are exactly math.fsum of the matching split values (or
+        with minor_unit_decimals, their sum in minor units).
+        See totals.TransactionsSplitTotals.
+        """
+        totals = TransactionsSplitTotals(dimensions, minor_unit_decimals)
+        totals.add_activity(self)
+        return totals.get_totals()
+
+    def iter_transactions_split(self, minor_unit_decimals: Optional[int] = None):
+        """Yield split transactions one at a time, in the same order as get_transactions_split
+
+        By default values are split as floats.
+        If minor_unit_decimals is set, transaction values are turned into whole
+        numbers of minor units (for example, cents if it is 2) and split with the
+        largest remainder method, so the split of a transaction adds up exactly to
+        its value (within each sector vocabulary). Split values are then ints, in
+        minor units. Missing percentages count as zero. See minor_units.
+
+        Each split transaction has its own sectors, so changing one does not
+        change the others or the activity.
+        """
+        for (
+            value,
+            recipient_country_code,
+            recipient_region_code,
+            sectors,
+        ) in self._iter_transactions_split_rows(minor_unit_decimals):
+            yield IATIActivityTransactionSplit(
+                value=value,
+                # Sectors in a template are shared by many rows and by the
+                # transaction that declares them
+                sectors=[
+                    IATIActivityTransactionSector(i.vocabulary, i.code) for i in sectors
+                ],
+                recipient_country_code=recipient_country_code,
+                recipient_region_code=recipient_region_code,
+            )
+
+    def _iter_transactions_split_rows(self, minor_unit_decimals=None):
+        """Yield (value, recipient_country_code, recipient_region_code, sectors) for
+        each split transaction, where sectors is a tuple of IATIActivityTransactionSector.
+
+        This is the splitting engine; everything else is built on it.
+        See iter_transactions_split for minor_unit_decimals.
+        """
+        for values, template in self._iter_transactions_split_templates(
+            minor_unit_decimals
+        ):
+            for value, (
+                recipient_country_code,
+                recipient_region_code,
+                sectors,
+            ) in zip(values, template):
+                yield value, recipient_country_code, recipient_region_code, sectors
+
+    def _iter_transactions_split_templates(self, minor_unit_decimals=None):
+        """Yield (values, template) for each transaction.
+
+        template is a list of (recipient_country_code, recipient_region_code,
+        sectors) for each split transaction, and values the matching split values.
+        Everything in a template except the values only depends on the activity and
+        on the transaction level declarations, so transactions with the same
+        declarations get the same template object. Callers can work things out once
+        per template and reuse them.
+
+        Transaction level declarations take precedence: a transaction with a
+        recipient country or region is not split by either, and one with sectors is
+        not split by sector. Each transaction is only split by the fields it
+        does not declare itself.
+        """
+        metrics = instrumentation._current.get()
+        rows_count = 0
+        max_fan_out = 0
+        for transaction, template, levels in self._iter_transactions_split_levels(
+            minor_unit_decimals
+        ):
+            values = _split_value(
+                transaction.value, levels, minor_unit_decimals, metrics
+            )
+            if metrics is not None:
+                rows_count += len(values)
+                max_fan_out = max(max_fan_out, len(values))
+            yield values, template
+
+        if metrics is not None:
+            metrics.record_activity(self, rows_count, max_fan_out)
+
+    def _iter_transactions_split_levels(self, minor_unit_decimals=None):
+        """Yield (transaction, template, levels) for each transaction, without
+        splitting its value.
+
+        template is as in _iter_transactions_split_templates. levels is a list of
+        (stage name, percentages) for each field the transaction is split by, in
+        the same order as the template, or (stage name, splitter) if
+        minor_unit_decimals is set. Transactions with the same template get the
+        same levels object.
+        """
+        metrics = instrumentation._current.get()
+        if metrics is not None:
+            start = time.perf_counter()
 
-    def get_transactions_split(self):
-        output = [
-            IATIActivityTransactionSplit(iati_activity_transaction=i)
-            for i in self.transactions
+        # The normalised percentages only depend on the activity,
+        # so work them out once rather than once per transaction.
+        recipient_countries = (
+            self._get_recipient_countries_with_normalised_percentages()
+        )
+        recipient_regions = self._get_recipient_regions_with_normalised_percentages()
+        sectors_grouped = (
+            self._get_sectors_grouped_by_vocab_with_normalised_percentages()
+        )
+        recipient_country_codes = [i.code for i in recipient_countries]
+        recipient_region_codes = [i.code for i in recipient_regions]
+        sectors = [
+            (IATIActivityTransactionSector(iati_activity_sector=i),)
+            for vocab_sectors in sectors_grouped.values()
+            for i in vocab_sectors
         ]
 
-        # Split by recipient_countries
-        if len(self.recipient_countries) >= 1:
-            new_output = []
-            for transaction in output:
-                for (
-                    recipient_country
-                ) in self._get_recipient_countries_with_normalised_percentages():
-                    split_transaction = copy.deepcopy(transaction)
-                    split_transaction.value = (
-                        split_transaction.value * recipient_country.percentage / 100
+        # Split values field by field, in the same order as the template:
+        # countries, then regions, then sectors.
+        # Only fields split at activity level have a level, of (stage name for
+        # instrumentation, percentages or splitter).
+        levels: list = []
+        if minor_unit_decimals is None:
+            # Each output row is the transaction value multiplied down through the
+            # country, region and sector percentages, in that order.
+            # The multiplications are done in the same order as splitting by each
+            # field in turn would do them, so the values are exactly the same.
+            # (Multiplying by one combined weight per row would be less work but
+            # would round differently.)
+            for stage, normalised in (
+                ("split_recipient_countries", recipient_countries),
+                ("split_recipient_regions", recipient_regions),
+                (
+                    "split_sectors",
+                    [
+                        i
+                        for vocab_sectors in sectors_grouped.values()
+                        for i in vocab_sectors
+                    ],
+                ),
+            ):
+                if normalised:
+                    levels.append((stage, [i.percentage for i in normalised]))
+        else:
+            if recipient_country_codes:
+                levels.append(
+                    (
+                        "split_recipient_countries",
+                        minor_units.get_splitter(
+                            [i.percentage for i in self.recipient_countries]
+                        ),
+                    )
+                )
+            if recipient_region_codes:
+                levels.append(
+                    (
+                        "split_recipient_regions",
+                        minor_units.get_splitter(
+                            [i.percentage for i in self.recipient_regions]
+                        ),
+                    )
+                )
+            if sectors:
+                levels.append(
+                    (
+                        "split_sectors",
+                        minor_units.get_grouped_splitter(
+                            [
+                                [i.percentage for i in vocab_sectors]
+                                for vocab_sectors in (
+                                    self._get_sectors_grouped_by_vocab().values()
+                                )
+                            ]
+                        ),
                     )
-                    split_transaction.recipient_country_code = recipient_country.code
-                    new_output.append(split_transaction)
-            output = new_output
-
-        # Split by recipient_regions
-        if len(self.recipient_regions) >= 1:
-            new_output = []
-            for transaction in output:
-                for (
-                    recipient_region
-                ) in self._get_recipient_regions_with_normalised_percentages():
-                    split_transaction = copy.deepcopy(transaction)
-                    split_transaction.value = (
-                        split_transaction.value * recipient_region.percentage / 100
+                )
+
+        # (template, levels), by transaction level declarations
+        templates: dict = {}
+        if metrics is not None:
+            metrics.record_stage("normalise", time.perf_counter() - start)
+
+        for transaction in self.transactions:
+
+            key = _get_transaction_template_key(transaction)
+            cached = templates.get(key)
+            if cached is None:
+                if metrics is not None:
+                    start = time.perf_counter()
+                geography_declared, sectors_declared = _get_declared(key)
+                template = [
+                    (recipient_country_code, recipient_region_code, row_sectors)
+                    for recipient_country_code in (
+                        [key[0]]
+                        if geography_declared
+                        else recipient_country_codes or [None]
                     )
-                    split_transaction.recipient_region_code = recipient_region.code
-                    new_output.append(split_transaction)
-            output = new_output
-
-        # Split by Sectors
-        if len(self.sectors) >= 1:
-            sectors_grouped = (
-                self._get_sectors_grouped_by_vocab_with_normalised_percentages()
-            )
-            new_output = []
-            for transaction in output:
-                for vocab, sectors in sectors_grouped.items():
-                    for sector in sectors:
-                        split_transaction = copy.deepcopy(transaction)
-                        split_transaction.value = (
-                            split_transaction.value * sector.percentage / 100
+                    for recipient_region_code in (
+                        [key[1]]
+                        if geography_declared
+                        else recipient_region_codes or [None]
+                    )
+                    for row_sectors in (
+                        [key[2]] if sectors_declared else sectors or [()]
+                    )
+                ]
+                cached = templates[key] = (
+                    template,
+                    [
+                        level
+                        for level in levels
+                        if not (
+                            geography_declared
+                            if level[0] in _GEOGRAPHY_STAGES
+                            else sectors_declared
                         )
-                        split_transaction.sectors = [
-                            IATIActivityTransactionSector(iati_activity_sector=sector)
-                        ]
-                        new_output.append(split_transaction)
-            output = new_output
+                    ],
+                )
+                if metrics is not None:
+                    metrics.record_stage("template", time.perf_counter() - start)
+            yield transaction, cached[0], cached[1]
 
-        # Done!
-        return output
+    def _iter_transactions_split_shape(self):
+        """Yield (rows, sectors per row) for each transaction, for the split that
+        _iter_transactions_split_templates would make, without splitting."""
+        geography_rows_count = (len(self.recipient_countries) or 1) * (
+            len(self.recipient_regions) or 1
+        )
+        for transaction in self.transactions:
+            geography_declared, sectors_declared = _get_declared(
+                _get_transaction_template_key(transaction)
+            )
+            rows_count = 1 if geography_declared else geography_rows_count
+            if sectors_declared:
+                yield rows_count, len(transaction.sectors)
+            elif self.sectors:
+                yield rows_count * len(self.sectors), 1
+            else:
+                yield rows_count, 0
 
-    def get_transactions_split_as_json(self):
-        return [x.get_as_json() for x in self.get_transactions_split()]
+    def _iter_transactions_split_code_ids(self, get_ids):
+        """Yield (values, recipient_country_code ids, recipient_region_code ids,
+        sector_vocabulary ids, sector_code ids) for each transaction, with one row
+        per sector like get_transactions_split_as_columns.
 
-    def _get_recipient_countries_with_normalised_percentages(self):
-        """Normalise country percentages to ensure they sum to 100%"""
-        if not self.recipient_countries:
-            return []
-        total_percentage = sum(
-            country.percentage or 0 for country in self.recipient_countries
+        get_ids is a tuple of functions giving the id of a recipient country
+        code, recipient region code, sector vocabulary and sector code, as
+        CodeTable.get_id; missing sectors are NO_CODE. The ids of each template
+        are only worked out once, so must not change while this is running.
+        """
+        templates_ids = _TemplateCache(
+            lambda template: _get_template_code_ids(template, get_ids)
+        )
+        for values, template in self._iter_transactions_split_templates():
+            countries, regions, vocabularies, codes, repeats = templates_ids.get(
+                template
+            )
+            if repeats is not None:
+                values = [
+                    i for i, repeat in zip(values, repeats) for _ in range(repeat)
+                ]
+            yield values, countries, regions, vocabularies, codes
+
+    def iter_transactions_split_as_json(
+        self, minor_unit_decimals: Optional[int] = None
+    ):
+        """Yield split transactions in JSON format one at a time"""
+        for x in self.iter_transactions_split(minor_unit_decimals):
+            yield x.get_as_json()
+
+    def get_transactions_split_as_columns(
+        self, activity_index: int = 0, code_table: Optional[CodeTable] = None
+    ):
+        """Returns split transactions as parallel arrays. Needs NumPy.
+
+        Rows are in the same order as get_transactions_split, except that a split
+        transaction with several transaction level sectors becomes one row per sector.
+        Codes are held as ids in code_table; pass the same one for many activities
+        to share it. By default a new one is made.
+        """
+        _check_numpy()
+        if code_table is None:
+            code_table = CodeTable()
+
+        recipient_countries = (
+            self._get_recipient_countries_with_normalised_percentages()
+        )
+        recipient_regions = self._get_recipient_regions_with_normalised_percentages()
+        sectors = [
+            i
+            for vocab_sectors in (
+                self._get_sectors_grouped_by_vocab_with_normalised_percentages().values()
+            )
+            for i in vocab_sectors
+        ]
+
+        # A transaction is only split by the activity level fields it does not
+        # declare itself, so there are at most four ways transactions are split.
+        # The transactions split each way are split together as one outer product.
+        # Indexes of transactions, by whether the geography and the sectors
+        # declared on them skip an activity level split.
+        groups: dict = {}
+        for index, transaction in enumerate(self.transactions):
+            geography_declared, sectors_declared = _get_declared(
+                _get_transaction_template_key(transaction)
+            )
+            key = (
+                geography_declared and bool(recipient_countries or recipient_regions),
+                sectors_declared and bool(sectors),
+            )
+            indexes = groups.get(key)
+            if indexes is None:
+                groups[key] = [index]
+            else:
+                indexes.append(index)
+
+        def get_columns(transactions, geography_declared, sectors_declared):
+            return _get_transactions_split_columns(
+                transactions,
+                [] if geography_declared else recipient_countries,
+                [] if geography_declared else recipient_regions,
+                [] if sectors_declared else sectors,
+                code_table,
+            )
+
+        if len(groups) <= 1:
+            columns = get_columns(
+                self.transactions, *next(iter(groups), (False, False))
+            )
+        else:
+            groups_columns = []
+            for (geography_declared, sectors_declared), indexes in groups.items():
+                group_columns = get_columns(
+                    [self.transactions[i] for i in indexes],
+                    geography_declared,
+                    sectors_declared,
+                )
+                # From indexes in the group to indexes in the activity
+                group_columns[-1] = numpy.array(indexes, dtype=numpy.int64)[
+                    group_columns[-1]
+                ]
+                groups_columns.append(group_columns)
+            columns = [numpy.concatenate(i) for i in zip(*groups_columns)]
+            # Back in transaction order. The sort is stable, so the rows of each
+            # transaction stay in order.
+            order = numpy.argsort(columns[-1], kind="stable")
+            columns = [i[order] for i in columns]
+
+        (
+            value,
+            recipient_country_code_id,
+            recipient_region_code_id,
+            sector_vocabulary_id,
+            sector_code_id,
+            transaction_index,
+        ) = columns
+        return IATIActivityTransactionSplitColumns.from_ids(
+            code_table,
+            value=value,
+            recipient_country_code_id=recipient_country_code_id,
+            recipient_region_code_id=recipient_region_code_id,
+            sector_vocabulary_id=sector_vocabulary_id,
+            sector_code_id=sector_code_id,
+            activity_index=numpy.full(len(value), activity_index),
+            transaction_index=transaction_index,
         )
-        if total_percentage == 0:
-            return self.recipient_countries
 
-        normalized_countries = copy.deepcopy(self.recipient_countries)
+    def _get_cached_normalised_percentages(self, name: str, key: tuple, function):
+        """Returns function(), reusing the last result for name if key has not changed.
 
-        for country in normalized_countries:
-            if country.percentage:
-                country.percentage = (country.percentage / total_percentage) * 100
+        The key is built from the values the result depends on, so reassigning or
+        changing the lists (or the objects in them) is picked up on the next call.
+        Callers must not change the objects that are returned.
+        """
+        cached = self._normalised_percentages_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        result = function()
+        self._normalised_percentages_cache[name] = (key, result)
+        return result
 
-        return normalized_countries
+    def _get_recipient_countries_with_normalised_percentages(self):
+        return self._get_cached_normalised_percentages(
+            "recipient_countries",
+            tuple((i.code, i.percentage) for i in self.recipient_countries),
+            self._normalise_recipient_countries,
+        )
 
     def _get_sectors_grouped_by_vocab_with_normalised_percentages(self) -> dict:
+        return self._get_cached_normalised_percentages(
+            "sectors",
+            tuple((i.vocabulary, i.code, i.percentage) for i in self.sectors),
+            self._group_by_vocab_and_normalise_sectors,
+        )
+
+    def _get_recipient_regions_with_normalised_percentages(self):
+        return self._get_cached_normalised_percentages(
+            "recipient_regions",
+            tuple((i.code, i.percentage) for i in self.recipient_regions),
+            self._normalise_recipient_regions,
+        )
+
+    def _normalise_recipient_countries(self) -> List[NormalisedPercentage]:
+        """Normalise country percentages to ensure they sum to 100%"""
+        return [
+            NormalisedPercentage(country.code, percentage)
+            for country, percentage in zip(
+                self.recipient_countries,
+                normalise_percentages(
+                    [country.percentage for country in self.recipient_countries]
+                ),
+            )
+        ]
+
+    def _group_by_vocab_and_normalise_sectors(self) -> dict:
         """Group sectors by vocabulary and normalise percentages within each group"""
-        if not self.sectors:
-            return {}
+        grouped = self._get_sectors_grouped_by_vocab()
+        percentages = iter(
+            normalise_percentages(
+                [
+                    sector.percentage
+                    for sectors in grouped.values()
+                    for sector in sectors
+                ],
+                [len(sectors) for sectors in grouped.values()],
+                # we only normalise if we have valid percentages
+                positive_total_only=True,
+            )
+        )
+        return {
+            vocab: [
+                NormalisedPercentage(sector.code, next(percentages), sector.vocabulary)
+                for sector in sectors
+            ]
+            for vocab, sectors in grouped.items()
+        }
 
-        # First group by vocab
+    def _get_sectors_grouped_by_vocab(self) -> dict:
         grouped: dict = {}
         for sector in self.sectors:
             vocab = sector.vocabulary or "default"
             if vocab not in grouped:
                 grouped[vocab] = []
-            grouped[vocab].append(copy.deepcopy(sector))
-
-        # Now normalise percentages within each vocab group
-        for vocab, sectors in grouped.items():
-            total = sum(sector.percentage or 0 for sector in sectors)
-            if total > 0:  # we only normalise if we have valid percentages
-                for sector in sectors:
-                    if sector.percentage:
-                        sector.percentage = (sector.percentage / total) * 100
-
+            grouped[vocab].append(sector)
         return grouped
 
-    def _get_recipient_regions_with_normalised_percentages(self):
+    def _normalise_recipient_regions(self) -> List[NormalisedPercentage]:
         """Normalise region percentages to ensure they sum to 100%"""
-        if not self.recipient_regions:
-            return []
-        total_percentage = sum(
-            region.percentage or 0 for region in self.recipient_regions
-        )
-        if total_percentage == 0:
-            return self.recipient_regions
+        return [
+            NormalisedPercentage(region.code, percentage)
+            for region, percentage in zip(
+                self.recipient_regions,
+                normalise_percentages(
+                    [region.percentage for region in self.recipient_regions]
+                ),
+            )
+        ]
+
+
+# Stages of the levels that split by geography rather than by sector
+_GEOGRAPHY_STAGES = ("split_recipient_countries", "split_recipient_regions")
+
+
+def _get_transaction_template_key(transaction) -> tuple:
+    """Returns the transaction level declarations of a transaction"""
+    return (
+        transaction.recipient_country_code,
+        transaction.recipient_region_code,
+        tuple(transaction.sectors),
+    )
+
+
+def _get_declared(key: tuple) -> tuple:
+    """Returns whether a transaction template key declares the geography (a
+    recipient country or region) and the sectors."""
+    return key[0] is not None or key[1] is not None, bool(key[2])
+
+
+def _get_template_code_ids(template, get_ids) -> tuple:
+    """Returns the code ids of each row of a template, with one row per sector,
+    and how many rows each split transaction becomes (None if always one).
+    See IATIActivity._iter_transactions_split_code_ids for get_ids."""
+    get_country_id, get_region_id, get_vocabulary_id, get_code_id = get_ids
+    countries: list = []
+    regions: list = []
+    vocabularies: list = []
+    codes: list = []
+    repeats: list = []
+    for recipient_country_code, recipient_region_code, sectors in template:
+        for sector in sectors or (None,):
+            countries.append(get_country_id(recipient_country_code))
+            regions.append(get_region_id(recipient_region_code))
+            vocabularies.append(
+                NO_CODE if sector is None else get_vocabulary_id(sector.vocabulary)
+            )
+            codes.append(NO_CODE if sector is None else get_code_id(sector.code))
+        repeats.append(len(sectors) or 1)
+    return (
+        countries,
+        regions,
+        vocabularies,
+        codes,
+        None if len(countries) == len(template) else repeats,
+    )
+
+
+def _get_transactions_split_columns(
+    transactions, recipient_countries, recipient_regions, sectors, code_table
+) -> list:
+    """Returns arrays of the values, recipient_country_code ids,
+    recipient_region_code ids, sector_vocabulary ids, sector_code ids and
+    indexes in transactions of the rows of the split of transactions by the
+    normalised percentages given, for get_transactions_split_as_columns.
+
+    Every transaction is split by all the fields given, so this is done as one
+    outer product. A field not given is taken from the transactions.
+    """
 
-        normalized_regions = copy.deepcopy(self.recipient_regions)
+    def get_ids(codes):
+        return numpy.array(code_table.get_ids(codes), dtype=numpy.int32)
 
-        for region in normalized_regions:
-            if region.percentage:
-                region.percentage = (region.percentage / total_percentage) * 100
+    transactions_count = len(transactions)
+    countries_count = len(recipient_countries) or 1
+    regions_count = len(recipient_regions) or 1
+    sectors_count = len(sectors) or 1
+    rows_per_transaction = countries_count * regions_count * sectors_count
+
+    # Values: an outer product of the transaction values and the percentages of
+    # each field in turn, giving an array of shape
+    # (transactions, countries, regions, sectors) that is then flattened.
+    value = numpy.array([i.value for i in transactions], dtype=numpy.float64)
+    for normalised in (recipient_countries, recipient_regions, sectors):
+        if normalised:
+            percentages = numpy.array(
+                [i.percentage for i in normalised], dtype=numpy.float64
+            )
+            value = value[..., None] * percentages / 100
+        else:
+            value = value[..., None]
+    value = value.ravel()
+
+    # Codes, as ids
+    if recipient_countries:
+        recipient_country_code_id = numpy.tile(
+            numpy.repeat(
+                get_ids([i.code for i in recipient_countries]),
+                regions_count * sectors_count,
+            ),
+            transactions_count,
+        )
+    else:
+        recipient_country_code_id = numpy.repeat(
+            get_ids([i.recipient_country_code for i in transactions]),
+            rows_per_transaction,
+        )
+    if recipient_regions:
+        recipient_region_code_id = numpy.tile(
+            numpy.repeat(
+                get_ids([i.code for i in recipient_regions]),
+                sectors_count,
+            ),
+            transactions_count * countries_count,
+        )
+    else:
+        recipient_region_code_id = numpy.repeat(
+            get_ids([i.recipient_region_code for i in transactions]),
+            rows_per_transaction,
+        )
+    transaction_index = numpy.repeat(
+        numpy.arange(transactions_count), rows_per_transaction
+    )
+
+    # Sectors
+    if sectors:
+        repeat = transactions_count * countries_count * regions_count
+        sector_vocabulary_id = numpy.tile(
+            get_ids([i.vocabulary for i in sectors]), repeat
+        )
+        sector_code_id = numpy.tile(get_ids([i.code for i in sectors]), repeat)
+    else:
+        # Transaction level sectors: repeat the row once per sector
+        counts = numpy.repeat(
+            numpy.array([len(i.sectors) or 1 for i in transactions], dtype=numpy.int64),
+            rows_per_transaction,
+        )
+        value = numpy.repeat(value, counts)
+        recipient_country_code_id = numpy.repeat(recipient_country_code_id, counts)
+        recipient_region_code_id = numpy.repeat(recipient_region_code_id, counts)
+        transaction_index = numpy.repeat(transaction_index, counts)
+        sector_vocabulary_list: list = []
+        sector_code_list: list = []
+        for transaction in transactions:
+            transaction_sectors = transaction.sectors or [
+                IATIActivityTransactionSector()
+            ]
+            sector_vocabulary_list.extend(
+                [i.vocabulary for i in transaction_sectors] * rows_per_transaction
+            )
+            sector_code_list.extend(
+                [i.code for i in transaction_sectors] * rows_per_transaction
+            )
+        sector_vocabulary_id = get_ids(sector_vocabulary_list)
+        sector_code_id = get_ids(sector_code_list)
 
-        return normalized_regions
+    return [
+        value,
+        recipient_country_code_id,
+        recipient_region_code_id,
+        sector_vocabulary_id,
+        sector_code_id,
+        transaction_index,
+    ]
@@ -0,0 +1,190 @@
+"""Writing split transactions as Apache Arrow record batches and Parquet files.
+
+Needs pyarrow. Rows are built straight from the splitting engine, one batch at
+a time, so memory use depends on the batch size and not on the number of rows.
+
+As with IATIActivityTransactionSplitColumns, a split transaction with several
+transaction level sectors becomes one row per sector, with the same value.
+Code columns are dictionary encoded.
+"""
+
+from typing import IO, Iterable, Iterator, Union
+
+from .code_table import CodeTable
+from .iati_activity import IATIActivity
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None  # type: ignore
+
+CODE_COLUMNS = (
+    "iati_identifier",
+    "recipient_country_code",
+    "recipient_region_code",
+    "sector_vocabulary",
+    "sector_code",
+)
+
+
+def _check_pyarrow():
+    if pyarrow is None:
+        raise ImportError(
+            "Arrow and Parquet output needs pyarrow. "
+            "Install it with: pip install iati_activity_details_split_by_fields[arrow]"
+        )
+
+
+def get_schema():
+    """Returns the pyarrow schema of the record batches"""
+    _check_pyarrow()
+    code = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    return pyarrow.schema(
+        [
+            ("activity_index", pyarrow.int64()),
+            ("iati_identifier", code),
+            ("transaction_index", pyarrow.int32()),
+            ("value", pyarrow.float64()),
+            ("recipient_country_code", code),
+            ("recipient_region_code", code),
+            ("sector_vocabulary", code),
+            ("sector_code", code),
+        ]
+    )
+
+
+class _RecordBatchBuilder:
+    """Collects rows as lists of numbers, with codes as ids in a CodeTable per
+    column.
+
+    The iati_identifier table starts again for each batch. The others are kept
+    for every batch, as there are few codes, so ids worked out once per
+    template stay the same.
+    """
+
+    def __init__(self):
+        self._schema = get_schema()
+        self._codes = {i: CodeTable() for i in CODE_COLUMNS}
+        self._get_ids = tuple(
+            self._codes[i].get_id
+            for i in (
+                "recipient_country_code",
+                "recipient_region_code",
+                "sector_vocabulary",
+                "sector_code",
+            )
+        )
+        self._clear()
+
+    def _clear(self):
+        self.rows_count = 0
+        self._codes["iati_identifier"] = CodeTable()
+        self._activity_index = []
+        self._iati_identifier = []
+        self._transaction_index = []
+        self._value = []
+        self._recipient_country_code = []
+        self._recipient_region_code = []
+        self._sector_vocabulary = []
+        self._sector_code = []
+
+    def add_activity(
+        self, activity_index: int, iati_activity: IATIActivity, batch_rows: int
+    ) -> Iterator:
+        """Add the rows of an activity, yielding a batch whenever batch_rows is reached"""
+        for transaction_index, (
+            values,
+            countries,
+            regions,
+            vocabularies,
+            codes,
+        ) in enumerate(iati_activity._iter_transactions_split_code_ids(self._get_ids)):
+            rows_count = len(values)
+            self._value.extend(values)
+            self._recipient_country_code.extend(countries)
+            self._recipient_region_code.extend(regions)
+            self._sector_vocabulary.extend(vocabularies)
+            self._sector_code.extend(codes)
+            self._activity_index.extend([activity_index] * rows_count)
+            self._iati_identifier.extend(
+                [self._codes["iati_identifier"].get_id(iati_activity.iati_identifier)]
+                * rows_count
+            )
+            self._transaction_index.extend([transaction_index] * rows_count)
+            self.rows_count += rows_count
+            if self.rows_count >= batch_rows:
+                yield self.get_record_batch()
+
+    def get_record_batch(self):
+        def get_code_array(column, ids):
+            indices = pyarrow.array(ids, type=pyarrow.int32())
+            return pyarrow.DictionaryArray.from_arrays(
+                # NO_CODE is null
+                pyarrow.compute.if_else(
+                    pyarrow.compute.less(indices, 0),
+                    pyarrow.scalar(None, pyarrow.int32()),
+                    indices,
+                ),
+                pyarrow.array(
+                    [str(i) for i in self._codes[column].codes], type=pyarrow.string()
+                ),
+            )
+
+        record_batch = pyarrow.RecordBatch.from_arrays(
+            [
+                pyarrow.array(self._activity_index, type=pyarrow.int64()),
+                get_code_array("iati_identifier", self._iati_identifier),
+                pyarrow.array(self._transaction_index, type=pyarrow.int32()),
+                pyarrow.array(self._value, type=pyarrow.float64()),
+                get_code_array("recipient_country_code", self._recipient_country_code),
+                get_code_array("recipient_region_code", self._recipient_region_code),
+                get_code_array("sector_vocabulary", self._sector_vocabulary),
+                get_code_array("sector_code", self._sector_code),
+            ],
+            schema=self._schema,
+        )
+        self._clear()
+        return record_batch
+
+
+def iter_record_batches(
+    iati_activities: Iterable[IATIActivity], batch_rows: int = 65536
+) -> Iterator:
+    """Yield pyarrow.RecordBatch objects of split transactions, with get_schema().
+
+    Batches have about batch_rows rows; a batch is finished after the
+    transaction that reaches batch_rows, so may be a little bigger.
+    activity_index is the position of the activity in the input.
+    """
+    _check_pyarrow()
+    if batch_rows < 1:
+        raise ValueError("batch_rows must be at least 1")
+    builder = _RecordBatchBuilder()
+    for activity_index, iati_activity in enumerate(iati_activities):
+        yield from builder.add_activity(activity_index, iati_activity, batch_rows)
+    if builder.rows_count:
+        yield builder.get_record_batch()
+
+
+def write_parquet(
+    iati_activities: Iterable[IATIActivity],
+    where: Union[str, IO[bytes]],
+    row_group_rows: int = 65536,
+    compression: str = "snappy",
+) -> int:
+    """Write split transactions to a Parquet file, one row group at a time.
+
+    where is a path or a binary file. Each row group has about row_group_rows
+    rows (see iter_record_batches). Returns the number of rows written.
+    """
+    _check_pyarrow()
+    rows_count = 0
+    with pyarrow.parquet.ParquetWriter(
+        where, get_schema(), compression=compression
+    ) as writer:
+        for record_batch in iter_record_batches(iati_activities, row_group_rows):
+            writer.write_batch(record_batch, row_group_size=record_batch.num_rows)
+            rows_count += record_batch.num_rows
+    return rows_count
@@ -0,0 +1,187 @@
+import functools
+import json
+import math
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from .batch import _map_chunks
+from .iati_activity import IATIActivity
+from .split_templates import _TemplateCache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def _dumps(value) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # For example, integers too big for orjson
+            pass
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_value(value) -> bytes:
+    # The only thing that changes on every row, so avoid the general encoder
+    # for the common cases.
+    if type(value) is float:
+        if not math.isfinite(value):
+            # JSON has no NaN or Infinity. orjson writes null for them, so the
+            # json module fallback must too, rather than its non standard NaN.
+            return b"null"
+        if orjson is not None:
+            return orjson.dumps(value)
+        return repr(value).encode("ascii")
+    if type(value) is int:
+        # Any size of integer, as json.dumps would write it. orjson is only
+        # needed for floats, and can not encode integers beyond 64 bits.
+        return str(value).encode("ascii")
+    return _dumps(value)
+
+
+class _Encoder:
+    """Encodes split rows as JSON, encoding each code only once"""
+
+    def __init__(self):
+        self._codes: dict = {}
+
+    def encode_code(self, code) -> bytes:
+        encoded = self._codes.get(code)
+        if encoded is None:
+            # Codes are kept for the whole output, so are not encoded with
+            # orjson: each bytes it returns takes about 4 KB, however short.
+            encoded = self._codes[code] = json.dumps(
+                code, separators=(",", ":")
+            ).encode("utf-8")
+        return encoded
+
+    def iter_transactions_split(
+        self, iati_activity: IATIActivity, prefix: bytes = b"{"
+    ) -> Iterator[bytes]:
+        head = prefix + b'"value":'
+        # Everything after the value, encoded once per template
+        tails = _TemplateCache(
+            lambda template: [self._encode_tail(*i) for i in template]
+        )
+        for values, template in iati_activity._iter_transactions_split_templates():
+            for value, tail in zip(values, tails.get(template)):
+                yield head + _dumps_value(value) + tail
+
+    def _encode_tail(self, recipient_country_code, recipient_region_code, sectors):
+        return (
+            b',"recipient_country_code":'
+            + self.encode_code(recipient_country_code)
+            + b',"recipient_region_code":'
+            + self.encode_code(recipient_region_code)
+            + b',"sectors":['
+            + b",".join(
+                b'{"vocabulary":'
+                + self.encode_code(i.vocabulary)
+                + b',"code":'
+                + self.encode_code(i.code)
+                + b"}"
+                for i in sectors
+            )
+            + b"]}"
+        )
+
+
+def _get_prefix(iati_activity: IATIActivity, include_iati_identifier: bool) -> bytes:
+    if include_iati_identifier:
+        return b'{"iati_identifier":' + _dumps(iati_activity.iati_identifier) + b","
+    return b"{"
+
+
+def iter_transactions_split_as_json_bytes(
+    iati_activity: IATIActivity, include_iati_identifier: bool = False
+) -> Iterator[bytes]:
+    """Yield each split transaction encoded as a JSON object.
+
+    The objects have the same content as get_transactions_split_as_json, but are
+    written directly without building dicts first.
+    If include_iati_identifier is True, each object starts with the
+    iati_identifier of the activity.
+    orjson is used to encode values if it is installed.
+    """
+    return _Encoder().iter_transactions_split(
+        iati_activity, _get_prefix(iati_activity, include_iati_identifier)
+    )
+
+
+def dumps_transactions_split(
+    iati_activity: IATIActivity, include_iati_identifier: bool = False
+) -> bytes:
+    """Returns the split transactions as a JSON array"""
+    return (
+        b"["
+        + b",".join(
+            iter_transactions_split_as_json_bytes(
+                iati_activity, include_iati_identifier
+            )
+        )
+        + b"]"
+    )
+
+
+def write_transactions_split_as_json_lines(
+    iati_activities: Iterable[IATIActivity],
+    fp: IO[bytes],
+    include_iati_identifier: bool = False,
+) -> int:
+    """Write split transactions as JSON Lines to a binary file. Returns the number of rows."""
+    rows_count = 0
+    encoder = _Encoder()
+    for iati_activity in iati_activities:
+        for row in encoder.iter_transactions_split(
+            iati_activity, _get_prefix(iati_activity, include_iati_identifier)
+        ):
+            fp.write(row)
+            fp.write(b"\n")
+            rows_count += 1
+    return rows_count
+
+
+def split_activities_as_json_lines(
+    iati_activities: Iterable[IATIActivity],
+    include_iati_identifier: bool = False,
+    max_workers: Optional[int] = None,
+    chunksize: int = 100,
+    ordered: bool = True,
+) -> Iterator[Tuple[int, int, bytes]]:
+    """Split many activities in a process pool, encoding JSON Lines in the workers.
+
+    Yields (index, rows_count, json_lines) for each activity, where json_lines
+    holds one line per split transaction.
+    Takes the same pool options as batch.split_activities.
+    """
+    split_chunk = functools.partial(
+        _split_chunk_as_json_lines, include_iati_identifier=include_iati_identifier
+    )
+    for start, results in _map_chunks(
+        split_chunk,
+        iati_activities,
+        max_workers,
+        chunksize,
+        ordered,
+        None,
+        None,
+    ):
+        for offset, (rows_count, json_lines) in enumerate(results):
+            yield start + offset, rows_count, json_lines
+
+
+def _split_chunk_as_json_lines(
+    start: int, iati_activities: List[IATIActivity], include_iati_identifier: bool
+) -> List[Tuple[int, bytes]]:
+    encoder = _Encoder()
+    results = []
+    for iati_activity in iati_activities:
+        rows = list(
+            encoder.iter_transactions_split(
+                iati_activity, _get_prefix(iati_activity, include_iati_identifier)
+            )
+        )
+        results.append((len(rows), b"".join(row + b"\n" for row in rows)))
+    return results
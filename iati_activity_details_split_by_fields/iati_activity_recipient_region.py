@@ -1,5 +1,7 @@
 class IATIActivityRecipientRegion:
 
+    __slots__ = ("code", "percentage")
+
     def __init__(self, code=None, percentage=None):
         self.code = code
         self.percentage = percentage
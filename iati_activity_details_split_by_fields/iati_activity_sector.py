@@ -1,5 +1,7 @@
 class IATIActivitySector:
 
+    __slots__ = ("vocabulary", "code", "percentage")
+
     def __init__(self, vocabulary=None, code=None, percentage=None):
         self.vocabulary = vocabulary
         self.code = code
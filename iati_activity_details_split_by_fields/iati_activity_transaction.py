@@ -1,18 +1,27 @@
-from typing import List
+from typing import List, Optional
 
 from .iati_activity_transaction_sector import IATIActivityTransactionSector
 
 
 class IATIActivityTransaction:
 
+    __slots__ = (
+        "value",
+        "sectors",
+        "recipient_country_code",
+        "recipient_region_code",
+    )
+
     def __init__(
         self,
         value=None,
-        sectors: List[IATIActivityTransactionSector] = [],
+        sectors: Optional[List[IATIActivityTransactionSector]] = None,
         recipient_country_code=None,
         recipient_region_code=None,
     ):
         self.value = value
-        self.sectors: List[IATIActivityTransactionSector] = sectors
+        self.sectors: List[IATIActivityTransactionSector] = (
+            sectors if sectors is not None else []
+        )
         self.recipient_country_code = recipient_country_code
         self.recipient_region_code = recipient_region_code
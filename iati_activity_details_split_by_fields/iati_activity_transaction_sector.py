@@ -5,6 +5,8 @@ from .iati_activity_sector import IATIActivitySector
 
 class IATIActivityTransactionSector:
 
+    __slots__ = ("vocabulary", "code")
+
     def __init__(
         self,
         vocabulary=None,
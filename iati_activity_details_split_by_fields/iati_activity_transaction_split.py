@@ -6,16 +6,25 @@ from .iati_activity_transaction_sector import IATIActivityTransactionSector
 
 class IATIActivityTransactionSplit:
 
+    __slots__ = (
+        "value",
+        "sectors",
+        "recipient_country_code",
+        "recipient_region_code",
+    )
+
     def __init__(
         self,
         value=None,
-        sectors: List[IATIActivityTransactionSector] = [],
+        sectors: Optional[List[IATIActivityTransactionSector]] = None,
         recipient_country_code=None,
         recipient_region_code=None,
         iati_activity_transaction: Optional[IATIActivityTransaction] = None,
     ):
         self.value = value
-        self.sectors: List[IATIActivityTransactionSector] = sectors
+        self.sectors: List[IATIActivityTransactionSector] = (
+            sectors if sectors is not None else []
+        )
         self.recipient_country_code = recipient_country_code
         self.recipient_region_code = recipient_region_code
         if iati_activity_transaction:
@@ -0,0 +1,177 @@
+from typing import Any, List, Optional
+
+from .code_table import NO_CODE, CodeTable
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+
+def _check_numpy():
+    if numpy is None:
+        raise ImportError(
+            "Columnar output needs NumPy. "
+            "Install it with: pip install iati_activity_details_split_by_fields[numpy]"
+        )
+
+
+CODE_COLUMNS = (
+    "recipient_country_code",
+    "recipient_region_code",
+    "sector_vocabulary",
+    "sector_code",
+)
+
+
+class IATIActivityTransactionSplitColumns:
+    """Split transactions held as parallel NumPy arrays, one entry per row.
+
+    A split transaction with more than one sector (this can only happen when
+    the sectors are declared on the transaction) is repeated once per sector
+    with the same value, so every row has at most one sector.
+    A value of None is held as NaN.
+
+    Codes are held as int32 ids in code_table (see code_table.CodeTable), in
+    recipient_country_code_id and so on, with NO_CODE for None.
+    recipient_country_code and so on decode them into arrays of codes.
+    """
+
+    def __init__(
+        self,
+        value: Any = None,
+        recipient_country_code: Any = None,
+        recipient_region_code: Any = None,
+        sector_vocabulary: Any = None,
+        sector_code: Any = None,
+        activity_index: Any = None,
+        transaction_index: Any = None,
+        code_table: Optional[CodeTable] = None,
+    ):
+        _check_numpy()
+        self.code_table = code_table if code_table is not None else CodeTable()
+        self.value = _get_array(value, numpy.float64)
+        self.recipient_country_code_id = self._get_ids(recipient_country_code)
+        self.recipient_region_code_id = self._get_ids(recipient_region_code)
+        self.sector_vocabulary_id = self._get_ids(sector_vocabulary)
+        self.sector_code_id = self._get_ids(sector_code)
+        self.activity_index = _get_array(activity_index, numpy.int64)
+        self.transaction_index = _get_array(transaction_index, numpy.int64)
+
+    @classmethod
+    def from_ids(
+        cls,
+        code_table: CodeTable,
+        value: Any,
+        recipient_country_code_id: Any,
+        recipient_region_code_id: Any,
+        sector_vocabulary_id: Any,
+        sector_code_id: Any,
+        activity_index: Any,
+        transaction_index: Any,
+    ) -> "IATIActivityTransactionSplitColumns":
+        """Make columns from arrays of ids in code_table, without decoding them"""
+        columns = cls(code_table=code_table)
+        columns.value = _get_array(value, numpy.float64)
+        columns.recipient_country_code_id = _get_array(
+            recipient_country_code_id, numpy.int32
+        )
+        columns.recipient_region_code_id = _get_array(
+            recipient_region_code_id, numpy.int32
+        )
+        columns.sector_vocabulary_id = _get_array(sector_vocabulary_id, numpy.int32)
+        columns.sector_code_id = _get_array(sector_code_id, numpy.int32)
+        columns.activity_index = _get_array(activity_index, numpy.int64)
+        columns.transaction_index = _get_array(transaction_index, numpy.int64)
+        return columns
+
+    def __len__(self):
+        return len(self.value)
+
+    @property
+    def recipient_country_code(self):
+        return self.get_codes(self.recipient_country_code_id)
+
+    @property
+    def recipient_region_code(self):
+        return self.get_codes(self.recipient_region_code_id)
+
+    @property
+    def sector_vocabulary(self):
+        return self.get_codes(self.sector_vocabulary_id)
+
+    @property
+    def sector_code(self):
+        return self.get_codes(self.sector_code_id)
+
+    def get_codes(self, code_ids):
+        """Returns an array of the codes with the ids in code_ids"""
+        # The last item is for NO_CODE (-1)
+        codes = numpy.empty(len(self.code_table) + 1, dtype=object)
+        codes[:-1] = self.code_table.codes
+        return codes[code_ids]
+
+    def _get_ids(self, codes):
+        if codes is None:
+            return numpy.empty(0, dtype=numpy.int32)
+        return numpy.array(self.code_table.get_ids(codes), dtype=numpy.int32)
+
+    @classmethod
+    def concatenate(
+        cls,
+        columns: List["IATIActivityTransactionSplitColumns"],
+        code_table: Optional[CodeTable] = None,
+    ):
+        """Join columns into one, with ids in code_table.
+
+        By default this is the code_table of the first columns.
+        Ids are only remapped for columns with a different code_table.
+        """
+        _check_numpy()
+        if not columns:
+            return cls(code_table=code_table)
+        if code_table is None:
+            code_table = columns[0].code_table
+        code_ids: dict = {i: [] for i in CODE_COLUMNS}
+        for i in columns:
+            if i.code_table is code_table:
+                remapping = None
+            else:
+                remapping = numpy.array(
+                    code_table.get_remapping(i.code_table) + [NO_CODE],
+                    dtype=numpy.int32,
+                )
+            for column in CODE_COLUMNS:
+                ids = getattr(i, column + "_id")
+                code_ids[column].append(ids if remapping is None else remapping[ids])
+        return cls.from_ids(
+            code_table,
+            value=numpy.concatenate([i.value for i in columns]),
+            recipient_country_code_id=numpy.concatenate(
+                code_ids["recipient_country_code"]
+            ),
+            recipient_region_code_id=numpy.concatenate(
+                code_ids["recipient_region_code"]
+            ),
+            sector_vocabulary_id=numpy.concatenate(code_ids["sector_vocabulary"]),
+            sector_code_id=numpy.concatenate(code_ids["sector_code"]),
+            activity_index=numpy.concatenate([i.activity_index for i in columns]),
+            transaction_index=numpy.concatenate([i.transaction_index for i in columns]),
+        )
+
+    def get_as_json(self):
+        return {
+            "value": self.value.tolist(),
+            "recipient_country_code": self.recipient_country_code.tolist(),
+            "recipient_region_code": self.recipient_region_code.tolist(),
+            "sector_vocabulary": self.sector_vocabulary.tolist(),
+            "sector_code": self.sector_code.tolist(),
+            "activity_index": self.activity_index.tolist(),
+            "transaction_index": self.transaction_index.tolist(),
+        }
+
+
+def _get_array(values, dtype):
+    if values is None:
+        return numpy.empty(0, dtype=dtype)
+    return numpy.asarray(values, dtype=dtype)
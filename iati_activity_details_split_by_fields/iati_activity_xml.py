@@ -0,0 +1,98 @@
+import xml.etree.ElementTree as ET
+from typing import IO, Iterator, Optional, Union
+
+from .iati_activity import IATIActivity
+from .iati_activity_recipient_country import IATIActivityRecipientCountry
+from .iati_activity_recipient_region import IATIActivityRecipientRegion
+from .iati_activity_sector import IATIActivitySector
+from .iati_activity_transaction import IATIActivityTransaction
+from .iati_activity_transaction_sector import IATIActivityTransactionSector
+
+
+def iter_activities_from_xml(source: Union[str, IO[bytes]]) -> Iterator[IATIActivity]:
+    """Yield an IATIActivity for each <iati-activity> in an IATI XML file.
+
+    source can be a file name or a file object opened in binary mode.
+    The file is parsed incrementally and each <iati-activity> element is thrown
+    away once it has been read, so memory use does not grow with the file size.
+    """
+    root = None
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if root is None:
+            root = element
+        if event == "end" and element.tag == "iati-activity":
+            yield get_activity_from_xml_element(element)
+            # Drop this and all earlier activities from the tree
+            element.clear()
+            root.clear()
+
+
+def get_activity_from_xml_element(element: ET.Element) -> IATIActivity:
+    """Build an IATIActivity from an <iati-activity> element"""
+    iati_activity = IATIActivity(
+        iati_identifier=_get_text(element.find("iati-identifier"))
+    )
+    for child in element:
+        if child.tag == "transaction":
+            iati_activity.transactions.append(_get_transaction(child))
+        elif child.tag == "sector":
+            iati_activity.sectors.append(
+                IATIActivitySector(
+                    vocabulary=child.get("vocabulary"),
+                    code=child.get("code"),
+                    percentage=_get_number(child.get("percentage")),
+                )
+            )
+        elif child.tag == "recipient-country":
+            iati_activity.recipient_countries.append(
+                IATIActivityRecipientCountry(
+                    code=child.get("code"),
+                    percentage=_get_number(child.get("percentage")),
+                )
+            )
+        elif child.tag == "recipient-region":
+            iati_activity.recipient_regions.append(
+                IATIActivityRecipientRegion(
+                    code=child.get("code"),
+                    percentage=_get_number(child.get("percentage")),
+                )
+            )
+    return iati_activity
+
+
+def _get_transaction(element: ET.Element) -> IATIActivityTransaction:
+    transaction = IATIActivityTransaction(
+        value=_get_number(_get_text(element.find("value")))
+    )
+    for child in element:
+        if child.tag == "sector":
+            transaction.sectors.append(
+                IATIActivityTransactionSector(
+                    vocabulary=child.get("vocabulary"), code=child.get("code")
+                )
+            )
+        elif child.tag == "recipient-country":
+            transaction.recipient_country_code = child.get("code")
+        elif child.tag == "recipient-region":
+            transaction.recipient_region_code = child.get("code")
+    return transaction
+
+
+def _get_text(element: Optional[ET.Element]) -> Optional[str]:
+    if element is None or element.text is None:
+        return None
+    return element.text.strip() or None
+
+
+def _get_number(text: Optional[str]):
+    """Returns an int if possible, otherwise a float, or None if the text is not a number"""
+    if text is None:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return None
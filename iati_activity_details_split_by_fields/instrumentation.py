@@ -0,0 +1,253 @@
+"""Optional metrics about splitting.
+
+Nothing is recorded unless a SplitMetrics is being collected:
+
+    metrics = SplitMetrics()
+    with collect_metrics(metrics):
+        for iati_activity in activities:
+            iati_activity.get_transactions_split()
+    metrics.write_prometheus_text_file("split.prom")
+
+When nothing is being collected, splitting only checks once per activity (and
+once per split field per transaction) whether something is.
+
+Which SplitMetrics is being collected is kept in a context variable, so
+collect_metrics blocks in different threads or asyncio tasks each record only
+what they split themselves. Activities split by worker processes (see batch)
+or in executor threads (see async_split) are not recorded. A SplitMetrics is
+not thread safe, so should not be shared between threads.
+To send metrics somewhere else, subclass SplitMetrics and override
+record_stage and record_activity.
+"""
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# The stages times are recorded for, in the order they happen
+STAGES = (
+    "normalise",
+    "template",
+    "split_recipient_countries",
+    "split_recipient_regions",
+    "split_sectors",
+    "to_json",
+)
+
+# The SplitMetrics being collected, if any
+_current: contextvars.ContextVar[Optional["SplitMetrics"]] = contextvars.ContextVar(
+    "iati_split_metrics", default=None
+)
+
+
+class SplitMetrics:
+    """Counts and timings of splitting, and the largest activities seen.
+
+    Activities are only counted when they have been split to the end.
+    """
+
+    def __init__(self, largest_activities: int = 10):
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.activities_count = 0
+        self.transactions_count = 0
+        self.recipient_countries_count = 0
+        self.recipient_regions_count = 0
+        self.sectors_count = 0
+        self.rows_count = 0
+        # The most rows one transaction was split into
+        self.max_fan_out = 0
+        self._largest_activities_count = largest_activities
+        # A min heap of (rows, order seen, iati_identifier)
+        self._largest_activities: List[Tuple[int, int, Optional[str]]] = []
+        self._order = itertools.count()
+
+    def record_stage(self, stage: str, seconds: float):
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0) + seconds
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+
+    def record_activity(self, iati_activity, rows_count: int, max_fan_out: int = 0):
+        """Record an activity split into rows_count rows, where max_fan_out is the
+        most rows one of its transactions was split into"""
+        self.activities_count += 1
+        self.transactions_count += len(iati_activity.transactions)
+        self.recipient_countries_count += len(iati_activity.recipient_countries)
+        self.recipient_regions_count += len(iati_activity.recipient_regions)
+        self.sectors_count += len(iati_activity.sectors)
+        self.rows_count += rows_count
+        self.max_fan_out = max(self.max_fan_out, max_fan_out)
+        if self._largest_activities_count:
+            item = (rows_count, next(self._order), iati_activity.iati_identifier)
+            if len(self._largest_activities) < self._largest_activities_count:
+                heapq.heappush(self._largest_activities, item)
+            elif rows_count > self._largest_activities[0][0]:
+                heapq.heapreplace(self._largest_activities, item)
+
+    def get_largest_activities(self) -> List[Tuple[Optional[str], int]]:
+        """Returns (iati_identifier, rows) of the activities that were split into
+        the most rows, most rows first. On a tie, the one seen first comes first."""
+        return [
+            (iati_identifier, rows_count)
+            for rows_count, _, iati_identifier in sorted(
+                self._largest_activities, key=lambda i: (-i[0], i[1])
+            )
+        ]
+
+    def get_mean_fan_out(self) -> float:
+        """Returns the mean number of rows each transaction was split into"""
+        if not self.transactions_count:
+            return 0.0
+        return self.rows_count / self.transactions_count
+
+    def get_prometheus_text(self, prefix: str = "iati_split") -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+
+        def add(name, metric_type, help, samples):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, metric_type))
+            for labels, value in samples:
+                lines.append(
+                    "{}_{}{} {}".format(
+                        prefix, name, _get_prometheus_labels(labels), repr(value)
+                    )
+                )
+
+        add(
+            "activities_total",
+            "counter",
+            "Activities split.",
+            [({}, self.activities_count)],
+        )
+        add(
+            "transactions_total",
+            "counter",
+            "Transactions in the activities split.",
+            [({}, self.transactions_count)],
+        )
+        add(
+            "recipient_countries_total",
+            "counter",
+            "Activity level recipient countries in the activities split.",
+            [({}, self.recipient_countries_count)],
+        )
+        add(
+            "recipient_regions_total",
+            "counter",
+            "Activity level recipient regions in the activities split.",
+            [({}, self.recipient_regions_count)],
+        )
+        add(
+            "sectors_total",
+            "counter",
+            "Activity level sectors in the activities split.",
+            [({}, self.sectors_count)],
+        )
+        add("rows_total", "counter", "Split transactions.", [({}, self.rows_count)])
+        add(
+            "fan_out_mean",
+            "gauge",
+            "Mean split transactions per transaction.",
+            [({}, self.get_mean_fan_out())],
+        )
+        add(
+            "fan_out_max",
+            "gauge",
+            "Most split transactions of one transaction.",
+            [({}, self.max_fan_out)],
+        )
+        add(
+            "stage_seconds_total",
+            "counter",
+            "Time spent in each stage of splitting.",
+            [({"stage": i}, self.stage_seconds[i]) for i in self._get_stages()],
+        )
+        add(
+            "stage_calls_total",
+            "counter",
+            "Times each stage of splitting was timed.",
+            [({"stage": i}, self.stage_calls[i]) for i in self._get_stages()],
+        )
+        add(
+            "largest_activity_rows",
+            "gauge",
+            "Split transactions of the activities with the most.",
+            [
+                ({"rank": rank, "iati_identifier": iati_identifier}, rows_count)
+                for rank, (iati_identifier, rows_count) in enumerate(
+                    self.get_largest_activities(), 1
+                )
+            ],
+        )
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_text_file(self, path: str, prefix: str = "iati_split"):
+        """Write get_prometheus_text to path, for the node exporter textfile collector.
+
+        The file is replaced in one step, so it is never read half written.
+        It can be read by anyone the umask allows, like a file made with open,
+        so a collector running as another user can read it.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temporary_path = tempfile.mkstemp(
+            dir=directory, prefix=".", suffix=".prom.tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                fp.write(self.get_prometheus_text(prefix))
+            # mkstemp makes the file readable only by its owner
+            os.chmod(temporary_path, 0o666 & ~_get_umask())
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def _get_stages(self) -> List[str]:
+        return [i for i in STAGES if i in self.stage_seconds] + sorted(
+            i for i in self.stage_seconds if i not in STAGES
+        )
+
+
+@contextlib.contextmanager
+def collect_metrics(metrics: SplitMetrics) -> Iterator[SplitMetrics]:
+    """Record splitting in this process in metrics until the block ends"""
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def get_current_metrics() -> Optional[SplitMetrics]:
+    """Returns the SplitMetrics being collected, or None"""
+    return _current.get()
+
+
+def _get_umask() -> int:
+    # The umask can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def _get_prometheus_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(
+            '{}="{}"'.format(
+                name,
+                str(value)
+                .replace("\\", "\\\\")
+                .replace("\n", "\\n")
+                .replace('"', '\\"'),
+            )
+            for name, value in labels.items()
+        )
+        + "}"
+    )
@@ -0,0 +1,80 @@
+"""Splitting values as whole numbers of minor units (for example, cents).
+
+Values are split with the largest remainder method: each part is rounded down,
+then the units left over go one each to the parts with the largest remainders
+(the earliest part wins a tie). The parts always add up exactly to the value.
+
+Percentages are turned into whole number weights once per activity, so each
+split only needs integer multiplication and division.
+"""
+
+import math
+from decimal import Decimal
+from fractions import Fraction
+from typing import Callable, List, Sequence, Tuple
+
+
+def get_minor_units(value, decimals: int):
+    """Returns value as a whole number of minor units, rounding half to even.
+
+    None is returned as None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value * 10**decimals
+    # Go via the shortest string form, so 0.285 is 28.5 cents and not 28.4999...
+    return round(Decimal(str(value)).scaleb(decimals))
+
+
+def get_integer_weights(percentages: Sequence) -> Tuple[List[int], int]:
+    """Returns whole number weights in the same ratio as percentages, and their total.
+
+    Missing percentages count as zero.
+    """
+    fractions = [Fraction(str(i)) if i else Fraction(0) for i in percentages]
+    denominator = 1
+    for i in fractions:
+        denominator = (
+            denominator * i.denominator // math.gcd(denominator, i.denominator)
+        )
+    weights = [int(i * denominator) for i in fractions]
+    return weights, sum(weights)
+
+
+def allocate(value: int, weights: Sequence[int], weights_total: int) -> List[int]:
+    """Split value in proportion to weights with the largest remainder method.
+
+    If all the weights are zero, every part is zero.
+    """
+    if not weights_total:
+        return [0] * len(weights)
+    if value < 0:
+        return [-i for i in allocate(-value, weights, weights_total)]
+    products = [value * weight for weight in weights]
+    parts = [product // weights_total for product in products]
+    left_over = value - sum(parts)
+    if left_over:
+        # Stable sort, so on a tie the earliest part wins
+        for i in sorted(
+            range(len(parts)),
+            key=lambda i: products[i] % weights_total,
+            reverse=True,
+        )[:left_over]:
+            parts[i] += 1
+    return parts
+
+
+def get_splitter(percentages: Sequence) -> Callable[[int], List[int]]:
+    """Returns a function that splits a value by percentages with allocate"""
+    weights, weights_total = get_integer_weights(percentages)
+    return lambda value: allocate(value, weights, weights_total)
+
+
+def get_grouped_splitter(
+    groups: Sequence[Sequence],
+) -> Callable[[int], List[int]]:
+    """Like get_splitter, but splits the whole value within each group of percentages
+    and returns the parts of all groups one after the other"""
+    splitters = [get_splitter(i) for i in groups]
+    return lambda value: [part for split in splitters for part in split(value)]
@@ -0,0 +1,51 @@
+"""Normalising percentages so they add up to 100.
+
+Percentages are worked on as one flat list, split into groups (for example,
+the sectors of each vocabulary) that are each normalised on their own, and
+the results are returned as NormalisedPercentage tuples rather than copies of
+the model objects.
+
+Missing and zero percentages are left as they are. If a group adds up to zero
+(or, with positive_total_only, less than or equal to zero) all its percentages
+are left as they are.
+"""
+
+from typing import Any, NamedTuple, Optional, Sequence
+
+
+class NormalisedPercentage(NamedTuple):
+    """A code and its normalised percentage, in place of a copied model object"""
+
+    code: Any
+    percentage: Any
+    vocabulary: Any = None
+
+
+def normalise_percentages(
+    percentages: Sequence,
+    group_lengths: Optional[Sequence[int]] = None,
+    positive_total_only: bool = False,
+) -> list:
+    """Returns percentages normalised within each group to add up to 100.
+
+    group_lengths are the lengths of the groups, one after the other; by default
+    all the percentages are one group.
+    """
+    if group_lengths is None:
+        group_lengths = [len(percentages)]
+    normalised: list = []
+    start = 0
+    for length in group_lengths:
+        group = percentages[start : start + length]
+        total = sum([percentage or 0 for percentage in group])
+        if total > 0 if positive_total_only else total != 0:
+            normalised.extend(
+                [
+                    (percentage / total) * 100 if percentage else percentage
+                    for percentage in group
+                ]
+            )
+        else:
+            normalised.extend(group)
+        start += length
+    return normalised
@@ -0,0 +1,233 @@
+"""Splitting many activities in worker processes that hand back their results in
+shared memory, instead of pickling split transaction objects.
+
+Each worker splits a chunk of activities into fixed-width columns (float64
+values, int64 activity indexes, int32 transaction indexes and int32 code ids)
+and writes them into one multiprocessing.shared_memory block. Only the block
+name, the number of rows and the codes are sent back. The parent reads the
+columns in place as memoryviews.
+
+As with IATIActivityTransactionSplitColumns, a split transaction with several
+transaction level sectors becomes one row per sector, with the same value.
+
+Needs a POSIX system: on Windows shared memory is freed as soon as the worker
+closes it, so split_activities_to_shared_memory raises OSError there.
+"""
+
+import array
+import concurrent.futures
+import math
+import os
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from .batch import _map_chunks
+from .code_table import CodeTable
+from .iati_activity import IATIActivity
+from .iati_activity_transaction_split_columns import (
+    IATIActivityTransactionSplitColumns,
+    _check_numpy,
+    numpy,
+)
+
+# (name, array typecode) of each column, in the order they are in the block.
+# The 8 byte columns come first so every column is aligned.
+COLUMNS = (
+    ("value", "d"),
+    ("activity_index", "q"),
+    ("transaction_index", "i"),
+    ("recipient_country_code_id", "i"),
+    ("recipient_region_code_id", "i"),
+    ("sector_vocabulary_id", "i"),
+    ("sector_code_id", "i"),
+)
+
+# Bytes per row
+RECORD_SIZE = sum(array.array(typecode).itemsize for _, typecode in COLUMNS)
+
+
+def _check_posix():
+    if os.name != "posix":
+        raise OSError(
+            "Splitting to shared memory needs a POSIX system, as elsewhere shared "
+            "memory is freed before it can be read. Use batch.split_activities."
+        )
+
+
+class SharedTransactionsSplit:
+    """Split transactions of a chunk of activities, held in shared memory.
+
+    Each column in COLUMNS is an attribute holding a memoryview of the shared
+    memory, one entry per row. Codes are ids in code_table, with NO_CODE for
+    None. activity_index is the position of the activity in the input.
+
+    Call close() (or use this as a context manager) once finished, to free the
+    shared memory. Anything still using the memoryviews, such as a NumPy array
+    made with numpy.frombuffer, must be deleted first.
+    """
+
+    def __init__(self, name: str, rows_count: int, code_table: CodeTable):
+        # The name of the shared memory block
+        self.name = name
+        self.rows_count = rows_count
+        self.code_table = code_table
+        self._shared_memory: Optional[shared_memory.SharedMemory] = (
+            shared_memory.SharedMemory(name=name)
+        )
+        self._views: List[memoryview] = []
+        buf: Any = self._shared_memory.buf
+        for column, typecode, start, end in _get_offsets(rows_count):
+            view = buf[start:end].cast(typecode)
+            self._views.append(view)
+            setattr(self, column, view)
+
+    def __len__(self):
+        return self.rows_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Release the memoryviews and free the shared memory"""
+        if self._shared_memory is None:
+            return
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+        self._shared_memory = None
+
+    def get_codes(self, code_ids: Iterable[int]) -> list:
+        """Returns the codes with the ids in code_ids, None for NO_CODE"""
+        return self.code_table.get_codes(code_ids)
+
+    def get_as_json(self):
+        return {
+            "value": self.value.tolist(),
+            "recipient_country_code": self.get_codes(self.recipient_country_code_id),
+            "recipient_region_code": self.get_codes(self.recipient_region_code_id),
+            "sector_vocabulary": self.get_codes(self.sector_vocabulary_id),
+            "sector_code": self.get_codes(self.sector_code_id),
+            "activity_index": self.activity_index.tolist(),
+            "transaction_index": self.transaction_index.tolist(),
+        }
+
+    def get_as_columns(
+        self, code_table: Optional[CodeTable] = None
+    ) -> IATIActivityTransactionSplitColumns:
+        """Copy the rows into an IATIActivityTransactionSplitColumns, so the
+        shared memory can be closed. Needs NumPy.
+
+        If code_table is given, codes are changed to ids in it.
+        """
+        _check_numpy()
+        columns = IATIActivityTransactionSplitColumns.from_ids(
+            self.code_table,
+            **{column: numpy.array(getattr(self, column)) for column, _ in COLUMNS},
+        )
+        if code_table is not None and code_table is not self.code_table:
+            columns = IATIActivityTransactionSplitColumns.concatenate(
+                [columns], code_table
+            )
+        return columns
+
+
+def split_activities_to_shared_memory(
+    activities: Iterable[IATIActivity],
+    max_workers: Optional[int] = None,
+    chunksize: int = 100,
+    ordered: bool = True,
+    executor: Optional[concurrent.futures.Executor] = None,
+    max_pending_chunks: Optional[int] = None,
+) -> Iterator[SharedTransactionsSplit]:
+    """Split many activities over a pool of processes, yielding a
+    SharedTransactionsSplit for each chunk of chunksize activities.
+
+    Takes the same pool options as batch.split_activities. Close each
+    SharedTransactionsSplit once finished with it. Chunks that are still being
+    split if this iterator is closed early are freed when they are ready.
+    Raises OSError if this is not a POSIX system.
+    """
+    _check_posix()
+    for _, (name, rows_count, codes) in _map_chunks(
+        _split_chunk_to_shared_memory,
+        activities,
+        max_workers,
+        chunksize,
+        ordered,
+        executor,
+        max_pending_chunks,
+        _unlink_shared_memory,
+    ):
+        yield SharedTransactionsSplit(name, rows_count, CodeTable(codes))
+
+
+def _get_offsets(rows_count: int) -> Iterator[Tuple[str, str, int, int]]:
+    """Yield (column, typecode, start, end) of each column in a block"""
+    start = 0
+    for column, typecode in COLUMNS:
+        end = start + rows_count * array.array(typecode).itemsize
+        yield column, typecode, start, end
+        start = end
+
+
+def _split_chunk_to_shared_memory(
+    start: int, activities: List[IATIActivity]
+) -> Tuple[str, int, list]:
+    """Split activities into a new shared memory block.
+
+    Returns the name of the block, the number of rows and the codes of the ids.
+    """
+    code_table = CodeTable()
+    get_ids = (code_table.get_id,) * 4
+    columns: dict = {column: array.array(typecode) for column, typecode in COLUMNS}
+    value = columns["value"]
+    activity_index = columns["activity_index"]
+    transaction_index = columns["transaction_index"]
+    country_ids = columns["recipient_country_code_id"]
+    region_ids = columns["recipient_region_code_id"]
+    vocabulary_ids = columns["sector_vocabulary_id"]
+    code_ids = columns["sector_code_id"]
+    nan = math.nan
+
+    for offset, activity in enumerate(activities):
+        for index, (values, countries, regions, vocabularies, codes) in enumerate(
+            activity._iter_transactions_split_code_ids(get_ids)
+        ):
+            value.extend([nan if i is None else i for i in values])
+            country_ids.extend(countries)
+            region_ids.extend(regions)
+            vocabulary_ids.extend(vocabularies)
+            code_ids.extend(codes)
+            activity_index.extend([start + offset] * len(values))
+            transaction_index.extend([index] * len(values))
+
+    rows_count = len(value)
+    # A block can not be empty
+    block = shared_memory.SharedMemory(
+        create=True, size=max(1, rows_count * RECORD_SIZE)
+    )
+    buf: Any = block.buf
+    try:
+        for column, _, column_start, column_end in _get_offsets(rows_count):
+            buf[column_start:column_end] = memoryview(columns[column]).cast("B")
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+    # The parent frees the block, so it must not be freed when this process
+    # stops. The parent registers it again when it opens it.
+    if os.name == "posix":
+        resource_tracker.unregister(block._name, "shared_memory")  # type: ignore
+    return block.name, rows_count, code_table.codes
+
+
+def _unlink_shared_memory(result: Tuple[str, int, list]):
+    block = shared_memory.SharedMemory(name=result[0])
+    block.close()
+    block.unlink()
@@ -0,0 +1,51 @@
+import collections
+from typing import Optional
+
+from .activity_store import IATIActivityStore
+
+
+class TransactionsSplitLookup:
+    """Splits single activities from an IATIActivityStore by iati_identifier,
+    keeping the most recent results in memory.
+
+    Only the data of the activity asked for is read from the store. Up to
+    max_entries results are kept; when there are more, the least recently used
+    ones are removed. hits and misses count lookups made through this object.
+
+    Results are shared between callers, so must not be changed.
+    """
+
+    def __init__(self, store: IATIActivityStore, max_entries: int = 1024):
+        self.store = store
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Results, by (iati_identifier, minor_unit_decimals), least recently
+        # used first
+        self._results: collections.OrderedDict = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get_transactions_split_as_json(
+        self, iati_identifier: str, minor_unit_decimals: Optional[int] = None
+    ) -> list:
+        """Returns get_transactions_split_as_json of the activity with an
+        iati_identifier. Raises KeyError if the store does not have it."""
+        key = (iati_identifier, minor_unit_decimals)
+        results = self._results.get(key)
+        if results is not None:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return results
+        self.misses += 1
+        results = self._results[key] = self.store.get_activity(
+            iati_identifier
+        ).get_transactions_split_as_json(minor_unit_decimals)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return results
+
+    def clear(self):
+        """Remove all the results kept"""
+        self._results.clear()
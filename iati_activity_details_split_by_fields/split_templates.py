@@ -0,0 +1,67 @@
+"""Helpers for working with the split templates of IATIActivity.
+
+IATIActivity._iter_transactions_split_levels gives each transaction the
+template and levels it is split by. Everything that splits values with them
+(the split itself, with or without metrics, and totals) uses _split_value, so
+they all get exactly the same values.
+
+Transactions with the same declarations share a template, so outputs work out
+what they need from a template once, with a _TemplateCache.
+"""
+
+import time
+
+from . import minor_units
+
+
+def _split_value(value, levels, minor_unit_decimals=None, metrics=None) -> list:
+    """Returns the split values of value, in the same order as its template.
+
+    levels is as given by IATIActivity._iter_transactions_split_levels for
+    minor_unit_decimals. If metrics is given, each level is timed as its stage.
+    """
+    if minor_unit_decimals is None:
+        values = [value]
+        for stage, percentages in levels:
+            if metrics is not None:
+                start = time.perf_counter()
+            # Multiplied down through each field in turn, so the values are
+            # exactly the same as splitting by one field at a time
+            values = [
+                value * percentage / 100
+                for value in values
+                for percentage in percentages
+            ]
+            if metrics is not None:
+                metrics.record_stage(stage, time.perf_counter() - start)
+    else:
+        values = [minor_units.get_minor_units(value, minor_unit_decimals)]
+        for stage, split in levels:
+            if metrics is not None:
+                start = time.perf_counter()
+            values = [part for value in values for part in split(value)]
+            if metrics is not None:
+                metrics.record_stage(stage, time.perf_counter() - start)
+    return values
+
+
+class _TemplateCache:
+    """Works out get(template) once for each template of an activity.
+
+    Templates are looked up by id, so this is quick however big they are. They
+    are kept alive by the cache, so their ids are not reused while it is. Use
+    one cache per activity, as templates are only shared within one.
+    """
+
+    __slots__ = ("_function", "_results")
+
+    def __init__(self, function):
+        self._function = function
+        # (template, result) by template id
+        self._results: dict = {}
+
+    def get(self, template):
+        cached = self._results.get(id(template))
+        if cached is None:
+            cached = self._results[id(template)] = (template, self._function(template))
+        return cached[1]
@@ -0,0 +1,151 @@
+import math
+import operator
+from typing import Callable, Iterable, Optional, Sequence
+
+from .split_templates import _split_value, _TemplateCache
+
+DIMENSIONS = (
+    "recipient_country_code",
+    "recipient_region_code",
+    "sector_vocabulary",
+    "sector_code",
+)
+
+
+# How many values to keep for each total before adding them up
+PENDING_VALUES_LIMIT = 1000
+
+
+def _get_exact_partials(values: list) -> list:
+    """Returns a few floats that add up exactly to the same as values.
+
+    Each is math.fsum of values less the ones before it, which is the rest of
+    the sum correctly rounded, until nothing is left. So math.fsum of the
+    partials and any more values is the same as math.fsum of values and them.
+    """
+    partials: list = []
+    total = math.fsum(values)
+    while total:
+        partials.append(total)
+        if not math.isfinite(total):
+            # Infinite or NaN whatever else is added
+            break
+        total = math.fsum(values + [-i for i in partials])
+    return partials
+
+
+class TransactionsSplitTotals:
+    """Totals of split transaction values, keyed by some of DIMENSIONS.
+
+    Totals are exactly math.fsum of the matching split values, without building
+    the split transactions: each transaction value is split as
+    iter_transactions_split would split it and added to its totals. With
+    minor_unit_decimals, values are split as whole numbers of minor units (see
+    iter_transactions_split) and totals are ints, exactly their sum.
+    Transactions without a value are skipped.
+
+    As when summing the split transactions yourself, if an activity has sectors
+    in several vocabularies each transaction value is counted once per vocabulary,
+    unless the key includes sector_vocabulary.
+    A split transaction with several transaction level sectors counts towards
+    each of them if the key includes a sector dimension.
+    """
+
+    def __init__(
+        self,
+        dimensions: Sequence[str] = ("recipient_country_code",),
+        minor_unit_decimals: Optional[int] = None,
+    ):
+        for dimension in dimensions:
+            if dimension not in DIMENSIONS:
+                raise ValueError(
+                    "Unknown dimension {}; should be one of {}".format(
+                        dimension, ", ".join(DIMENSIONS)
+                    )
+                )
+        self.dimensions = tuple(dimensions)
+        self.minor_unit_decimals = minor_unit_decimals
+        self._by_sector = (
+            "sector_vocabulary" in self.dimensions or "sector_code" in self.dimensions
+        )
+        indexes = [DIMENSIONS.index(i) for i in self.dimensions]
+        self._get_key: Callable[[tuple], tuple]
+        if not indexes:
+            self._get_key = lambda row: ()
+        elif len(indexes) == 1:
+            index = indexes[0]
+            self._get_key = lambda row: (row[index],)
+        else:
+            # itemgetter with several items returns a tuple
+            self._get_key = operator.itemgetter(*indexes)
+        # Values not yet added up, by key. Once there are too many, they are
+        # replaced by their exact partials (or, for minor units, their sum).
+        self._values: dict = {}
+
+    def add_activity(self, iati_activity):
+        minor_unit_decimals = self.minor_unit_decimals
+        # [(values of a key, indexes of its rows)] for each template
+        templates_keys = _TemplateCache(self._get_template_keys)
+        for (
+            transaction,
+            template,
+            levels,
+        ) in iati_activity._iter_transactions_split_levels(minor_unit_decimals):
+            if transaction.value is None:
+                continue
+            split_values = _split_value(transaction.value, levels, minor_unit_decimals)
+            for values, indexes in templates_keys.get(template):
+                values.extend([split_values[i] for i in indexes])
+                if len(values) > PENDING_VALUES_LIMIT:
+                    values[:] = (
+                        _get_exact_partials(values)
+                        if minor_unit_decimals is None
+                        else [sum(values)]
+                    )
+
+    def _get_template_keys(self, template) -> list:
+        """Returns (values of a key, indexes of the rows of template in it) for
+        each key of template"""
+        indexes_by_key: dict = {}
+        for index, row in enumerate(template):
+            for key in self._get_row_keys(*row):
+                indexes_by_key.setdefault(key, []).append(index)
+        return [
+            (self._values.setdefault(key, []), indexes)
+            for key, indexes in indexes_by_key.items()
+        ]
+
+    def _get_row_keys(self, recipient_country_code, recipient_region_code, sectors):
+        get_key = self._get_key
+        if self._by_sector and sectors:
+            return [
+                get_key(
+                    (
+                        recipient_country_code,
+                        recipient_region_code,
+                        sector.vocabulary,
+                        sector.code,
+                    )
+                )
+                for sector in sectors
+            ]
+        return [get_key((recipient_country_code, recipient_region_code, None, None))]
+
+    def get_totals(self) -> dict:
+        add_up = math.fsum if self.minor_unit_decimals is None else sum
+        return {key: add_up(values) for key, values in self._values.items()}
+
+
+def get_transactions_split_totals(
+    iati_activities: Iterable,
+    dimensions: Sequence[str] = ("recipient_country_code",),
+    minor_unit_decimals: Optional[int] = None,
+) -> dict:
+    """Returns totals of the split transactions of many activities.
+
+    See TransactionsSplitTotals.
+    """
+    totals = TransactionsSplitTotals(dimensions, minor_unit_decimals)
+    for iati_activity in iati_activities:
+        totals.add_activity(iati_activity)
+    return totals.get_totals()
@@ -9,16 +9,28 @@ setuptools.setup(
         "Source": "https://github.com/IATI/activity-details-split-by-fields",
     },
     license="BSD 3-clause",
-    packages=setuptools.find_packages(exclude=["test"]),
+    packages=setuptools.find_packages(exclude=["test", "benchmarks"]),
     install_requires=[],
+    entry_points={
+        "console_scripts": [
+            "iati-activity-details-split-by-fields="
+            "iati_activity_details_split_by_fields.cli:main",
+        ],
+    },
     extras_require={
+        "numpy": ["numpy"],
+        "orjson": ["orjson"],
+        "arrow": ["pyarrow"],
         "dev": [
             "pytest==8.3.3",
             "black==24.10.0",
             "isort==5.13.2",
             "flake8==7.1.1",
             "mypy==1.13.0",
-        ]
+            "numpy",
+            "orjson",
+            "pyarrow",
+        ],
     },
     python_requires=">=3.9",
 )
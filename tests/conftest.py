@@ -0,0 +1,71 @@
+import pytest
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+@pytest.fixture
+def iati_activities():
+    """Activities for the APIs that split many at once.
+
+    Every third activity is big. Some have sectors, and some transactions
+    declare their own sectors or country, so the transactions of an activity
+    do not all split into the same number of rows.
+    """
+    return [
+        IATIActivity(
+            iati_identifier="XM-{}".format(i),
+            transactions=[
+                IATIActivityTransaction(value=1000 + i)
+                for _ in range(10 if i % 3 == 0 else 1)
+            ]
+            + (
+                [
+                    IATIActivityTransaction(
+                        value=500,
+                        sectors=[
+                            IATIActivityTransactionSector(vocabulary="1", code="A"),
+                            IATIActivityTransactionSector(vocabulary="1", code="B"),
+                        ],
+                    )
+                ]
+                if i % 2 == 0
+                else []
+            )
+            + (
+                [IATIActivityTransaction(value=50, recipient_country_code="KE")]
+                if i % 5 == 0
+                else []
+            ),
+            recipient_countries=[
+                IATIActivityRecipientCountry(code="FR", percentage=30),
+                IATIActivityRecipientCountry(code="GB", percentage=i + 1),
+            ],
+            sectors=(
+                [
+                    IATIActivitySector(vocabulary="cats", code="Henry", percentage=50),
+                    IATIActivitySector(vocabulary="dogs", code="Rover", percentage=100),
+                ]
+                if i % 4 == 0
+                else []
+            ),
+        )
+        for i in range(25)
+    ]
+
+
+@pytest.fixture
+def expected_transactions_split(iati_activities):
+    """get_transactions_split_as_json of each of iati_activities"""
+    return [i.get_transactions_split_as_json() for i in iati_activities]
@@ -0,0 +1,273 @@
+import io
+import math
+import struct
+
+import pytest
+
+from iati_activity_details_split_by_fields.activity_store import (
+    _HEADER,
+    _SECTION,
+    SECTIONS,
+    IATIActivityStore,
+    InvalidActivityStoreError,
+    write_activity_store,
+)
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+def _get_iati_activities():
+    return [
+        IATIActivity(
+            iati_identifier="GB-1-A",
+            transactions=[
+                IATIActivityTransaction(value=1000, recipient_country_code="FR"),
+                IATIActivityTransaction(
+                    value=12.5,
+                    sectors=[
+                        IATIActivityTransactionSector(vocabulary="1", code="11110"),
+                        IATIActivityTransactionSector(vocabulary=None, code="Ünï"),
+                    ],
+                ),
+                IATIActivityTransaction(value=7, recipient_region_code="298"),
+            ],
+            sectors=[IATIActivitySector(vocabulary="2", code="111", percentage=100)],
+            recipient_countries=[
+                IATIActivityRecipientCountry(code="FR", percentage=60),
+                IATIActivityRecipientCountry(code="GB", percentage=40.5),
+            ],
+            recipient_regions=[IATIActivityRecipientRegion(code="298", percentage=100)],
+        ),
+        IATIActivity(
+            sectors=[IATIActivitySector(vocabulary="2", code="111", percentage=None)]
+        ),
+        IATIActivity(
+            iati_identifier="GB-1-C",
+            transactions=[
+                IATIActivityTransaction(value=-3),
+                IATIActivityTransaction(value=None),
+            ],
+        ),
+    ]
+
+
+def _get_content(iati_activity):
+    """Everything in an activity, with the types of the numbers"""
+    return (
+        iati_activity.iati_identifier,
+        [
+            (
+                repr(i.value),
+                i.recipient_country_code,
+                i.recipient_region_code,
+                [(j.vocabulary, j.code) for j in i.sectors],
+            )
+            for i in iati_activity.transactions
+        ],
+        [(i.vocabulary, i.code, repr(i.percentage)) for i in iati_activity.sectors],
+        [(i.code, repr(i.percentage)) for i in iati_activity.recipient_countries],
+        [(i.code, repr(i.percentage)) for i in iati_activity.recipient_regions],
+    )
+
+
+def test_write_and_read(tmp_path):
+
+    path = str(tmp_path / "activities.iatistore")
+
+    assert 3 == write_activity_store(_get_iati_activities(), path)
+
+    with IATIActivityStore(path) as store:
+        assert 3 == len(store)
+        assert [_get_content(i) for i in _get_iati_activities()] == [
+            _get_content(i) for i in store
+        ]
+        assert _get_content(_get_iati_activities()[2]) == _get_content(store[-1])
+        assert "GB-1-C" == store.get_iati_identifier(2)
+        assert (
+            _get_iati_activities()[0].get_transactions_split_as_json()
+            == store[0].get_transactions_split_as_json()
+        )
+        with pytest.raises(IndexError):
+            store[3]
+
+
+def test_write_to_file_object(tmp_path):
+
+    fp = io.BytesIO()
+    write_activity_store([], fp)
+    (tmp_path / "empty.iatistore").write_bytes(fp.getvalue())
+
+    with IATIActivityStore(str(tmp_path / "empty.iatistore")) as store:
+        assert 0 == len(store)
+        assert [] == list(store)
+
+
+@pytest.mark.parametrize(
+    "content", [b"", b"<iati-activities/>" * 10, b"IATISTOR" + b"\0" * 100]
+)
+def test_not_a_store(tmp_path, content):
+
+    (tmp_path / "bad.iatistore").write_bytes(content)
+
+    with pytest.raises(InvalidActivityStoreError):
+        IATIActivityStore(str(tmp_path / "bad.iatistore"))
+
+
+def test_truncated(tmp_path):
+
+    path = str(tmp_path / "activities.iatistore")
+    write_activity_store(_get_iati_activities(), path)
+    with open(path, "r+b") as fp:
+        fp.truncate(200)
+
+    with pytest.raises(InvalidActivityStoreError):
+        IATIActivityStore(path)
+
+
+def _damage(path, name, index=None, value=None, start=None, size=None):
+    """Change entry index of the array name in a store, or its start or size"""
+    with open(path, "r+b") as fp:
+        content = bytearray(fp.read())
+        i = [i for i, _ in SECTIONS].index(name)
+        position = _HEADER.size + i * _SECTION.size
+        section_start, section_size = _SECTION.unpack_from(content, position)
+        _SECTION.pack_into(
+            content,
+            position,
+            section_start if start is None else start,
+            section_size if size is None else size,
+        )
+        if index is not None:
+            typecode = SECTIONS[i][1]
+            struct.pack_into(
+                typecode,
+                content,
+                section_start + index * struct.calcsize(typecode),
+                value,
+            )
+        fp.seek(0)
+        fp.write(content)
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        {"name": "transaction_value", "size": 7},
+        {"name": "sector_code", "start": -8},
+        {"name": "string_offsets", "start": 3},
+        # Offsets must end at the length of the array they index
+        {"name": "activity_transactions", "index": 3, "value": 1000},
+        {"name": "string_offsets", "index": 0, "value": 1},
+        # Arrays of the same things must be the same length
+        {"name": "transaction_value_kind", "size": 0},
+    ],
+)
+def test_damaged_layout(tmp_path, damage):
+
+    path = str(tmp_path / "activities.iatistore")
+    write_activity_store(_get_iati_activities(), path)
+    _damage(path, **damage)
+
+    with pytest.raises(InvalidActivityStoreError):
+        IATIActivityStore(path)
+
+
+@pytest.mark.parametrize(
+    "damage",
+    [
+        # Offsets that go backwards
+        {"name": "activity_transactions", "index": 1, "value": 1000},
+        {"name": "activity_sectors", "index": 1, "value": -5},
+        {"name": "transaction_sectors", "index": 1, "value": 1000},
+        # String ids that are not in the table
+        {"name": "activity_iati_identifier", "index": 0, "value": 1000},
+        {"name": "transaction_sector_code", "index": 0, "value": -5},
+        # Not UTF-8
+        {"name": "string_data", "index": 0, "value": 0xFF},
+        # Not a kind of number
+        {"name": "transaction_value_kind", "index": 0, "value": 7},
+        # Ints that are not whole numbers
+        {"name": "transaction_value", "index": 0, "value": math.nan},
+        {"name": "transaction_value", "index": 0, "value": math.inf},
+        {"name": "transaction_value", "index": 0, "value": 0.5},
+    ],
+)
+def test_damaged_activity(tmp_path, damage):
+
+    path = str(tmp_path / "activities.iatistore")
+    write_activity_store(_get_iati_activities(), path)
+    _damage(path, **damage)
+
+    with IATIActivityStore(path) as store:
+        with pytest.raises(InvalidActivityStoreError):
+            list(store)
+
+
+def test_values_that_can_not_be_stored():
+
+    with pytest.raises(TypeError):
+        write_activity_store(
+            [IATIActivity(transactions=[IATIActivityTransaction(value="1000")])],
+            io.BytesIO(),
+        )
+    with pytest.raises(TypeError):
+        write_activity_store([IATIActivity(iati_identifier=1)], io.BytesIO())
+    with pytest.raises(ValueError):
+        write_activity_store(
+            [IATIActivity(transactions=[IATIActivityTransaction(value=2**60)])],
+            io.BytesIO(),
+        )
+
+
+def test_find_by_iati_identifier(tmp_path):
+
+    path = str(tmp_path / "activities.iatistore")
+    write_activity_store(
+        [
+            IATIActivity(iati_identifier="XM-3"),
+            IATIActivity(),
+            IATIActivity(iati_identifier="XM-1"),
+            IATIActivity(iati_identifier="XM-3", transactions=[]),
+            IATIActivity(iati_identifier="XM-2"),
+        ],
+        path,
+    )
+
+    with IATIActivityStore(path) as store:
+        assert 2 == store.find("XM-1")
+        assert 4 == store.find("XM-2")
+        # The first of several
+        assert 0 == store.find("XM-3")
+        assert store.find("XM-0") is None
+        assert store.find("XM-4") is None
+        assert store.find("") is None
+        assert "XM-2" == store.get_activity("XM-2").iati_identifier
+        with pytest.raises(KeyError):
+            store.get_activity("XM-4")
+
+
+@pytest.mark.parametrize("value", [1, 5, -1])
+def test_find_damaged_index(tmp_path, value):
+
+    path = str(tmp_path / "activities.iatistore")
+    write_activity_store([IATIActivity(iati_identifier="XM-1"), IATIActivity()], path)
+    # Index an activity without an iati_identifier, or one not in the store
+    _damage(path, "iati_identifier_index", 0, value)
+
+    with IATIActivityStore(path) as store:
+        with pytest.raises(InvalidActivityStoreError):
+            store.find("XM-1")
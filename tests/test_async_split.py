@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from iati_activity_details_split_by_fields.async_split import split_activities_async
+
+
+def _get_expected(expected_transactions_split):
+    return [
+        (i, row)
+        for i, transactions_split in enumerate(expected_transactions_split)
+        for row in transactions_split
+    ]
+
+
+async def _aiter(items, read):
+    for item in items:
+        read.append(item)
+        yield item
+
+
+async def _collect(activities, read, **kwargs):
+    return [
+        row
+        async for row in split_activities_async(
+            _aiter(activities, read), as_json=True, **kwargs
+        )
+    ]
+
+
+def test_split_activities_async_in_order(iati_activities, expected_transactions_split):
+
+    read: list = []
+
+    results = asyncio.run(
+        _collect(iati_activities, read, offload_rows=10, max_pending=3)
+    )
+
+    assert _get_expected(expected_transactions_split) == results
+    assert len(iati_activities) == len(read)
+
+
+def test_split_activities_async_with_process_pool(
+    iati_activities, expected_transactions_split
+):
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        results = asyncio.run(
+            _collect(iati_activities, [], executor=executor, offload_rows=10)
+        )
+
+    assert _get_expected(expected_transactions_split) == results
+
+
+def test_split_activities_async_only_reads_ahead_max_pending(iati_activities):
+
+    async def run():
+        read: list = []
+        rows = split_activities_async(
+            _aiter(iati_activities, read), offload_rows=10, max_pending=3
+        )
+        await rows.__anext__()
+        assert len(read) <= 3
+        await rows.aclose()
+
+    asyncio.run(run())
+
+
+def test_split_activities_async_max_pending_must_be_positive(iati_activities):
+
+    with pytest.raises(ValueError):
+        asyncio.run(_collect(iati_activities, [], max_pending=0))
@@ -377,3 +377,59 @@ def test_no_double_counting():
 
     assert sector_totals["Health"] == 700  # 70% of 1000
     assert sector_totals["Education"] == 300  # 30% of 1000
+
+
+def test_split_by_everything_with_incorrect_percentages():
+    """Values should be exactly the same as splitting by country, then region, then sector in turn"""
+
+    iati_activity = IATIActivity(
+        transactions=[IATIActivityTransaction(value=1234.56)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=40),
+        ],
+        recipient_regions=[
+            IATIActivityRecipientRegion(code="ASIA", percentage=33.3),
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary="cats", code="Henry", percentage=15),
+            IATIActivitySector(vocabulary="cats", code="Linda", percentage=70),
+        ],
+    )
+
+    results = iati_activity.get_transactions_split_as_json()
+
+    assert [
+        (
+            "FR",
+            "ASIA",
+            "Henry",
+            1234.56 * (30 / 70 * 100) / 100 * 100.0 / 100 * (15 / 85 * 100) / 100,
+        ),
+        (
+            "FR",
+            "ASIA",
+            "Linda",
+            1234.56 * (30 / 70 * 100) / 100 * 100.0 / 100 * (70 / 85 * 100) / 100,
+        ),
+        (
+            "GB",
+            "ASIA",
+            "Henry",
+            1234.56 * (40 / 70 * 100) / 100 * 100.0 / 100 * (15 / 85 * 100) / 100,
+        ),
+        (
+            "GB",
+            "ASIA",
+            "Linda",
+            1234.56 * (40 / 70 * 100) / 100 * 100.0 / 100 * (70 / 85 * 100) / 100,
+        ),
+    ] == [
+        (
+            r["recipient_country_code"],
+            r["recipient_region_code"],
+            r["sectors"][0]["code"],
+            r["value"],
+        )
+        for r in results
+    ]
@@ -0,0 +1,69 @@
+import concurrent.futures
+
+from iati_activity_details_split_by_fields.batch import _map_chunks, split_activities
+
+
+def test_split_activities_in_process(iati_activities, expected_transactions_split):
+
+    results = split_activities(iati_activities, max_workers=0, as_json=True)
+
+    assert list(enumerate(expected_transactions_split)) == list(results)
+
+
+def test_split_activities_ordered(iati_activities, expected_transactions_split):
+
+    results = split_activities(
+        iati_activities, max_workers=2, chunksize=3, as_json=True
+    )
+
+    assert list(enumerate(expected_transactions_split)) == list(results)
+
+
+def test_split_activities_unordered(iati_activities, expected_transactions_split):
+
+    results = split_activities(
+        iati_activities,
+        max_workers=2,
+        chunksize=4,
+        ordered=False,
+        as_json=True,
+    )
+
+    assert list(enumerate(expected_transactions_split)) == sorted(
+        results, key=lambda x: x[0]
+    )
+
+
+def test_split_activities_with_executor(iati_activities, expected_transactions_split):
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(
+            split_activities(iati_activities, chunksize=5, executor=executor)
+        )
+
+    assert list(enumerate(expected_transactions_split)) == [
+        (i, [x.get_as_json() for x in transactions_split])
+        for i, transactions_split in results
+    ]
+
+
+def test_results_of_chunks_in_flight_are_discarded_when_closed_early(
+    iati_activities,
+):
+    discarded = []
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        results = _map_chunks(
+            lambda start, chunk: start,
+            iati_activities,
+            None,
+            5,
+            True,
+            executor,
+            3,
+            discarded.append,
+        )
+        assert (0, 0) == next(results)
+        results.close()
+
+    assert [5, 10] == sorted(discarded)
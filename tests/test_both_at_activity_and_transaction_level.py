@@ -1,4 +1,157 @@
-# TODO
-# What happens when a country, region, sector is set at BOTH Activity and Transaction?
-# According to standard, this isn't allowed!
-# But we should test this to make sure bad data is ok
+"""According to the standard a field should not be declared at both activity and
+transaction level, but data that does must still split sensibly: transaction
+level declarations take precedence and only the other fields are split."""
+
+from iati_activity_details_split_by_fields.fan_out import estimate_fan_out
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+def _get_iati_activity(transactions):
+    return IATIActivity(
+        transactions=transactions,
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=50),
+            IATIActivityRecipientCountry(code="GB", percentage=50),
+        ],
+        recipient_regions=[
+            IATIActivityRecipientRegion(code="ASIA", percentage=100),
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary="cats", code="Henry", percentage=60),
+            IATIActivitySector(vocabulary="cats", code="Linda", percentage=40),
+        ],
+    )
+
+
+def test_country_set_on_transaction():
+
+    iati_activity = _get_iati_activity(
+        [IATIActivityTransaction(value=1000, recipient_country_code="IE")]
+    )
+
+    results = iati_activity.get_transactions_split_as_json()
+
+    # Not split by country or region, but still split by sector
+    assert [
+        {
+            "recipient_country_code": "IE",
+            "recipient_region_code": None,
+            "sectors": [{"vocabulary": "cats", "code": "Henry"}],
+            "value": 600,
+        },
+        {
+            "recipient_country_code": "IE",
+            "recipient_region_code": None,
+            "sectors": [{"vocabulary": "cats", "code": "Linda"}],
+            "value": 400,
+        },
+    ] == results
+
+
+def test_region_set_on_transaction():
+
+    iati_activity = _get_iati_activity(
+        [IATIActivityTransaction(value=1000, recipient_region_code="AFRICA")]
+    )
+
+    results = iati_activity.get_transactions_split_as_json()
+
+    assert [None] == list({i["recipient_country_code"] for i in results})
+    assert ["AFRICA"] == list({i["recipient_region_code"] for i in results})
+    assert [600, 400] == [i["value"] for i in results]
+
+
+def test_sectors_set_on_transaction():
+
+    iati_activity = _get_iati_activity(
+        [
+            IATIActivityTransaction(
+                value=1000,
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="dogs", code="Rover")
+                ],
+            )
+        ]
+    )
+
+    results = iati_activity.get_transactions_split_as_json()
+
+    # Split by country and region, but not by sector
+    assert [
+        {
+            "recipient_country_code": "FR",
+            "recipient_region_code": "ASIA",
+            "sectors": [{"vocabulary": "dogs", "code": "Rover"}],
+            "value": 500,
+        },
+        {
+            "recipient_country_code": "GB",
+            "recipient_region_code": "ASIA",
+            "sectors": [{"vocabulary": "dogs", "code": "Rover"}],
+            "value": 500,
+        },
+    ] == results
+
+
+def test_everything_set_on_transaction():
+
+    transaction = IATIActivityTransaction(
+        value=1000,
+        recipient_country_code="IE",
+        sectors=[IATIActivityTransactionSector(vocabulary="dogs", code="Rover")],
+    )
+    iati_activity = _get_iati_activity([transaction])
+
+    results = iati_activity.get_transactions_split_as_json()
+
+    assert [
+        {
+            "recipient_country_code": "IE",
+            "recipient_region_code": None,
+            "sectors": [{"vocabulary": "dogs", "code": "Rover"}],
+            "value": 1000,
+        }
+    ] == results
+
+
+def test_mixed_transactions():
+
+    iati_activity = _get_iati_activity(
+        [
+            IATIActivityTransaction(value=1000),
+            IATIActivityTransaction(value=100, recipient_country_code="IE"),
+            IATIActivityTransaction(
+                value=10,
+                recipient_region_code="AFRICA",
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="dogs", code="Rover")
+                ],
+            ),
+        ]
+    )
+
+    results = iati_activity.get_transactions_split_as_json()
+
+    assert 4 + 2 + 1 == len(results)
+    assert 7 == estimate_fan_out(iati_activity).rows_count
+    assert {("IE",): 100, ("FR",): 500, ("GB",): 500, (None,): 10} == (
+        iati_activity.get_transactions_split_totals()
+    )
+    assert [60, 40, 10] == [
+        i.value for i in iati_activity.get_transactions_split(minor_unit_decimals=0)
+    ][-3:]
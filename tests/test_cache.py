@@ -0,0 +1,153 @@
+import sqlite3
+
+from iati_activity_details_split_by_fields import iati_activity as iati_activity_module
+from iati_activity_details_split_by_fields.cache import TransactionsSplitCache
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+
+
+def _get_iati_activity(value=1234.56):
+    return IATIActivity(
+        transactions=[IATIActivityTransaction(value=value)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=40),
+        ],
+        sectors=[IATIActivitySector(vocabulary="cats", code="Henry", percentage=1)],
+    )
+
+
+def test_hits_and_misses(tmp_path):
+
+    with TransactionsSplitCache(str(tmp_path / "cache.sqlite")) as cache:
+        expected = _get_iati_activity().get_transactions_split_as_json()
+
+        assert expected == cache.get_transactions_split_as_json(_get_iati_activity())
+        assert expected == cache.get_transactions_split_as_json(_get_iati_activity())
+        assert expected == [
+            i.get_as_json() for i in cache.get_transactions_split(_get_iati_activity())
+        ]
+        assert (2, 1) == (cache.hits, cache.misses)
+
+        # Minor units are kept separately
+        assert _get_iati_activity().get_transactions_split_as_json(
+            minor_unit_decimals=2
+        ) == cache.get_transactions_split_as_json(
+            _get_iati_activity(), minor_unit_decimals=2
+        )
+        assert (2, 2) == (cache.hits, cache.misses)
+
+    # Still there when opened again
+    with TransactionsSplitCache(str(tmp_path / "cache.sqlite")) as cache:
+        assert 2 == len(cache)
+        cache.get_transactions_split_as_json(_get_iati_activity())
+        assert (1, 0) == (cache.hits, cache.misses)
+
+
+def test_types_of_numbers_are_kept_apart(tmp_path):
+
+    iati_activity = IATIActivity(transactions=[IATIActivityTransaction(value=1000)])
+    iati_activity_float = IATIActivity(
+        transactions=[IATIActivityTransaction(value=1000.0)]
+    )
+
+    with TransactionsSplitCache(str(tmp_path / "cache.sqlite")) as cache:
+        cache.get_transactions_split_as_json(iati_activity)
+
+        # Not split, so the value is returned as it was given
+        assert [1000.0] == [
+            i["value"]
+            for i in cache.get_transactions_split_as_json(iati_activity_float)
+        ]
+        assert float is type(
+            cache.get_transactions_split_as_json(iati_activity_float)[0]["value"]
+        )
+        assert (1, 2) == (cache.hits, cache.misses)
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+
+    with TransactionsSplitCache(str(tmp_path / "cache.sqlite"), max_entries=2) as cache:
+        cache.get_transactions_split_as_json(_get_iati_activity(1))
+        cache.get_transactions_split_as_json(_get_iati_activity(2))
+        cache.get_transactions_split_as_json(_get_iati_activity(1))
+        cache.get_transactions_split_as_json(_get_iati_activity(3))
+
+        assert 2 == len(cache)
+        cache.get_transactions_split_as_json(_get_iati_activity(1))
+        cache.get_transactions_split_as_json(_get_iati_activity(3))
+        assert 3 == cache.hits
+        cache.get_transactions_split_as_json(_get_iati_activity(2))
+        assert 4 == cache.misses
+
+
+def test_max_bytes(tmp_path):
+
+    with TransactionsSplitCache(
+        str(tmp_path / "cache.sqlite"), max_bytes=1000
+    ) as cache:
+        for value in range(10):
+            cache.get_transactions_split_as_json(_get_iati_activity(value))
+
+        assert 3 == len(cache)
+        cache.get_transactions_split_as_json(_get_iati_activity(9))
+        assert 1 == cache.hits
+
+
+def test_new_split_rules_version_invalidates(tmp_path, monkeypatch):
+
+    with TransactionsSplitCache(str(tmp_path / "cache.sqlite")) as cache:
+        cache.get_transactions_split_as_json(_get_iati_activity())
+
+    monkeypatch.setattr(iati_activity_module, "SPLIT_RULES_VERSION", 1000)
+
+    with TransactionsSplitCache(str(tmp_path / "cache.sqlite")) as cache:
+        assert 0 == len(cache)
+        cache.get_transactions_split_as_json(_get_iati_activity())
+        assert (0, 1) == (cache.hits, cache.misses)
+
+
+def test_totals_are_kept(tmp_path):
+
+    path = str(tmp_path / "cache.sqlite")
+    with TransactionsSplitCache(path, max_entries=5, max_bytes=2000) as cache:
+        for value in range(20):
+            cache.get_transactions_split_as_json(_get_iati_activity(value))
+            cache.get_transactions_split_as_json(_get_iati_activity(value))
+        entries, size = cache._get_totals()
+
+    connection = sqlite3.connect(path)
+    assert (entries, size) == connection.execute(
+        "SELECT COUNT(*), SUM(size) FROM transactions_split"
+    ).fetchone()
+    assert 0 < entries <= 5 and size <= 2000
+    connection.close()
+
+    with TransactionsSplitCache(path) as cache:
+        assert entries == len(cache)
+        cache.clear()
+        assert (0, 0) == cache._get_totals()
+
+
+def test_hits_are_written_in_batches(tmp_path):
+
+    path = str(tmp_path / "cache.sqlite")
+    with TransactionsSplitCache(path, max_entries=2) as cache:
+        cache.get_transactions_split_as_json(_get_iati_activity(1))
+        cache.get_transactions_split_as_json(_get_iati_activity(2))
+        cache.get_transactions_split_as_json(_get_iati_activity(1))
+        assert 1 == len(cache._last_used)
+
+    # Written when closed, so 2 is the least recently used
+    with TransactionsSplitCache(path, max_entries=2) as cache:
+        cache.get_transactions_split_as_json(_get_iati_activity(3))
+        cache.get_transactions_split_as_json(_get_iati_activity(1))
+        assert (1, 1) == (cache.hits, cache.misses)
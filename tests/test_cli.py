@@ -0,0 +1,106 @@
+import csv
+import json
+
+from iati_activity_details_split_by_fields.activity_store import write_activity_store
+from iati_activity_details_split_by_fields.cli import main
+from iati_activity_details_split_by_fields.iati_activity_xml import (
+    iter_activities_from_xml,
+)
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<iati-activities version="2.03">
+    <iati-activity>
+        <iati-identifier>GB-1-A</iati-identifier>
+        <recipient-country code="FR" percentage="50"/>
+        <recipient-country code="GB" percentage="50"/>
+        <transaction>
+            <value>1000</value>
+            <sector vocabulary="1" code="11110"/>
+            <sector vocabulary="2" code="111"/>
+        </transaction>
+    </iati-activity>
+</iati-activities>
+"""
+
+
+def test_jsonl(tmp_path, capsys):
+
+    (tmp_path / "in").mkdir()
+    (tmp_path / "in" / "a.xml").write_text(XML)
+    (tmp_path / "in" / "b.xml").write_text(XML.replace("GB-1-A", "GB-1-B"))
+
+    assert 0 == main([str(tmp_path / "in"), "--output", str(tmp_path / "out.jsonl")])
+
+    with open(tmp_path / "out.jsonl") as fp:
+        results = [json.loads(line) for line in fp]
+    assert [
+        ("GB-1-A", "FR", 500),
+        ("GB-1-A", "GB", 500),
+        ("GB-1-B", "FR", 500),
+        ("GB-1-B", "GB", 500),
+    ] == [
+        (i["iati_identifier"], i["recipient_country_code"], i["value"]) for i in results
+    ]
+    assert "Split 2 activities from 2 files into 4 rows" in capsys.readouterr().err
+
+
+def test_csv(tmp_path, capsys):
+
+    (tmp_path / "a.xml").write_text(XML)
+
+    assert 0 == main([str(tmp_path / "a.xml"), "--format", "csv"])
+
+    results = list(csv.reader(capsys.readouterr().out.splitlines()))
+    assert [
+        [
+            "iati_identifier",
+            "value",
+            "recipient_country_code",
+            "recipient_region_code",
+            "sector_vocabulary",
+            "sector_code",
+        ],
+        ["GB-1-A", "500.0", "FR", "", "1", "11110"],
+        ["GB-1-A", "500.0", "FR", "", "2", "111"],
+        ["GB-1-A", "500.0", "GB", "", "1", "11110"],
+        ["GB-1-A", "500.0", "GB", "", "2", "111"],
+    ] == results
+
+
+def test_bad_file(tmp_path, capsys):
+
+    (tmp_path / "a.xml").write_text(XML)
+    (tmp_path / "b.xml").write_text("<iati-activities>")
+
+    assert 1 == main([str(tmp_path), "--output", str(tmp_path / "out.jsonl")])
+
+    assert "Could not read" in capsys.readouterr().err
+
+
+def test_activity_store(tmp_path, capsys):
+
+    (tmp_path / "a.xml").write_text(XML)
+    write_activity_store(
+        iter_activities_from_xml(str(tmp_path / "a.xml")),
+        str(tmp_path / "a.iatistore"),
+    )
+    (tmp_path / "a.xml").unlink()
+
+    assert 0 == main([str(tmp_path), "--format", "csv"])
+
+    results = list(csv.reader(capsys.readouterr().out.splitlines()))
+    assert ["GB-1-A", "500.0", "FR", "", "1", "11110"] == results[1]
+    assert 5 == len(results)
+
+
+def test_damaged_activity_store(tmp_path, capsys):
+
+    (tmp_path / "a.xml").write_text(XML)
+    with open(str(tmp_path / "b.iatistore"), "wb") as fp:
+        write_activity_store(iter_activities_from_xml(str(tmp_path / "a.xml")), fp)
+    with open(str(tmp_path / "b.iatistore"), "r+b") as fp:
+        fp.truncate(fp.seek(0, 2) - 4)
+
+    assert 1 == main([str(tmp_path), "--output", str(tmp_path / "out.jsonl")])
+
+    assert "Could not read" in capsys.readouterr().err
@@ -0,0 +1,35 @@
+import pickle
+
+from iati_activity_details_split_by_fields.code_table import NO_CODE, CodeTable
+
+
+def test_code_table():
+
+    code_table = CodeTable(["FR", "GB"])
+
+    assert [0, 1, 2, 0, NO_CODE] == code_table.get_ids(["FR", "GB", "IE", "FR", None])
+    assert ["FR", "GB", "IE"] == code_table.codes
+    assert ["IE", None, "FR"] == code_table.get_codes([2, NO_CODE, 0])
+    assert "IE" == code_table.get_code(2)
+    assert code_table.get_code(NO_CODE) is None
+    assert "GB" in code_table
+    assert None not in code_table
+    assert 3 == len(code_table)
+
+
+def test_get_remapping():
+
+    code_table = CodeTable(["FR", "GB"])
+    other = CodeTable(["IE", "FR"])
+
+    assert [2, 0] == code_table.get_remapping(other)
+    assert ["FR", "GB", "IE"] == code_table.codes
+
+
+def test_pickle():
+
+    code_table = pickle.loads(pickle.dumps(CodeTable(["FR", "GB"])))
+
+    assert ["FR", "GB"] == code_table.codes
+    assert 1 == code_table.get_id("GB")
+    assert NO_CODE == code_table.get_id(None)
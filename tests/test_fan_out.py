@@ -0,0 +1,158 @@
+import random
+
+import pytest
+
+from iati_activity_details_split_by_fields.fan_out import (
+    FanOutExceededError,
+    FanOutGuard,
+    estimate_fan_out,
+)
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+def _get_iati_activity(rng):
+    return IATIActivity(
+        iati_identifier="XM-1",
+        transactions=[
+            IATIActivityTransaction(
+                value=rng.randint(1, 1000),
+                recipient_country_code=rng.choice([None, "FR"]),
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="1", code=str(i))
+                    for i in range(rng.randint(0, 2))
+                ],
+            )
+            for _ in range(rng.randint(0, 5))
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code=str(i), percentage=rng.randint(0, 50))
+            for i in range(rng.choice([0, 1, 3]))
+        ],
+        recipient_regions=[
+            IATIActivityRecipientRegion(code=str(i), percentage=rng.randint(1, 50))
+            for i in range(rng.choice([0, 2]))
+        ],
+        sectors=[
+            IATIActivitySector(
+                vocabulary=rng.choice(["1", "2", None]),
+                code=str(i),
+                percentage=rng.randint(1, 50),
+            )
+            for i in range(rng.choice([0, 1, 4]))
+        ],
+    )
+
+
+def test_estimate_is_exact():
+
+    rng = random.Random(1)
+    for _ in range(200):
+        iati_activity = _get_iati_activity(rng)
+
+        estimate = estimate_fan_out(iati_activity)
+
+        transactions_split = iati_activity.get_transactions_split()
+        assert len(transactions_split) == estimate.rows_count
+        assert len(iati_activity.transactions) == estimate.transactions_count
+        assert (estimate.approximate_bytes > 0) == (estimate.rows_count > 0)
+
+
+def _get_big_iati_activity():
+    return IATIActivity(
+        iati_identifier="XM-BIG",
+        transactions=[IATIActivityTransaction(value=100) for _ in range(10)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code=str(i), percentage=1) for i in range(10)
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary=v, code=str(i), percentage=1)
+            for v in ("1", "2")
+            for i in range(5)
+        ],
+    )
+
+
+def test_estimate_big():
+
+    estimate = estimate_fan_out(_get_big_iati_activity())
+
+    assert 1000 == estimate.rows_count
+    assert 100 == estimate.max_rows_per_transaction
+
+
+def test_guard_under_limit():
+
+    result = FanOutGuard(max_rows=1000).split(_get_big_iati_activity(), as_json=True)
+
+    assert FanOutGuard.LIST == result.mode
+    assert _get_big_iati_activity().get_transactions_split_as_json() == (
+        result.transactions_split
+    )
+
+
+def test_guard_refuse():
+
+    with pytest.raises(FanOutExceededError) as error:
+        FanOutGuard(max_rows=999).split(_get_big_iati_activity())
+
+    assert 1000 == error.value.estimate.rows_count
+    assert "XM-BIG" in str(error.value)
+
+    with pytest.raises(FanOutExceededError):
+        FanOutGuard(max_rows=10**6, max_bytes=1000).check(_get_big_iati_activity())
+
+
+def test_guard_stream_only():
+
+    result = FanOutGuard(max_rows=999, policy=FanOutGuard.STREAM_ONLY).split(
+        _get_big_iati_activity(), as_json=True
+    )
+
+    assert FanOutGuard.STREAM_ONLY == result.mode
+    assert not isinstance(result.transactions_split, list)
+    assert _get_big_iati_activity().get_transactions_split_as_json() == list(
+        result.transactions_split
+    )
+
+
+def test_guard_aggregate_only():
+
+    result = FanOutGuard(
+        max_rows=999,
+        policy=FanOutGuard.AGGREGATE_ONLY,
+        dimensions=("sector_vocabulary",),
+    ).split(_get_big_iati_activity())
+
+    assert FanOutGuard.AGGREGATE_ONLY == result.mode
+    assert result.transactions_split is None
+    assert {("1",): pytest.approx(1000), ("2",): pytest.approx(1000)} == result.totals
+
+    result = FanOutGuard(
+        max_rows=999,
+        policy=FanOutGuard.AGGREGATE_ONLY,
+        dimensions=("sector_vocabulary",),
+    ).split(_get_big_iati_activity(), minor_unit_decimals=2)
+
+    # In minor units, as the split would be
+    assert {("1",): 100000, ("2",): 100000} == result.totals
+
+
+def test_guard_unknown_policy():
+
+    with pytest.raises(ValueError):
+        FanOutGuard(max_rows=1, policy="explode")
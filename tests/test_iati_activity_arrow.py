@@ -0,0 +1,88 @@
+import io
+
+import pytest
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+pyarrow = pytest.importorskip("pyarrow")
+pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+
+from iati_activity_details_split_by_fields.iati_activity_arrow import (  # noqa: E402
+    get_schema,
+    iter_record_batches,
+    write_parquet,
+)
+
+
+def _get_expected(iati_activities):
+    rows = []
+    for activity_index, iati_activity in enumerate(iati_activities):
+        for transaction_index, transaction in enumerate(iati_activity.transactions):
+            # Transactions can split into different numbers of rows, so split
+            # each one on its own to know which rows are its
+            transaction_activity = IATIActivity(
+                transactions=[transaction],
+                sectors=iati_activity.sectors,
+                recipient_countries=iati_activity.recipient_countries,
+                recipient_regions=iati_activity.recipient_regions,
+            )
+            for split in transaction_activity.get_transactions_split():
+                for sector in split.sectors or [IATIActivityTransactionSector()]:
+                    rows.append(
+                        {
+                            "activity_index": activity_index,
+                            "iati_identifier": iati_activity.iati_identifier,
+                            "transaction_index": transaction_index,
+                            "value": split.value,
+                            "recipient_country_code": split.recipient_country_code,
+                            "recipient_region_code": split.recipient_region_code,
+                            "sector_vocabulary": sector.vocabulary,
+                            "sector_code": sector.code,
+                        }
+                    )
+    return rows
+
+
+def test_record_batches(iati_activities):
+
+    record_batches = list(iter_record_batches(iati_activities, batch_rows=50))
+
+    # Each batch is finished by the transaction that reaches 50 rows, and no
+    # transaction has more than 4
+    assert len(record_batches) > 2
+    assert all(50 <= i.num_rows < 54 for i in record_batches[:-1])
+    assert 0 < record_batches[-1].num_rows < 54
+    assert all(i.schema == get_schema() for i in record_batches)
+    table = pyarrow.Table.from_batches(record_batches)
+    assert _get_expected(iati_activities) == table.to_pylist()
+    assert pyarrow.types.is_dictionary(table.schema.field("sector_code").type)
+
+
+def test_write_parquet(iati_activities):
+
+    output = io.BytesIO()
+
+    assert len(_get_expected(iati_activities)) == write_parquet(
+        iati_activities, output, row_group_rows=100
+    )
+
+    output.seek(0)
+    parquet_file = pyarrow_parquet.ParquetFile(output)
+    assert parquet_file.num_row_groups > 2
+    assert all(
+        parquet_file.metadata.row_group(i).num_rows >= 100
+        for i in range(parquet_file.num_row_groups - 1)
+    )
+    assert _get_expected(iati_activities) == parquet_file.read().to_pylist()
+
+
+def test_write_parquet_no_activities(tmp_path):
+
+    path = str(tmp_path / "split.parquet")
+
+    assert 0 == write_parquet([], path)
+
+    assert 0 == pyarrow_parquet.read_table(path).num_rows
@@ -1,4 +1,7 @@
 from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
 from iati_activity_details_split_by_fields.iati_activity_sector import (
     IATIActivitySector,
 )
@@ -18,3 +21,57 @@ def test_get_sectors_grouped_by_vocab_with_normalised_percentages():
 
     assert ["Henry", "Linda"] == [i.code for i in results["cats"]]
     assert ["Rover"] == [i.code for i in results["dogs"]]
+
+
+def test_normalised_percentages_are_cached():
+
+    iati_activity = IATIActivity(
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=20),
+        ],
+        sectors=[IATIActivitySector(vocabulary="cats", code="Henry", percentage=50)],
+    )
+
+    assert (
+        iati_activity._get_recipient_countries_with_normalised_percentages()
+        is iati_activity._get_recipient_countries_with_normalised_percentages()
+    )
+    assert (
+        iati_activity._get_sectors_grouped_by_vocab_with_normalised_percentages()
+        is iati_activity._get_sectors_grouped_by_vocab_with_normalised_percentages()
+    )
+
+
+def test_normalised_percentages_cache_is_invalidated():
+
+    iati_activity = IATIActivity(
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=20),
+        ],
+    )
+
+    def get_results():
+        return [
+            (i.code, i.percentage)
+            for i in iati_activity._get_recipient_countries_with_normalised_percentages()
+        ]
+
+    assert [("FR", 60), ("GB", 40)] == get_results()
+
+    # Change an object in the list
+    iati_activity.recipient_countries[1].percentage = 70
+    assert [("FR", 30), ("GB", 70)] == get_results()
+
+    # Change the list
+    iati_activity.recipient_countries.append(
+        IATIActivityRecipientCountry(code="IE", percentage=100)
+    )
+    assert [("FR", 15), ("GB", 35), ("IE", 50)] == get_results()
+
+    # Reassign the list
+    iati_activity.recipient_countries = [
+        IATIActivityRecipientCountry(code="IE", percentage=10)
+    ]
+    assert [("IE", 100)] == get_results()
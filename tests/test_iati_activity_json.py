@@ -0,0 +1,152 @@
+import io
+import json
+import math
+import tracemalloc
+
+import pytest
+
+from iati_activity_details_split_by_fields import iati_activity_json
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_json import (
+    dumps_transactions_split,
+    split_activities_as_json_lines,
+    write_transactions_split_as_json_lines,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(iati_activity_json, "orjson", None)
+
+
+def _get_iati_activities():
+    return [
+        IATIActivity(
+            iati_identifier="GB-1-A",
+            transactions=[
+                IATIActivityTransaction(value=1000),
+                IATIActivityTransaction(value=1234.56),
+            ],
+            recipient_countries=[
+                IATIActivityRecipientCountry(code="FR", percentage=30),
+                IATIActivityRecipientCountry(code="GB", percentage=40),
+            ],
+            sectors=[
+                IATIActivitySector(vocabulary="cats", code="Henry", percentage=15),
+                IATIActivitySector(vocabulary="cats", code='"Linda"', percentage=70),
+            ],
+        ),
+        IATIActivity(
+            iati_identifier="GB-1-B",
+            transactions=[
+                IATIActivityTransaction(
+                    value=10**30,
+                    recipient_region_code="ASIA",
+                    sectors=[
+                        IATIActivityTransactionSector(vocabulary="cats", code="Henry"),
+                        IATIActivityTransactionSector(vocabulary="dogs", code="Rov€r"),
+                    ],
+                ),
+                IATIActivityTransaction(value=None),
+            ],
+        ),
+    ]
+
+
+def test_dumps_transactions_split(encoder):
+
+    for iati_activity in _get_iati_activities():
+        assert iati_activity.get_transactions_split_as_json() == json.loads(
+            dumps_transactions_split(iati_activity)
+        )
+
+
+def test_write_transactions_split_as_json_lines(encoder):
+
+    fp = io.BytesIO()
+
+    rows_count = write_transactions_split_as_json_lines(
+        _get_iati_activities(), fp, include_iati_identifier=True
+    )
+
+    expected = [
+        {"iati_identifier": a.iati_identifier, **row}
+        for a in _get_iati_activities()
+        for row in a.get_transactions_split_as_json()
+    ]
+    assert 10 == rows_count
+    assert expected == [json.loads(line) for line in fp.getvalue().splitlines()]
+    # Same key order as get_as_json
+    assert ["iati_identifier", "value"] == list(
+        json.loads(fp.getvalue().splitlines()[0])
+    )[:2]
+
+
+def test_split_activities_as_json_lines():
+
+    results = list(
+        split_activities_as_json_lines(
+            _get_iati_activities(), max_workers=2, chunksize=1
+        )
+    )
+
+    assert [0, 1] == [i[0] for i in results]
+    assert [8, 2] == [i[1] for i in results]
+    assert [a.get_transactions_split_as_json() for a in _get_iati_activities()] == [
+        [json.loads(line) for line in i[2].splitlines()] for i in results
+    ]
+
+
+def test_not_finite_values(encoder):
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=math.nan),
+            IATIActivityTransaction(value=math.inf),
+            IATIActivityTransaction(value=-(2**64)),
+        ]
+    )
+
+    # The same whether or not orjson is installed, and valid JSON
+    assert b'[{"value":null,' == dumps_transactions_split(iati_activity)[:15]
+    assert [None, None, -(2**64)] == [
+        i["value"]
+        for i in json.loads(
+            dumps_transactions_split(iati_activity), parse_constant=_no_constant
+        )
+    ]
+
+
+def _no_constant(name):
+    raise ValueError(name)
+
+
+def test_codes_are_stored_small(encoder):
+
+    encoder_ = iati_activity_json._Encoder()
+    tracemalloc.start()
+    try:
+        for i in range(1000):
+            encoder_.encode_code("code {}".format(i))
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Not about 4 KB per code, as orjson results are
+    assert size < 200 * 1000
+    assert b'"code 1"' == encoder_.encode_code("code 1")
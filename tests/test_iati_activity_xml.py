@@ -0,0 +1,74 @@
+import io
+
+from iati_activity_details_split_by_fields.iati_activity_xml import (
+    iter_activities_from_xml,
+)
+
+XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<iati-activities version="2.03">
+    <iati-activity>
+        <iati-identifier> GB-1-A </iati-identifier>
+        <recipient-country code="FR" percentage="60"/>
+        <recipient-country code="GB" percentage="40"/>
+        <sector vocabulary="1" code="11110" percentage="70"/>
+        <sector vocabulary="1" code="12110" percentage="30"/>
+        <transaction>
+            <transaction-type code="3"/>
+            <value currency="GBP" value-date="2024-01-01">1000</value>
+        </transaction>
+    </iati-activity>
+    <iati-activity>
+        <iati-identifier>GB-1-B</iati-identifier>
+        <recipient-region code="289" vocabulary="1" percentage="100"/>
+        <transaction>
+            <value>250.50</value>
+            <sector vocabulary="2" code="111"/>
+            <recipient-country code="KE"/>
+        </transaction>
+        <transaction>
+            <value>not a number</value>
+            <recipient-region code="298"/>
+        </transaction>
+    </iati-activity>
+</iati-activities>
+"""
+
+
+def test_iter_activities_from_xml():
+
+    results = list(iter_activities_from_xml(io.BytesIO(XML)))
+
+    assert ["GB-1-A", "GB-1-B"] == [i.iati_identifier for i in results]
+
+    assert [("FR", 60), ("GB", 40)] == [
+        (i.code, i.percentage) for i in results[0].recipient_countries
+    ]
+    assert [("1", "11110", 70), ("1", "12110", 30)] == [
+        (i.vocabulary, i.code, i.percentage) for i in results[0].sectors
+    ]
+    assert [1000] == [i.value for i in results[0].transactions]
+    assert [] == results[0].recipient_regions
+
+    assert [("289", 100)] == [
+        (i.code, i.percentage) for i in results[1].recipient_regions
+    ]
+    transactions = results[1].transactions
+    assert [250.5, None] == [i.value for i in transactions]
+    assert [("2", "111")] == [(i.vocabulary, i.code) for i in transactions[0].sectors]
+    assert ["KE", None] == [i.recipient_country_code for i in transactions]
+    assert [None, "298"] == [i.recipient_region_code for i in transactions]
+
+
+def test_split_from_xml():
+
+    results = next(iter_activities_from_xml(io.BytesIO(XML)))
+
+    assert [
+        ("FR", "11110", 420),
+        ("FR", "12110", 180),
+        ("GB", "11110", 280),
+        ("GB", "12110", 120),
+    ] == [
+        (i["recipient_country_code"], i["sectors"][0]["code"], round(i["value"], 6))
+        for i in results.get_transactions_split_as_json()
+    ]
@@ -0,0 +1,111 @@
+from iati_activity_details_split_by_fields.batch import (
+    ActivitySplitChange,
+    split_activities_incremental,
+)
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+def _get_iati_activity(iati_identifier, value=1000, percentage=50):
+    return IATIActivity(
+        iati_identifier=iati_identifier,
+        transactions=[
+            IATIActivityTransaction(
+                value=value,
+                sectors=[IATIActivityTransactionSector(vocabulary="1", code="A")],
+            )
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=percentage),
+            IATIActivityRecipientCountry(code="GB", percentage=50),
+        ],
+        sectors=[IATIActivitySector(vocabulary="cats", code="Henry", percentage=1)],
+    )
+
+
+def test_fingerprint():
+
+    fingerprint = _get_iati_activity("A").get_fingerprint()
+
+    # Stable, and does not depend on the identifier
+    assert fingerprint == _get_iati_activity("B").get_fingerprint()
+    assert 64 == len(fingerprint)
+
+    # Changes when anything that affects the split changes
+    assert fingerprint != _get_iati_activity("A", value=1001).get_fingerprint()
+    # Including the type of a number
+    assert fingerprint != _get_iati_activity("A", value=1000.0).get_fingerprint()
+    assert fingerprint != _get_iati_activity("A", percentage=50.0).get_fingerprint()
+    assert fingerprint != _get_iati_activity("A", percentage=51).get_fingerprint()
+    iati_activity = _get_iati_activity("A")
+    iati_activity.transactions[0].sectors[0].code = "B"
+    assert fingerprint != iati_activity.get_fingerprint()
+    iati_activity = _get_iati_activity("A")
+    iati_activity.sectors[0].vocabulary = "dogs"
+    assert fingerprint != iati_activity.get_fingerprint()
+
+
+def test_split_activities_incremental():
+
+    first_fingerprints: dict = {}
+    results = list(
+        split_activities_incremental(
+            [_get_iati_activity("A"), _get_iati_activity("B")],
+            {},
+            first_fingerprints,
+            max_workers=0,
+        )
+    )
+
+    assert [("added", "A"), ("added", "B")] == [
+        (i.status, i.iati_identifier) for i in results
+    ]
+    assert {"A", "B"} == set(first_fingerprints)
+
+    second_fingerprints: dict = {}
+    results = list(
+        split_activities_incremental(
+            [
+                _get_iati_activity("B", value=2000),
+                _get_iati_activity("C"),
+            ],
+            first_fingerprints,
+            second_fingerprints,
+            max_workers=0,
+            as_json=True,
+        )
+    )
+
+    assert [
+        (ActivitySplitChange.CHANGED, "B"),
+        (ActivitySplitChange.ADDED, "C"),
+        (ActivitySplitChange.REMOVED, "A"),
+    ] == [(i.status, i.iati_identifier) for i in results]
+    assert [1000, 1000] == [i["value"] for i in results[0].transactions_split]
+    assert [] == results[2].transactions_split
+    assert results[2].fingerprint is None
+    assert {"B", "C"} == set(second_fingerprints)
+
+    # Nothing changed
+    assert [] == list(
+        split_activities_incremental(
+            [
+                _get_iati_activity("B", value=2000),
+                _get_iati_activity("C"),
+            ],
+            second_fingerprints,
+            max_workers=2,
+            chunksize=1,
+        )
+    )
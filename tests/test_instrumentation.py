@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from iati_activity_details_split_by_fields import instrumentation
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+from iati_activity_details_split_by_fields.instrumentation import (
+    SplitMetrics,
+    collect_metrics,
+)
+
+
+def _get_iati_activity(iati_identifier, transactions):
+    return IATIActivity(
+        iati_identifier=iati_identifier,
+        transactions=[IATIActivityTransaction(value=1000) for _ in range(transactions)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=40),
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary="cats", code="Henry", percentage=50),
+            IATIActivitySector(vocabulary="dogs", code="Rover", percentage=100),
+        ],
+    )
+
+
+def test_nothing_recorded_by_default():
+
+    assert instrumentation.get_current_metrics() is None
+
+    metrics = SplitMetrics()
+    with collect_metrics(metrics):
+        assert instrumentation.get_current_metrics() is metrics
+
+    _get_iati_activity("A", 1).get_transactions_split()
+
+    assert instrumentation.get_current_metrics() is None
+    assert 0 == metrics.activities_count
+
+
+def test_metrics():
+
+    metrics = SplitMetrics(largest_activities=2)
+
+    with collect_metrics(metrics):
+        _get_iati_activity("A", 1).get_transactions_split()
+        _get_iati_activity("B", 3).get_transactions_split_as_json()
+        _get_iati_activity("C", 2).get_transactions_split(minor_unit_decimals=2)
+
+    assert 3 == metrics.activities_count
+    assert 6 == metrics.transactions_count
+    assert 6 == metrics.recipient_countries_count
+    assert 6 == metrics.sectors_count
+    assert 24 == metrics.rows_count
+    assert 4 == metrics.max_fan_out
+    assert 4.0 == metrics.get_mean_fan_out()
+    assert [("B", 12), ("C", 8)] == metrics.get_largest_activities()
+    assert {
+        "normalise": 3,
+        "template": 3,
+        "split_recipient_countries": 6,
+        "split_sectors": 6,
+        "to_json": 1,
+    } == metrics.stage_calls
+    assert all(i >= 0 for i in metrics.stage_seconds.values())
+
+
+def test_prometheus_text_file(tmp_path):
+
+    metrics = SplitMetrics()
+    with collect_metrics(metrics):
+        _get_iati_activity('XM-"1"', 2).get_transactions_split()
+
+    path = str(tmp_path / "split.prom")
+    metrics.write_prometheus_text_file(path)
+
+    with open(path) as fp:
+        lines = fp.read().splitlines()
+    assert "# TYPE iati_split_rows_total counter" in lines
+    assert "iati_split_rows_total 8" in lines
+    assert 'iati_split_stage_calls_total{stage="split_sectors"} 2' in lines
+    assert (
+        'iati_split_largest_activity_rows{rank="1",iati_identifier="XM-\\"1\\""} 8'
+        in lines
+    )
+    assert ["split.prom"] == os.listdir(str(tmp_path))
+
+
+@pytest.mark.skipif(os.name != "posix", reason="File modes are POSIX")
+def test_prometheus_text_file_mode(tmp_path):
+
+    path = str(tmp_path / "split.prom")
+    umask = os.umask(0o027)
+    try:
+        SplitMetrics().write_prometheus_text_file(path)
+    finally:
+        os.umask(umask)
+
+    # As open would make it, not only readable by its owner as mkstemp does
+    assert 0o640 == os.stat(path).st_mode & 0o777
+
+
+@pytest.mark.parametrize("minor_unit_decimals", [None, 2])
+def test_same_values_with_metrics(minor_unit_decimals):
+
+    iati_activity = _get_iati_activity("A", 1)
+    iati_activity.transactions[0].value = 1234.567
+
+    with collect_metrics(SplitMetrics()):
+        with_metrics = iati_activity.get_transactions_split_as_json(minor_unit_decimals)
+
+    assert (
+        iati_activity.get_transactions_split_as_json(minor_unit_decimals)
+        == with_metrics
+    )
+
+
+def test_max_fan_out():
+
+    iati_activity = _get_iati_activity("A", 2)
+    iati_activity.transactions[0].recipient_country_code = "IE"
+    iati_activity.transactions[0].sectors = [
+        IATIActivityTransactionSector(vocabulary="cats", code="Henry")
+    ]
+    metrics = SplitMetrics()
+
+    with collect_metrics(metrics):
+        iati_activity.get_transactions_split()
+
+    # The most rows of one transaction, not the mean rounded up
+    assert 1 + 4 == metrics.rows_count
+    assert 4 == metrics.max_fan_out
+
+
+def test_threads_record_separately():
+
+    barrier = threading.Barrier(2)
+    results = {}
+
+    def split(transactions):
+        metrics = SplitMetrics()
+        with collect_metrics(metrics):
+            barrier.wait()
+            _get_iati_activity("A", transactions).get_transactions_split()
+            barrier.wait()
+        results[transactions] = metrics.transactions_count
+
+    threads = [threading.Thread(target=split, args=(i,)) for i in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {1: 1, 2: 2} == results
+
+
+def test_tasks_record_separately():
+
+    async def split(transactions):
+        metrics = SplitMetrics()
+        with collect_metrics(metrics):
+            await asyncio.sleep(0)
+            _get_iati_activity("A", transactions).get_transactions_split()
+            await asyncio.sleep(0)
+        return metrics.transactions_count
+
+    async def main():
+        return await asyncio.gather(split(1), split(2))
+
+    assert [1, 2] == asyncio.run(main())
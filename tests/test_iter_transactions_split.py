@@ -0,0 +1,105 @@
+import types
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+
+
+def _get_iati_activity():
+    return IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=1000),
+            IATIActivityTransaction(value=300),
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=40),
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary="cats", code="Henry", percentage=50),
+            IATIActivitySector(vocabulary="dogs", code="Rover", percentage=100),
+        ],
+    )
+
+
+def test_iter_is_lazy():
+
+    results = _get_iati_activity().iter_transactions_split_as_json()
+
+    assert isinstance(results, types.GeneratorType)
+    assert {
+        "recipient_country_code": "FR",
+        "recipient_region_code": None,
+        "sectors": [{"code": "Henry", "vocabulary": "cats"}],
+        "value": 1000 * (30 / 70 * 100) / 100 * 100.0 / 100,
+    } == next(results)
+
+
+def test_iter_matches_list():
+
+    iati_activity = _get_iati_activity()
+
+    assert iati_activity.get_transactions_split_as_json() == list(
+        iati_activity.iter_transactions_split_as_json()
+    )
+    assert [x.get_as_json() for x in iati_activity.get_transactions_split()] == [
+        x.get_as_json() for x in iati_activity.iter_transactions_split()
+    ]
+
+
+def test_transactions_with_same_declarations_share_a_template():
+
+    iati_activity = _get_iati_activity()
+    iati_activity.recipient_countries = []
+    iati_activity.transactions = [
+        IATIActivityTransaction(value=1000, recipient_country_code="FR"),
+        IATIActivityTransaction(value=300, recipient_country_code="GB"),
+        IATIActivityTransaction(value=200, recipient_country_code="FR"),
+    ]
+
+    templates = list(iati_activity._iter_transactions_split_templates())
+
+    assert templates[0][1] is templates[2][1]
+    assert templates[0][1] is not templates[1][1]
+    assert [("GB", None), ("GB", None)] == [i[:2] for i in templates[1][1]]
+    # Each vocabulary on its own adds up to 100%
+    assert [200.0, 200.0] == templates[2][0]
+
+
+def test_rows_do_not_share_sectors():
+
+    iati_activity = _get_iati_activity()
+    iati_activity.transactions.append(
+        IATIActivityTransaction(
+            value=50,
+            sectors=[IATIActivityTransactionSector(vocabulary="1", code="111")],
+        )
+    )
+    iati_activity.transactions.append(
+        IATIActivityTransaction(
+            value=70,
+            sectors=iati_activity.transactions[-1].sectors,
+        )
+    )
+    expected = iati_activity.get_transactions_split_as_json()
+
+    rows = iati_activity.get_transactions_split()
+    for row in rows:
+        row.sectors[0].code = "X"
+        row.sectors.append(IATIActivityTransactionSector(code="Y"))
+
+    # Neither the other rows nor the activity have changed
+    assert expected == iati_activity.get_transactions_split_as_json()
+    assert "111" == iati_activity.transactions[-1].sectors[0].code
+    assert ["Henry", "Rover"] == [i.code for i in iati_activity.sectors]
+    assert all(["X", "Y"] == [i.code for i in row.sectors] for row in rows)
@@ -0,0 +1,113 @@
+import random
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.minor_units import (
+    allocate,
+    get_integer_weights,
+    get_minor_units,
+)
+
+
+def test_get_minor_units():
+
+    assert 100000 == get_minor_units(1000, 2)
+    assert 123456 == get_minor_units(1234.56, 2)
+    assert 29 == get_minor_units(0.29, 2)
+    assert 28 == get_minor_units(0.285, 2)  # half to even
+    assert 1235 == get_minor_units(1234.56, 0)
+    assert get_minor_units(None, 2) is None
+
+
+def test_get_integer_weights():
+
+    assert ([333, 667], 1000) == get_integer_weights([33.3, 66.7])
+    assert ([50, 0, 0], 50) == get_integer_weights([50, None, 0])
+
+
+def test_allocate():
+
+    assert [34, 33, 33] == allocate(100, [1, 1, 1], 3)
+    assert [-34, -33, -33] == allocate(-100, [1, 1, 1], 3)
+    assert [43, 57] == allocate(100, [30, 40], 70)
+    assert [0, 0] == allocate(100, [0, 0], 0)
+
+
+def test_split_adds_up_exactly():
+
+    rng = random.Random(1)
+    for _ in range(50):
+        iati_activity = IATIActivity(
+            transactions=[
+                IATIActivityTransaction(value=round(rng.uniform(-1000, 100000), 2))
+                for _ in range(rng.randint(1, 5))
+            ],
+            recipient_countries=[
+                IATIActivityRecipientCountry(
+                    code=code, percentage=round(rng.uniform(0.1, 100), 1)
+                )
+                for code in rng.sample(["FR", "GB", "IE", "KE"], rng.randint(0, 4))
+            ],
+            recipient_regions=[
+                IATIActivityRecipientRegion(code=code, percentage=rng.randint(1, 100))
+                for code in rng.sample(["ASIA", "AFRICA", "EUROPE"], rng.randint(0, 3))
+            ],
+            sectors=[
+                IATIActivitySector(
+                    vocabulary=rng.choice(["cats", "dogs"]),
+                    code=code,
+                    percentage=rng.uniform(1, 100),
+                )
+                for code in rng.sample(["Henry", "Linda", "Rover"], rng.randint(0, 3))
+            ],
+        )
+
+        results = iati_activity.get_transactions_split_as_json(minor_unit_decimals=2)
+        float_results = iati_activity.get_transactions_split_as_json()
+
+        vocabularies = {i.vocabulary for i in iati_activity.sectors} or {None}
+        rows_per_transaction = len(results) // len(iati_activity.transactions)
+        for index, transaction in enumerate(iati_activity.transactions):
+            transaction_results = results[
+                index * rows_per_transaction : (index + 1) * rows_per_transaction
+            ]
+            for vocabulary in vocabularies:
+                assert get_minor_units(transaction.value, 2) == sum(
+                    r["value"]
+                    for r in transaction_results
+                    if vocabulary is None or r["sectors"][0]["vocabulary"] == vocabulary
+                )
+
+        # Each value is within a cent of the float split per level of splitting
+        for result, float_result in zip(results, float_results):
+            assert isinstance(result["value"], int)
+            assert abs(result["value"] - float_result["value"] * 100) < 3
+            assert {**result, "value": None} == {**float_result, "value": None}
+
+
+def test_split_by_country():
+
+    iati_activity = IATIActivity(
+        transactions=[IATIActivityTransaction(value=100)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=1),
+            IATIActivityRecipientCountry(code="GB", percentage=1),
+            IATIActivityRecipientCountry(code="IE", percentage=1),
+        ],
+    )
+
+    assert [("FR", 3334), ("GB", 3333), ("IE", 3333)] == [
+        (i.recipient_country_code, i.value)
+        for i in iati_activity.get_transactions_split(minor_unit_decimals=2)
+    ]
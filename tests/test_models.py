@@ -0,0 +1,64 @@
+import copy
+import pickle
+
+import pytest
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_split import (
+    IATIActivityTransactionSplit,
+)
+
+
+@pytest.mark.parametrize(
+    "iati_object",
+    [
+        IATIActivityRecipientCountry(code="GB", percentage=100),
+        IATIActivityRecipientRegion(code="ASIA", percentage=100),
+        IATIActivitySector(vocabulary="cats", code="Henry", percentage=100),
+        IATIActivityTransaction(value=1000),
+        IATIActivityTransactionSector(vocabulary="cats", code="Henry"),
+        IATIActivityTransactionSplit(value=1000),
+    ],
+)
+def test_no_instance_dict(iati_object):
+
+    assert not hasattr(iati_object, "__dict__")
+    with pytest.raises(AttributeError):
+        iati_object.not_a_field = 1
+
+    # Copying and pickling still work
+    for other in (copy.deepcopy(iati_object), pickle.loads(pickle.dumps(iati_object))):
+        assert type(iati_object) is type(other)
+        assert [getattr(iati_object, i) for i in iati_object.__slots__] == [
+            getattr(other, i) for i in other.__slots__
+        ]
+
+
+def test_default_lists_are_not_shared():
+
+    transaction_1 = IATIActivityTransaction(value=1000)
+    transaction_2 = IATIActivityTransaction(value=1000)
+    transaction_1.sectors.append(IATIActivityTransactionSector(code="Henry"))
+
+    assert [] == transaction_2.sectors
+
+    iati_activity_1 = IATIActivity()
+    iati_activity_2 = IATIActivity()
+    iati_activity_1.transactions.append(transaction_1)
+
+    assert [] == iati_activity_2.transactions
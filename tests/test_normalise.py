@@ -0,0 +1,29 @@
+from iati_activity_details_split_by_fields.normalise import normalise_percentages
+
+
+def test_normalise_percentages():
+
+    assert [60.0, 40.0] == normalise_percentages([30, 20])
+
+
+def test_missing_and_zero_percentages_are_kept():
+
+    assert [None, 0, 100.0] == normalise_percentages([None, 0, 20])
+
+
+def test_zero_total_is_kept():
+
+    assert [None, 0, 0.0] == normalise_percentages([None, 0, 0.0])
+
+
+def test_groups():
+
+    assert [25.0, 75.0, 100.0, None, 0] == normalise_percentages(
+        [1, 3, 50, None, 0], [2, 1, 2]
+    )
+
+
+def test_positive_total_only():
+
+    assert [-200.0, 300.0] == normalise_percentages([-2, 3], positive_total_only=False)
+    assert [-2, 1] == normalise_percentages([-2, 1], positive_total_only=True)
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from iati_activity_details_split_by_fields.batch import split_activities_as_columns
+from iati_activity_details_split_by_fields.code_table import CodeTable
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+from iati_activity_details_split_by_fields.shared_memory_split import (
+    _split_chunk_to_shared_memory,
+    _unlink_shared_memory,
+    split_activities_to_shared_memory,
+)
+
+pytestmark = pytest.mark.skipif(
+    os.name != "posix", reason="Shared memory splitting needs a POSIX system"
+)
+
+
+def _join(results, iati_activities):
+    expected = split_activities_as_columns(iati_activities, max_workers=0)
+    code_table = CodeTable()
+    json = {}
+    for result in results:
+        with result:
+            for key, values in result.get_as_json().items():
+                json.setdefault(key, []).extend(values)
+            columns = result.get_as_columns(code_table)
+            assert columns.code_table is code_table
+    assert expected.get_as_json().keys() == json.keys()
+    for key, values in expected.get_as_json().items():
+        assert str(values) == str(json[key])
+
+
+def test_split_activities_to_shared_memory_in_process(iati_activities):
+
+    _join(
+        split_activities_to_shared_memory(iati_activities, max_workers=0, chunksize=3),
+        iati_activities,
+    )
+
+
+def test_split_activities_to_shared_memory(iati_activities):
+
+    _join(
+        split_activities_to_shared_memory(iati_activities, max_workers=2, chunksize=3),
+        iati_activities,
+    )
+
+
+def test_columns_are_memoryviews():
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=1000),
+            IATIActivityTransaction(
+                value=500,
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="1", code="A"),
+                    IATIActivityTransactionSector(vocabulary="1", code="B"),
+                ],
+            ),
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=1),
+        ],
+    )
+
+    (result,) = split_activities_to_shared_memory([iati_activity], max_workers=0)
+
+    with result:
+        assert 6 == len(result)
+        assert isinstance(result.value, memoryview)
+        assert "d" == result.value.format
+        assert "i" == result.sector_code_id.format
+        assert [-1, -1, 3, 4, 3, 4] == result.sector_code_id.tolist()
+        assert [None, None, "A", "B", "A", "B"] == result.get_codes(
+            result.sector_code_id
+        )
+        assert [1, 1, 1, 1] == result.transaction_index.tolist()[2:]
+
+    # Freed
+    with pytest.raises(FileNotFoundError):
+        _unlink_shared_memory((result.name, 0, []))
+
+
+def test_empty_chunk():
+
+    name, rows_count, codes = _split_chunk_to_shared_memory(
+        0, [IATIActivity(transactions=[])]
+    )
+
+    assert 0 == rows_count
+    assert [] == codes
+    _unlink_shared_memory((name, rows_count, codes))
+
+
+def test_not_posix(monkeypatch, iati_activities):
+
+    monkeypatch.setattr(os, "name", "nt")
+
+    with pytest.raises(OSError):
+        next(split_activities_to_shared_memory(iati_activities))
@@ -0,0 +1,80 @@
+import pytest
+
+from iati_activity_details_split_by_fields.activity_store import (
+    IATIActivityStore,
+    write_activity_store,
+)
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.split_lookup import TransactionsSplitLookup
+
+
+def _get_iati_activity(iati_identifier):
+    return IATIActivity(
+        iati_identifier=iati_identifier,
+        transactions=[IATIActivityTransaction(value=100.01)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=1),
+            IATIActivityRecipientCountry(code="GB", percentage=2),
+        ],
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / "activities.iatistore")
+    write_activity_store(
+        [_get_iati_activity("XM-{}".format(i)) for i in range(5)], path
+    )
+    with IATIActivityStore(path) as store:
+        yield store
+
+
+def test_get_transactions_split_as_json(store):
+
+    lookup = TransactionsSplitLookup(store)
+
+    assert _get_iati_activity(
+        "XM-3"
+    ).get_transactions_split_as_json() == lookup.get_transactions_split_as_json("XM-3")
+    assert _get_iati_activity("XM-3").get_transactions_split_as_json(
+        2
+    ) == lookup.get_transactions_split_as_json("XM-3", minor_unit_decimals=2)
+    assert lookup.get_transactions_split_as_json(
+        "XM-3"
+    ) is lookup.get_transactions_split_as_json("XM-3")
+    assert (2, 2) == (lookup.hits, lookup.misses)
+    assert 2 == len(lookup)
+
+
+def test_missing(store):
+
+    lookup = TransactionsSplitLookup(store)
+
+    with pytest.raises(KeyError):
+        lookup.get_transactions_split_as_json("XM-9")
+    assert 0 == len(lookup)
+
+
+def test_least_recently_used_are_removed(store):
+
+    lookup = TransactionsSplitLookup(store, max_entries=2)
+
+    lookup.get_transactions_split_as_json("XM-0")
+    lookup.get_transactions_split_as_json("XM-1")
+    lookup.get_transactions_split_as_json("XM-0")
+    lookup.get_transactions_split_as_json("XM-2")
+    assert 2 == len(lookup)
+
+    # XM-1 was removed, not XM-0
+    lookup.get_transactions_split_as_json("XM-0")
+    lookup.get_transactions_split_as_json("XM-1")
+    assert (2, 4) == (lookup.hits, lookup.misses)
+
+    lookup.clear()
+    assert 0 == len(lookup)
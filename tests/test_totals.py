@@ -0,0 +1,161 @@
+import math
+import random
+
+import pytest
+
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+from iati_activity_details_split_by_fields.totals import (
+    PENDING_VALUES_LIMIT,
+    TransactionsSplitTotals,
+    get_transactions_split_totals,
+)
+
+
+def _get_iati_activity(rng):
+    return IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=rng.uniform(-1000, 1_000_000))
+            for _ in range(rng.randint(1, 20))
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code=code, percentage=rng.uniform(0, 100))
+            for code in rng.sample(["FR", "GB", "IE", "KE"], rng.randint(0, 4))
+        ],
+        recipient_regions=[
+            IATIActivityRecipientRegion(code=code, percentage=rng.randint(1, 100))
+            for code in rng.sample(["ASIA", "AFRICA"], rng.randint(0, 2))
+        ],
+        sectors=[
+            IATIActivitySector(
+                vocabulary=rng.choice(["cats", "dogs"]),
+                code=code,
+                percentage=rng.uniform(0, 100),
+            )
+            for code in rng.sample(["Henry", "Linda", "Rover"], rng.randint(0, 3))
+        ],
+    )
+
+
+def _get_expected_totals(iati_activities, dimensions, minor_unit_decimals=None):
+    values: dict = {}
+    for iati_activity in iati_activities:
+        for row in iati_activity.get_transactions_split_as_json(minor_unit_decimals):
+            for sector in row["sectors"] or [{"vocabulary": None, "code": None}]:
+                fields = {
+                    "recipient_country_code": row["recipient_country_code"],
+                    "recipient_region_code": row["recipient_region_code"],
+                    "sector_vocabulary": sector["vocabulary"],
+                    "sector_code": sector["code"],
+                }
+                key = tuple(fields[i] for i in dimensions)
+                values.setdefault(key, []).append(row["value"])
+                if not ({"sector_vocabulary", "sector_code"} & set(dimensions)):
+                    break
+    add_up = math.fsum if minor_unit_decimals is None else sum
+    return {key: add_up(i) for key, i in values.items()}
+
+
+@pytest.mark.parametrize(
+    "dimensions",
+    [
+        (),
+        ("recipient_country_code",),
+        ("recipient_region_code", "recipient_country_code"),
+        ("sector_vocabulary",),
+        ("recipient_country_code", "sector_vocabulary", "sector_code"),
+    ],
+)
+@pytest.mark.parametrize("minor_unit_decimals", [None, 2])
+def test_totals_match_split(dimensions, minor_unit_decimals):
+
+    rng = random.Random(1)
+    iati_activities = [_get_iati_activity(rng) for _ in range(30)]
+
+    assert _get_expected_totals(
+        iati_activities, dimensions, minor_unit_decimals
+    ) == get_transactions_split_totals(iati_activities, dimensions, minor_unit_decimals)
+    assert _get_expected_totals(
+        iati_activities[:1], dimensions, minor_unit_decimals
+    ) == iati_activities[0].get_transactions_split_totals(
+        dimensions, minor_unit_decimals
+    )
+
+
+def test_totals_match_split_exactly_with_many_values():
+
+    rng = random.Random(2)
+    iati_activities = [_get_iati_activity(rng) for _ in range(30)]
+    # Values of very different sizes, which rounding would lose
+    for iati_activity in iati_activities:
+        for transaction in iati_activity.transactions:
+            transaction.value *= 10 ** rng.randint(-20, 20)
+    totals = TransactionsSplitTotals(())
+
+    for _ in range(20):
+        for iati_activity in iati_activities:
+            totals.add_activity(iati_activity)
+
+    # Values were added up along the way, rather than all kept
+    assert len(totals._values[()]) <= PENDING_VALUES_LIMIT
+    assert _get_expected_totals(iati_activities * 20, ()) == totals.get_totals()
+
+
+def test_totals_with_transaction_level_sectors():
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(
+                value=1000,
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="cats", code="Henry"),
+                    IATIActivityTransactionSector(vocabulary="dogs", code="Rover"),
+                ],
+            ),
+            IATIActivityTransaction(value=500),
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=60),
+            IATIActivityRecipientCountry(code="GB", percentage=40),
+        ],
+    )
+
+    assert {("FR",): 900, ("GB",): 600} == iati_activity.get_transactions_split_totals()
+    assert {
+        ("cats",): 1000,
+        ("dogs",): 1000,
+        (None,): 500,
+    } == iati_activity.get_transactions_split_totals(["sector_vocabulary"])
+
+
+def test_transactions_without_value():
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=None),
+            IATIActivityTransaction(value=5),
+        ]
+    )
+
+    assert [None, 5] == [i.value for i in iati_activity.get_transactions_split()]
+    assert {(None,): 5} == iati_activity.get_transactions_split_totals()
+
+
+def test_unknown_dimension():
+
+    with pytest.raises(ValueError):
+        IATIActivity().get_transactions_split_totals(["sector"])
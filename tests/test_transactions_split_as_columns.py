@@ -0,0 +1,229 @@
+import pytest
+
+from iati_activity_details_split_by_fields.batch import split_activities_as_columns
+from iati_activity_details_split_by_fields.code_table import NO_CODE, CodeTable
+from iati_activity_details_split_by_fields.iati_activity import IATIActivity
+from iati_activity_details_split_by_fields.iati_activity_recipient_country import (
+    IATIActivityRecipientCountry,
+)
+from iati_activity_details_split_by_fields.iati_activity_recipient_region import (
+    IATIActivityRecipientRegion,
+)
+from iati_activity_details_split_by_fields.iati_activity_sector import (
+    IATIActivitySector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction import (
+    IATIActivityTransaction,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_sector import (
+    IATIActivityTransactionSector,
+)
+from iati_activity_details_split_by_fields.iati_activity_transaction_split_columns import (
+    IATIActivityTransactionSplitColumns,
+)
+
+pytest.importorskip("numpy")
+
+
+def _get_rows(iati_activity, activity_index=0):
+    """The rows we expect, worked out from get_transactions_split_as_json"""
+    transaction_index = {id(t): i for i, t in enumerate(iati_activity.transactions)}
+    rows = []
+    for transaction in iati_activity.transactions:
+        single = IATIActivity(
+            transactions=[transaction],
+            sectors=iati_activity.sectors,
+            recipient_countries=iati_activity.recipient_countries,
+            recipient_regions=iati_activity.recipient_regions,
+        )
+        for result in single.get_transactions_split_as_json():
+            for sector in result["sectors"] or [{"vocabulary": None, "code": None}]:
+                rows.append(
+                    (
+                        result["value"],
+                        result["recipient_country_code"],
+                        result["recipient_region_code"],
+                        sector["vocabulary"],
+                        sector["code"],
+                        activity_index,
+                        transaction_index[id(transaction)],
+                    )
+                )
+    return rows
+
+
+def _get_columns_rows(columns):
+    return list(
+        zip(
+            columns.value.tolist(),
+            columns.recipient_country_code.tolist(),
+            columns.recipient_region_code.tolist(),
+            columns.sector_vocabulary.tolist(),
+            columns.sector_code.tolist(),
+            columns.activity_index.tolist(),
+            columns.transaction_index.tolist(),
+        )
+    )
+
+
+def test_split_by_everything():
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=1000),
+            IATIActivityTransaction(value=1234.56),
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary="cats", code="Henry", percentage=15),
+            IATIActivitySector(vocabulary="cats", code="Linda", percentage=70),
+            IATIActivitySector(vocabulary="dogs", code="Rover", percentage=100),
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=30),
+            IATIActivityRecipientCountry(code="GB", percentage=40),
+        ],
+        recipient_regions=[
+            IATIActivityRecipientRegion(code="ASIA", percentage=33.3),
+            IATIActivityRecipientRegion(code="AFRICA", percentage=50),
+        ],
+    )
+
+    columns = iati_activity.get_transactions_split_as_columns(activity_index=3)
+
+    assert 24 == len(columns)
+    assert _get_rows(iati_activity, activity_index=3) == _get_columns_rows(columns)
+
+
+def test_transaction_level_sectors():
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(
+                value=1000,
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="cats", code="Henry"),
+                    IATIActivityTransactionSector(vocabulary="dogs", code="Rover"),
+                ],
+            ),
+            IATIActivityTransaction(value=500, recipient_region_code="ASIA"),
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=50),
+            IATIActivityRecipientCountry(code="GB", percentage=50),
+        ],
+    )
+
+    columns = iati_activity.get_transactions_split_as_columns()
+
+    assert [
+        (500.0, "FR", None, "cats", "Henry", 0, 0),
+        (500.0, "FR", None, "dogs", "Rover", 0, 0),
+        (500.0, "GB", None, "cats", "Henry", 0, 0),
+        (500.0, "GB", None, "dogs", "Rover", 0, 0),
+        # The transaction level region takes precedence over the countries
+        (500.0, None, "ASIA", None, None, 0, 1),
+    ] == _get_columns_rows(columns)
+    assert _get_rows(iati_activity) == _get_columns_rows(columns)
+
+
+def test_transactions_split_different_ways():
+
+    iati_activity = IATIActivity(
+        transactions=[
+            IATIActivityTransaction(value=1000),
+            IATIActivityTransaction(value=100, recipient_country_code="IE"),
+            IATIActivityTransaction(
+                value=10,
+                recipient_region_code="AFRICA",
+                sectors=[
+                    IATIActivityTransactionSector(vocabulary="dogs", code="Rover"),
+                    IATIActivityTransactionSector(vocabulary="dogs", code="Rex"),
+                ],
+            ),
+            IATIActivityTransaction(value=1),
+        ],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=50),
+            IATIActivityRecipientCountry(code="GB", percentage=50),
+        ],
+        sectors=[
+            IATIActivitySector(vocabulary="cats", code="Henry", percentage=60),
+            IATIActivitySector(vocabulary="cats", code="Linda", percentage=40),
+        ],
+    )
+
+    columns = iati_activity.get_transactions_split_as_columns(activity_index=3)
+
+    # Still in transaction order
+    assert [0, 0, 0, 0, 1, 1, 2, 2, 3, 3, 3, 3] == columns.transaction_index.tolist()
+    assert _get_rows(iati_activity, activity_index=3) == _get_columns_rows(columns)
+
+
+def test_no_transactions():
+
+    iati_activity = IATIActivity(
+        recipient_countries=[IATIActivityRecipientCountry(code="FR", percentage=50)]
+    )
+
+    columns = iati_activity.get_transactions_split_as_columns()
+
+    assert 0 == len(columns)
+    assert [] == columns.sector_code.tolist()
+
+
+def test_split_activities_as_columns():
+
+    iati_activities = [
+        IATIActivity(
+            transactions=[IATIActivityTransaction(value=100 * i)],
+            recipient_countries=[
+                IATIActivityRecipientCountry(code="FR", percentage=i),
+                IATIActivityRecipientCountry(code="GB", percentage=7),
+            ],
+        )
+        for i in range(1, 8)
+    ]
+
+    columns = split_activities_as_columns(iati_activities, max_workers=2, chunksize=3)
+
+    assert [
+        row for i, a in enumerate(iati_activities) for row in _get_rows(a, i)
+    ] == _get_columns_rows(columns)
+
+
+def test_codes_are_held_as_ids():
+
+    code_table = CodeTable(["GB"])
+    iati_activity = IATIActivity(
+        transactions=[IATIActivityTransaction(value=1000)],
+        recipient_countries=[
+            IATIActivityRecipientCountry(code="FR", percentage=50),
+            IATIActivityRecipientCountry(code="GB", percentage=50),
+        ],
+    )
+
+    columns = iati_activity.get_transactions_split_as_columns(code_table=code_table)
+
+    assert columns.code_table is code_table
+    assert "int32" == str(columns.recipient_country_code_id.dtype)
+    assert [1, 0] == columns.recipient_country_code_id.tolist()
+    assert [NO_CODE, NO_CODE] == columns.sector_code_id.tolist()
+    assert ["FR", "GB"] == columns.recipient_country_code.tolist()
+    assert [None, None] == columns.sector_code.tolist()
+
+    # Columns with a different code table are remapped
+    other = IATIActivityTransactionSplitColumns(
+        value=[1.0],
+        recipient_country_code=["IE"],
+        recipient_region_code=[None],
+        sector_vocabulary=["1"],
+        sector_code=["X"],
+        activity_index=[1],
+        transaction_index=[0],
+    )
+    joined = IATIActivityTransactionSplitColumns.concatenate([columns, other])
+    assert joined.code_table is code_table
+    assert ["FR", "GB", "IE"] == joined.recipient_country_code.tolist()
+    assert [None, None, "X"] == joined.sector_code.tolist()
+    assert [None, None, "1"] == joined.sector_vocabulary.tolist()
+    assert [0, 0, 1] == joined.activity_index.tolist()